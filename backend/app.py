@@ -1,20 +1,99 @@
-from fastapi import FastAPI
-from src.database import engine, Base
-import uvicorn
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import anyio.to_thread
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+from config import Config
+from src import metrics
+from src.answer_log import answer_buffer, shutdown_answer_log
+from src.database import async_engine, async_read_engine, engine
+from src.hashing import hashing_stats, shutdown_hash_pool
+from src.jobs import scheduler
+from src.lifecycle import boot, readiness, start_worker
+from src.routers.auth import require_admin
+from src.responses import FastJSONResponse
+from src.shards import shards
 
 # Routers
-from src.routers import content, exam, review, recall, unit_exam, auth
+from src.routers import content, exam, review, recall, unit_exam, auth, stats, sync
+
+boot.started = _import_started
+boot.phases["import"] = round(time.perf_counter() - _import_started, 4)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Replay answer events spooled by workers that died before flushing them
+    with boot.phase("recover"):
+        answer_buffer.recover()
+    # Schema check and warm-up; /health/ready reports 503 until this is done
+    await start_worker()
+    # Nightly precomputation and maintenance; only the elected worker runs jobs
+    if Config.JOBS_ENABLED:
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    # Stop the password hashing processes with the worker
+    shutdown_hash_pool()
+    # Write out buffered answer events
+    shutdown_answer_log()
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Coeus")
+    """
+    Build the app. Does no I/O: the schema is managed by `python -m
+    src.migrations upgrade` and warm-up runs in the lifespan.
+    """
+    started = time.perf_counter()
+    app = FastAPI(title="Coeus", lifespan=lifespan, default_response_class=FastJSONResponse)
 
-    # Create database tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    # Request latency / DB query instrumentation, exposed on /metrics
+    metrics.instrument_engine(engine, "primary")
+    metrics.instrument_engine(async_engine.sync_engine, "primary_async")
+    if async_read_engine is not async_engine:
+        metrics.instrument_engine(async_read_engine.sync_engine, "replica")
+    for i, shard in enumerate(shards.shards[1:], 1):
+        metrics.instrument_engine(shard.engine, f"shard{i}")
+        metrics.instrument_engine(shard.async_engine.sync_engine, f"shard{i}_async")
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=Config.METRICS_SERVER_TIMING)
 
     @app.get("/")
     async def root():
         return {"message": "Hello World"}
 
+    @app.get("/health/live", include_in_schema=False)
+    async def liveness():
+        return {"status": "alive"}
+
+    @app.get("/health/ready", include_in_schema=False)
+    async def readiness_probe():
+        state = await readiness()
+        return FastJSONResponse(state, status_code=200 if state["ready"] else 503)
+
+    # Operational data: scrapers authenticate as an ADMIN_USERNAMES user
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False,
+             dependencies=[Depends(require_admin)])
+    async def prometheus_metrics():
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        hashing = hashing_stats()
+        log = answer_buffer.stats()
+        return PlainTextResponse(metrics.render([
+            ("coeus_threadpool_busy", "Worker threads in use by sync endpoints and run_in_threadpool.",
+             limiter.borrowed_tokens),
+            ("coeus_threadpool_size", "Worker thread limit.", limiter.total_tokens),
+            ("coeus_threadpool_waiting", "Tasks queued for a worker thread.", limiter.statistics().tasks_waiting),
+            ("coeus_hash_pending", "Password hashes queued or running.", hashing["pending"]),
+            ("coeus_answer_log_pending", "Answer events buffered, not yet written.", log["pending"]),
+            ("coeus_answer_log_failed_flushes", "Answer log flushes that failed.", log["failed_flushes"]),
+            ("coeus_boot_seconds", "Time from process start until the worker was ready.", boot.boot_seconds),
+            ("coeus_ready", "Whether the worker reports ready.", int(boot.ready)),
+            ("coeus_jobs_leader", "Whether this worker runs the background jobs.", int(scheduler.leader)),
+        ]), media_type="text/plain; version=0.0.4")
+
+    @app.get("/metrics/slow-queries", include_in_schema=False, dependencies=[Depends(require_admin)])
+    async def slow_query_samples():
+        return list(metrics.slow_queries)
+
     # Include Routers
     app.include_router(auth.router, prefix="/auth", tags=["Auth"])
     app.include_router(content.router, prefix="/content", tags=["Content"])
@@ -22,9 +101,22 @@ def create_app() -> FastAPI:
     app.include_router(review.router, prefix="/review", tags=["Review"])
     app.include_router(recall.router, prefix="/remember", tags=["Recall"])
     app.include_router(unit_exam.router, prefix="/unit_exam", tags=["Unit Exam"])
-    
+    app.include_router(stats.router, prefix="/stats", tags=["Stats"])
+    app.include_router(sync.router, prefix="/sync", tags=["Sync"])
+
+    boot.phases["construct"] = round(time.perf_counter() - started, 4)
     return app
 
-app = create_app()
+
+def __getattr__(name):
+    # `uvicorn app:app` (or `uvicorn --factory app:create_app`) builds the app
+    # on first access, not as a side effect of importing this module
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("app:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
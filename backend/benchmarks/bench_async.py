@@ -0,0 +1,116 @@
+"""
+Load comparison of a sync (threadpool) and an async endpoint serving the
+same recall page, over localhost against a uvicorn worker.
+
+Run from backend/:  python -m benchmarks.bench_async
+The server runs this module's `app` in a uvicorn subprocess, backed by a
+temporary SQLite file.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+if __name__ == "__main__":
+    _db_file = os.path.join(tempfile.mkdtemp(), "bench_async.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from datetime import datetime, timedelta
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from benchmarks.common import percentile, run_server
+from src.auth_cache import Principal
+from src.catalog import get_catalog
+from src.database import SessionLocal, get_db
+from src.migrations import migrate
+from src.models import UserQuestionProgress
+from src.routers import recall
+from src.routers.auth import get_current_user
+
+CONCURRENCY = [50, 200, 1000]
+PORT = 8765
+
+app = FastAPI()
+app.include_router(recall.router, prefix="/async/remember")
+# Both variants serve user 1 without a token, so the comparison leaves out authentication
+app.dependency_overrides[get_current_user] = lambda: Principal(1, "bench", None, None, True)
+
+
+@app.get("/sync/remember")
+def sync_recall(db: Session = Depends(get_db), limit: int = 20):
+    # Same work as recall.get_recall_questions on the sync session, run in the threadpool
+    now = datetime.utcnow()
+    ids = db.scalars(
+        select(UserQuestionProgress.question_id)
+        .where(UserQuestionProgress.user_id == 1, UserQuestionProgress.next_review_date != None,
+               UserQuestionProgress.next_review_date <= now)
+        .order_by(UserQuestionProgress.next_review_date, UserQuestionProgress.question_id)
+        .limit(limit)
+    ).all()
+    return {"due_recall_questions": get_catalog(db).question_payloads(ids)}
+
+
+def seed():
+    from benchmarks.common import seed_catalog
+    migrate()
+    db = SessionLocal()
+    catalog = seed_catalog(db, 200)
+    past = datetime.utcnow() - timedelta(days=1)
+    db.add_all(UserQuestionProgress(user_id=1, question_id=qid, next_review_date=past) for qid, _, _ in catalog)
+    db.commit()
+    db.close()
+
+
+async def drive(url: str, concurrency: int, total: int) -> dict:
+    import httpx
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def client(http):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await http.get(url)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                # Dropped connections and 5xx count against the variant instead of aborting the run
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": (total - errors) / elapsed,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    seed()
+    with run_server("benchmarks.bench_async:app", PORT) as base_url:
+        print(f"{'variant':>8} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for concurrency in CONCURRENCY:
+            for variant in ("sync", "async"):
+                url = f"{base_url}/{variant}/remember"
+                result = asyncio.run(drive(url, concurrency, total=max(2000, concurrency * 3)))
+                print(f"{variant:>8} {concurrency:>8} {result['rps']:>9.0f} "
+                      f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
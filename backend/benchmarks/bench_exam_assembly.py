@@ -0,0 +1,48 @@
+"""
+Exam assembly cost as the question pool grows: the weighted draw against
+copying and shuffling the whole pool, plus the share of failed / unseen /
+passed questions it serves.
+
+Run from backend/:  python -m benchmarks.bench_exam_assembly
+"""
+import random
+import time
+from src.exam_assembly import weighted_draw
+
+POOLS = [100, 10_000, 1_000_000]
+K = 20
+HISTORY = 200  # questions the user has answered, half of them wrong
+REPEAT = 200
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'pool':>9} {'draw us':>9} {'shuffle us':>11} {'failed':>7} {'unseen':>7} {'passed':>7}")
+    for n in POOLS:
+        pool = tuple(range(1, n + 1))
+        history = rng.sample(pool, min(HISTORY, n // 2))
+        failed, passed = history[::2], history[1::2]
+        failed_set, passed_set = set(failed), set(passed)
+
+        served = {"failed": 0, "unseen": 0, "passed": 0}
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            for qid in weighted_draw(pool, K, failed, passed, rng):
+                served["failed" if qid in failed_set else "passed" if qid in passed_set else "unseen"] += 1
+        draw_us = (time.perf_counter() - start) * 1e6 / REPEAT
+
+        repeat = max(1, REPEAT * 1000 // n)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            ids = list(pool)
+            rng.shuffle(ids)
+            ids[:K]
+        shuffle_us = (time.perf_counter() - start) * 1e6 / repeat
+
+        total = sum(served.values())
+        print(f"{n:>9} {draw_us:>9.1f} {shuffle_us:>11.1f} "
+              + " ".join(f"{served[b] / total:>7.2f}" for b in ("failed", "unseen", "passed")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Query count and wall time of the grading engine as the answer list grows.
+
+Run from backend/:  python -m benchmarks.bench_grading
+"""
+import time
+from benchmarks.common import QueryCounter, make_session, seed_catalog
+from src.grading import grade_answers
+
+SIZES = [1, 5, 20, 100, 500]
+
+
+def main():
+    engine, SessionLocal = make_session()
+    db = SessionLocal()
+    catalog = seed_catalog(db, max(SIZES))
+    counter = QueryCounter(engine)
+
+    print(f"{'answers':>8} {'queries':>8} {'ms':>8}")
+    for user_id, size in enumerate(SIZES, start=1):
+        # Alternate right/wrong answers so both counters are exercised
+        answers = [
+            {"question_id": qid, "option_id": right if i % 2 else wrong}
+            for i, (qid, right, wrong) in enumerate(catalog[:size])
+        ]
+        # Second pass hits existing rows, exercising the update branch of the upsert
+        for _ in range(2):
+            with counter.measure():
+                start = time.perf_counter()
+                grade_answers(db, user_id, answers)
+                db.commit()
+                elapsed = (time.perf_counter() - start) * 1000
+        print(f"{size:>8} {counter.count:>8} {elapsed:>8.2f}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
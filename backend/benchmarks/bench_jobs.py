@@ -0,0 +1,71 @@
+"""
+Background jobs on a synthetic database: total time, number of chunks and
+the longest chunk of each job. The longest chunk is the longest single
+write transaction a job holds, which is how long a request can wait
+behind it. The due-queue refresh is also timed as one transaction over
+every user for comparison.
+
+Every user gets a stale learning-state row, and 5% of progress rows are
+made never-answered so compaction has something to delete.
+
+Run from backend/:  python -m benchmarks.bench_jobs [--scale 100k] [--chunk 50]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import insert, select, update
+from benchmarks.common import make_session
+from benchmarks.synthetic import SCALES, generate
+from src.jobs import JOBS, JobContext
+from src.learning_state import refresh_due_summaries
+from src.models import User, UserLearningState, UserQuestionProgress
+
+
+class TimedContext(JobContext):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chunk_ms = []
+
+    def chunks(self, ids: list):
+        for chunk in super().chunks(ids):
+            start = time.perf_counter()
+            yield chunk
+            self.chunk_ms.append((time.perf_counter() - start) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="100k")
+    parser.add_argument("--chunk", type=int, default=50, help="users per chunk")
+    args = parser.parse_args()
+
+    engine, SessionLocal = make_session(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}")
+    with SessionLocal() as db:
+        summary = generate(db, SCALES[args.scale])
+        db.execute(insert(UserLearningState), [{"user_id": u, "failed_count": 0} for u in db.scalars(select(User.id))])
+        db.execute(update(UserQuestionProgress).where(UserQuestionProgress.question_id % 20 == 0).values(
+            times_correct=0, times_incorrect=0, next_review_date=None))
+        db.commit()
+    print(f"{summary['users']} users, {summary['progress_rows']} progress rows, {args.chunk} users per chunk\n")
+
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        refresh_due_summaries(db, list(db.scalars(select(User.id))))
+        db.commit()
+        print(f"due_queues as one transaction: {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    print(f"{'job':<18} {'total ms':>9} {'chunks':>7} {'max chunk ms':>13}  result")
+    for job in JOBS:
+        context = TimedContext(threading.Event(), SessionLocal, [SessionLocal], chunk_users=args.chunk, pause=0)
+        start = time.perf_counter()
+        result = job.run(context)
+        elapsed = (time.perf_counter() - start) * 1000
+        longest = f"{max(context.chunk_ms):.1f}" if context.chunk_ms else "-"
+        print(f"{job.name:<18} {elapsed:>9.1f} {len(context.chunk_ms):>7} {longest:>13}  {result}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Login storm: login throughput, rejected (503) logins, and latency of an
+unrelated endpoint (GET /) served by the same worker during the storm.
+Compares hashing in the thread executor (HASH_POOL_WORKERS=0, roughly the
+old inline behaviour) with the dedicated process pool.
+
+Run from backend/:  python -m benchmarks.bench_login
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+if __name__ == "__main__":
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_login.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx
+from benchmarks.common import percentile, run_server
+from src.database import SessionLocal
+from src.hashing import get_pwd_context
+from src.migrations import migrate
+from src.models import User
+
+PORT = 8766
+USERS = 200
+CONCURRENCY = 50
+POOL_SIZES = [0, 2]
+
+
+def seed():
+    migrate()
+    db = SessionLocal()
+    if not db.query(User).first():
+        hashed = get_pwd_context().hash("password")
+        db.add_all(
+            User(username=f"student{i}", email=f"student{i}@example.com", name=f"Student {i}", hashed_password=hashed)
+            for i in range(USERS)
+        )
+        db.commit()
+    db.close()
+
+
+async def storm(base_url: str) -> dict:
+    queue = asyncio.Queue()
+    for i in range(USERS):
+        queue.put_nowait(i)
+    status_counts = {}
+    probe_latencies = []
+    done = asyncio.Event()
+
+    async def student(http):
+        while not queue.empty():
+            i = queue.get_nowait()
+            response = await http.post("/auth/login", json={"username_or_email": f"student{i}", "password": "password"})
+            status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+
+    async def probe(http):
+        while not done.is_set():
+            start = time.perf_counter()
+            await http.get("/")
+            probe_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.02)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as http:
+        probe_task = asyncio.create_task(probe(http))
+        start = time.perf_counter()
+        await asyncio.gather(*(student(http) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    probe_latencies.sort()
+    return {
+        "logins_per_s": status_counts.get(200, 0) / elapsed,
+        "ok": status_counts.get(200, 0),
+        "rejected": status_counts.get(503, 0),
+        "probe_p50_ms": percentile(probe_latencies, 50) * 1000,
+        "probe_p99_ms": percentile(probe_latencies, 99) * 1000,
+    }
+
+
+def main():
+    seed()
+    print(f"{'pool':>5} {'logins/s':>9} {'ok':>5} {'503':>5} {'GET / p50':>10} {'GET / p99':>10}")
+    for workers in POOL_SIZES:
+        with run_server("app:app", PORT, {"HASH_POOL_WORKERS": str(workers)}) as base_url:
+            result = asyncio.run(storm(base_url))
+        print(f"{workers:>5} {result['logins_per_s']:>9.1f} {result['ok']:>5} {result['rejected']:>5} "
+              f"{result['probe_p50_ms']:>10.1f} {result['probe_p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Vectorized batch rescheduling versus one review() call per item.
+
+Run from backend/:  python -m benchmarks.bench_scheduler
+"""
+import time
+import numpy as np
+from src.scheduler import SCHEDULERS, SchedulerState
+
+SIZES = [1_000, 100_000, 1_000_000]
+LOOP_LIMIT = 10_000  # per-item loop is timed on a sample and extrapolated
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'scheduler':>9} {'items':>9} {'batch ms':>10} {'loop ms':>10}")
+    for name, cls in SCHEDULERS.items():
+        scheduler = cls()
+        for n in SIZES:
+            state = scheduler.review(SchedulerState.empty(n), rng.random(n) < 0.8, np.full(n, np.nan))
+            correct = rng.random(n) < 0.8
+            elapsed = state.interval * rng.uniform(0.5, 1.5, n)
+
+            start = time.perf_counter()
+            scheduler.review(state, correct, elapsed)
+            batch_ms = (time.perf_counter() - start) * 1000
+
+            sample = min(n, LOOP_LIMIT)
+            start = time.perf_counter()
+            for i in range(sample):
+                scheduler.review(SchedulerState(*(col[i:i + 1] for col in state)), correct[i:i + 1], elapsed[i:i + 1])
+            loop_ms = (time.perf_counter() - start) * 1000 * n / sample
+
+            print(f"{name:>9} {n:>9} {batch_ms:>10.1f} {loop_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
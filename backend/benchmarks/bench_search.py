@@ -0,0 +1,129 @@
+"""
+Full-text search latency on a synthetic corpus (default 100k lessons with
+~150-word bodies from a Zipf vocabulary, plus two questions per lesson).
+
+Queries range from rare to very common words, multi-word and prefix
+(search-as-you-type) queries, for a user who has every lesson unlocked and
+one who has 5% unlocked. The LIKE '%term%' scan it replaces is timed once
+for comparison.
+
+Run from backend/:  python -m benchmarks.bench_search [--lessons 100000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import numpy as np
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from src.migrations import migrate
+from src.models import Content, Level, Question, User, UserContentProgress
+from src.search import optimize_search_index, search
+
+VOCABULARY = 20000
+BODY_WORDS = 150
+CHUNK = 5000
+REPEAT = 20
+
+
+def word(rank: int) -> str:
+    # Distinct, pronounceable-ish words; rank 1 is the most frequent
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    letters = []
+    n = rank
+    while True:
+        n, c = divmod(n, len(consonants))
+        n, v = divmod(n, len(vowels))
+        letters.append(consonants[c] + vowels[v])
+        if n == 0:
+            break
+    return "".join(letters)
+
+
+def build(url: str, lessons: int, seed: int = 0):
+    engine = create_engine(url)
+    migrate(engine)
+    rng = np.random.default_rng(seed)
+    words = [word(r) for r in range(VOCABULARY + 1)]
+    with engine.begin() as conn:
+        conn.execute(insert(Level), [{"id": l, "title": f"Level {l}", "order_index": l} for l in range(1, 11)])
+        conn.execute(insert(User), [{"id": u, "username": f"u{u}", "email": f"u{u}@example.com", "name": f"u{u}",
+                                     "hashed_password": "x", "is_active": True} for u in (1, 2)])
+        for start in range(1, lessons + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, lessons + 1))
+            ranks = np.minimum(rng.zipf(1.2, (len(ids), BODY_WORDS + 12)), VOCABULARY)
+            conn.execute(insert(Content), [
+                {"id": c, "title": " ".join(words[r] for r in row[:4]), "level_id": c % 10 + 1, "order_index": c,
+                 "body": " ".join(words[r] for r in row[4:BODY_WORDS + 4])}
+                for c, row in zip(ids, ranks)
+            ])
+            conn.execute(insert(Question), [
+                {"id": 2 * c + j, "content_id": c, "text": " ".join(words[r] for r in row[BODY_WORDS + 4 + 4 * j:][:4])}
+                for c, row in zip(ids, ranks) for j in (0, 1)
+            ])
+        # user 1 has everything unlocked, user 2 every 20th lesson
+        conn.execute(insert(UserContentProgress), [
+            {"user_id": 1, "content_id": c, "available": True, "passed": False, "answered_count": 0, "correct_count": 0}
+            for c in range(1, lessons + 1)
+        ] + [
+            {"user_id": 2, "content_id": c, "available": True, "passed": False, "answered_count": 0, "correct_count": 0}
+            for c in range(1, lessons + 1, 20)
+        ])
+        # as after a bulk import: `python -m src.search optimize`
+        optimize_search_index(conn)
+    engine.dispose()
+    return words
+
+
+async def measure(url: str, queries: dict) -> list:
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+    results = []
+    async with AsyncSession(engine) as db:
+        for label, (q, level) in queries.items():
+            for user_id in (1, 2):
+                timings, hits = [], []
+                for _ in range(REPEAT):
+                    start = time.perf_counter()
+                    hits = await search(db, user_id, q, level, 21, 0)
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                results.append((label, q, user_id, len(hits), statistics.median(timings) * 1000,
+                                timings[int(len(timings) * 0.95) - 1] * 1000))
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lessons", type=int, default=100000)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+    start = time.perf_counter()
+    words = build(url, args.lessons)
+    print(f"built {args.lessons} lessons + index in {time.perf_counter() - start:.1f}s")
+
+    queries = {
+        "rare word": (words[5000], None),
+        "mid word": (words[200], None),
+        "common word": (words[3], None),
+        "two words": (f"{words[20]} {words[300]}", None),
+        "prefix": (words[150][:3], None),
+        "level filter": (words[200], 3),
+    }
+    print(f"{'query':<14} {'terms':<18} {'user':>4} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, q, user_id, n, p50, p95 in asyncio.run(measure(url, queries)):
+        print(f"{label:<14} {q:<18} {user_id:>4} {n:>5} {p50:>8.2f} {p95:>8.2f}")
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        conn.execute(text("SELECT id FROM content WHERE body LIKE :p LIMIT 21"), {"p": f"%{words[5000]}%"}).all()
+        print(f"\nLIKE '%{words[5000]}%' on content.body: {(time.perf_counter() - start) * 1000:.1f} ms")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
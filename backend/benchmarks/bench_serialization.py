@@ -0,0 +1,60 @@
+"""
+Serialization cost of a recall/exam payload as it grows:
+
+  stdlib     - hand-built dict -> jsonable_encoder -> json.dumps (the old path)
+  validated  - dict validated against the response model, dumped by pydantic
+               (what FastAPI does for a declared response_model)
+  trusted    - dict rendered directly by FastJSONResponse (orjson), no validation
+
+Run from backend/:  python -m benchmarks.bench_serialization
+"""
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from src.responses import FastJSONResponse
+from src.schemas import RecallOut
+
+SIZES = [1, 20, 100, 1000]
+OPTIONS = 4
+BUDGET = 0.5  # seconds per measurement
+
+
+def payload(n: int) -> dict:
+    return {"due_recall_questions": [
+        {
+            "question_id": q,
+            "text": f"Question {q}: what is the meaning of this sentence in context?",
+            "options": [{"option_id": q * OPTIONS + j, "text": f"Possible answer number {j}"} for j in range(OPTIONS)],
+        }
+        for q in range(n)
+    ]}
+
+
+def timed(fn) -> float:
+    """
+    Mean microseconds per call, repeating for about BUDGET seconds.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < BUDGET:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) * 1e6 / calls
+
+
+def main():
+    adapter = TypeAdapter(RecallOut)
+    print(f"{'questions':>9} {'bytes':>8} {'stdlib us':>10} {'validated us':>13} {'trusted us':>11} {'speedup':>8}")
+    for n in SIZES:
+        data = payload(n)
+        stdlib = timed(lambda: json.dumps(jsonable_encoder(data), ensure_ascii=False,
+                                          separators=(",", ":")).encode("utf-8"))
+        validated = timed(lambda: adapter.dump_json(adapter.validate_python(data)))
+        trusted = timed(lambda: FastJSONResponse(data).body)
+        size = len(FastJSONResponse(data).body)
+        print(f"{n:>9} {size:>8} {stdlib:>10.1f} {validated:>13.1f} {trusted:>11.1f} {stdlib / trusted:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Write throughput of the progress tables against the number of SQLite
+shards (src/shards.py). Worker processes, standing in for app workers,
+grade 5-answer submissions for random users, one transaction each, on the
+users' shards; with one shard every commit queues for the same write lock.
+
+Also times `rebalance` moving a populated database from 1 to 4 shards.
+
+Run from backend/:  python -m benchmarks.bench_shards [--workers 8] [--synchronous FULL]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from src.database import make_engine
+from src.grading import grade_answers
+from src.migrations import migrate
+from src.shards import ProgressShards, Shard, make_shard
+
+QUESTIONS = 200
+ANSWERS = 5
+
+
+def open_shards(directory: str, n: int) -> ProgressShards:
+    # Sessions without the answer event log, which would write to DATABASE_URL
+    main = make_engine(f"sqlite:///{os.path.join(directory, 'main.db')}")
+    main_sessions = sessionmaker(autocommit=False, autoflush=False, bind=main)
+    shards = [Shard(main, main_sessions, None, None, None)]
+    for i in range(1, n):
+        shard = make_shard(f"sqlite:///{os.path.join(directory, f'shard{i}.db')}", main)
+        shards.append(shard._replace(sessionmaker=sessionmaker(autocommit=False, autoflush=False, bind=shard.engine)))
+    return ProgressShards(shards, core_session_factory=main_sessions)
+
+
+def prepare(n: int) -> tuple:
+    directory = tempfile.mkdtemp()
+    engine = make_engine(f"sqlite:///{os.path.join(directory, 'main.db')}")
+    migrate(engine)
+    with sessionmaker(bind=engine)() as db:
+        catalog = seed_catalog(db, QUESTIONS)
+    engine.dispose()
+    open_shards(directory, n).rebalance(log=lambda message: None)
+    return directory, catalog
+
+
+def writer(job: tuple) -> tuple:
+    directory, n, catalog, users, submissions, seed = job
+    shards = open_shards(directory, n)
+    shards.load()
+    rng = random.Random(seed)
+    options = {right: True for _, right, _ in catalog}
+    options.update({wrong: False for _, _, wrong in catalog})
+    started = time.time()
+    for _ in range(submissions):
+        user_id = rng.randint(1, users)
+        picks = rng.sample(catalog, ANSWERS)
+        with shards.session(shards.shard_of(user_id)) as db:
+            grade_answers(db, user_id, [{"question_id": q, "option_id": rng.choice((right, wrong))}
+                                        for q, right, wrong in picks], options, source="recall")
+            db.commit()
+    return started, time.time()
+
+
+def measure(n: int, workers: int, users: int, submissions: int) -> float:
+    directory, catalog = prepare(n)
+    jobs = [(directory, n, catalog, users, submissions, seed) for seed in range(workers)]
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        spans = pool.map(writer, jobs)
+    elapsed = max(end for _, end in spans) - min(start for start, _ in spans)
+    return workers * submissions / elapsed
+
+
+def measure_rebalance(users: int) -> tuple:
+    directory, catalog = prepare(1)
+    shards = open_shards(directory, 1)
+    with shards.session(0) as db:
+        options = {right: True for _, right, _ in catalog}
+        for user_id in range(1, users + 1):
+            grade_answers(db, user_id, [{"question_id": q, "option_id": right} for q, right, _ in catalog[:50]],
+                          options, source="recall")
+        db.commit()
+    start = time.perf_counter()
+    stats = open_shards(directory, 4).rebalance(log=lambda message: None)
+    return stats, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,2,4,8", help="shard counts to compare")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--submissions", type=int, default=300, help="per worker")
+    parser.add_argument("--synchronous", default=None, help="SQLite synchronous pragma, e.g. FULL")
+    args = parser.parse_args()
+    if args.synchronous:
+        # Read by the worker processes' Config
+        os.environ["SQLITE_SYNCHRONOUS"] = args.synchronous
+
+    # Shards add write locks, not CPU: expect scaling only up to the cores available
+    print(f"{args.workers} workers x {args.submissions} submissions of {ANSWERS} answers, {args.users} users, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'shards':>6} {'commits/s':>10} {'speed-up':>9}")
+    base = None
+    for n in (int(n) for n in args.shards.split(",")):
+        rate = measure(n, args.workers, args.users, args.submissions)
+        base = base or rate
+        print(f"{n:>6} {rate:>10.0f} {rate / base:>8.2f}x")
+
+    stats, seconds = measure_rebalance(args.users)
+    print(f"\nrebalance 1 -> 4 shards, {args.users} users: {stats['rows']} rows, "
+          f"{stats['buckets']} buckets in {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
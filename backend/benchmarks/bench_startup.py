@@ -0,0 +1,75 @@
+"""
+Worker boot time: starts `uvicorn app:app` against a migrated database and
+measures how long it takes until /health/ready answers 200, with and
+without the warm-up phase, plus the worker's own per-phase timings.
+Exits non-zero when a boot exceeds the budget (BOOT_BUDGET_SECONDS).
+
+Run from backend/:  python -m benchmarks.bench_startup
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+PORT = 8767
+RUNS = 3
+
+
+def boot_once(env: dict) -> tuple:
+    """
+    Seconds from spawning the worker until it reports ready, and the boot
+    state it reported.
+    """
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(PORT), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("worker exited during startup")
+            try:
+                response = httpx.get(f"http://127.0.0.1:{PORT}/health/ready")
+                if response.status_code == 200:
+                    return time.perf_counter() - start, response.json()
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="coeus_boot_")
+    env = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'boot.db')}",
+        "ANSWER_SPOOL_DIR": os.path.join(workdir, "spool"),
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or "bench",
+        "ALGORITHM": os.environ.get("ALGORITHM") or "HS256",
+    }
+    subprocess.run([sys.executable, "-m", "src.migrations", "upgrade"], env={**os.environ, **env},
+                   check=True, stdout=subprocess.DEVNULL)
+
+    over_budget = False
+    print(f"{'warmup':<8} {'to ready s':>10} {'import':>8} {'construct':>10} {'schema':>8} {'warmup':>8} {'budget':>8}")
+    for warmup in ("false", "true"):
+        runs = [boot_once({**env, "WARMUP": warmup}) for _ in range(RUNS)]
+        wall = statistics.median(r[0] for r in runs)
+        state = runs[-1][1]
+        phases = state["phases"]
+        print(f"{warmup:<8} {wall:>10.3f} {phases['import']:>8.3f} {phases['construct']:>10.3f} "
+              f"{phases['schema']:>8.3f} {phases.get('warmup', 0):>8.3f} {state['budget_seconds']:>8.1f}")
+        over_budget |= any(r[1]["boot_seconds"] > r[1]["budget_seconds"] for r in runs)
+
+    if over_budget:
+        print("boot time over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
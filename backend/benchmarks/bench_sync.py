@@ -0,0 +1,63 @@
+"""
+Replaying answers queued offline: one request (transaction) per answer, as
+the endpoints are called today, against one POST /sync batch. Reports
+statements, commits and wall time per device reconnect, and the cost of
+resending a batch that was already applied (every key a duplicate).
+
+Run from backend/:  python -m benchmarks.bench_sync
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import QueryCounter, make_session, seed_catalog
+from src.grading import grade_answers
+from src.sync import apply_sync_batch
+
+SIZES = [10, 50, 200]
+
+
+def queued(catalog, size: int, prefix: str) -> list:
+    start = datetime.utcnow() - timedelta(hours=2)
+    return [
+        {"key": f"{prefix}-{i}", "kind": "recall", "question_id": qid, "option_id": right if i % 3 else wrong,
+         "answered_at": start + timedelta(seconds=30 * i), "content_id": None, "attempt": None}
+        for i, (qid, right, wrong) in enumerate(catalog[:size])
+    ]
+
+
+def main():
+    engine, SessionLocal = make_session(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'sync.db')}")
+    db = SessionLocal()
+    catalog = seed_catalog(db, max(SIZES))
+    counter = QueryCounter(engine)
+
+    print(f"{'answers':>8} {'mode':<12} {'queries':>8} {'commits':>8} {'ms':>8}")
+    user_id = 0
+    for size in SIZES:
+        user_id += 1
+        events = queued(catalog, size, f"u{user_id}")
+        with counter.measure():
+            start = time.perf_counter()
+            for e in events:
+                grade_answers(db, user_id, [{"question_id": e["question_id"], "option_id": e["option_id"]}],
+                              source="recall", now=e["answered_at"])
+                db.commit()
+            elapsed = (time.perf_counter() - start) * 1000
+        print(f"{size:>8} {'one by one':<12} {counter.count:>8} {size:>8} {elapsed:>8.2f}")
+
+        user_id += 1
+        events = queued(catalog, size, f"u{user_id}")
+        for mode in ("sync", "sync resent"):
+            with counter.measure():
+                start = time.perf_counter()
+                apply_sync_batch(db, user_id, events)
+                db.commit()
+                elapsed = (time.perf_counter() - start) * 1000
+            print(f"{size:>8} {mode:<12} {counter.count:>8} {1:>8} {elapsed:>8.2f}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
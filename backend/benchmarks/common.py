@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from src.migrations import migrate
+from src.models import Content, Level, Option, Question
+
+
+def make_session(url: str = "sqlite://"):
+    """
+    Build a throwaway engine/session for benchmarks, with the schema created.
+    Defaults to an in-memory SQLite database.
+    """
+    engine = create_engine(url, connect_args={"check_same_thread": False} if "sqlite" in url else {})
+    migrate(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_catalog(db, n_questions: int, n_options: int = 4, content_id: int = 1):
+    """
+    Insert one level/content with `n_questions` questions of `n_options`
+    options each (the first option is the correct one).
+    Returns [(question_id, correct_option_id, wrong_option_id), ...].
+    """
+    if not db.get(Level, 1):
+        db.add(Level(id=1, title="Level 1", order_index=1))
+    db.add(Content(id=content_id, title=f"Content {content_id}", level_id=1, order_index=content_id))
+    db.flush()
+
+    questions = [Question(content_id=content_id, text=f"Question {i}") for i in range(n_questions)]
+    db.add_all(questions)
+    db.flush()
+
+    options = []
+    for q in questions:
+        for j in range(n_options):
+            options.append(Option(question_id=q.id, text=f"Option {j}", is_correct=(j == 0)))
+    db.add_all(options)
+    db.commit()
+
+    by_question = {}
+    for opt in options:
+        by_question.setdefault(opt.question_id, []).append(opt.id)
+    return [(qid, opt_ids[0], opt_ids[1]) for qid, opt_ids in by_question.items()]
+
+
+class QueryCounter:
+    """
+    Counts statements sent to the database through an engine.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    @contextmanager
+    def measure(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def run_server(app_path: str, port: int, env: dict = None):
+    """
+    Run `uvicorn <app_path>` in a subprocess on localhost and wait until it
+    accepts connections.
+    """
+    import os
+    import subprocess
+    import sys
+    import time
+    import httpx
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **(env or {})},
+    )
+    try:
+        for _ in range(200):
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/")
+                break
+            except httpx.TransportError:
+                time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
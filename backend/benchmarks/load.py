@@ -0,0 +1,243 @@
+"""
+Load driver replaying student sessions against the app:
+
+    login -> /content/next -> exam -> submit -> recall -> recall submit
+
+Each virtual student runs `--sessions` sessions back to back; `--students`
+of them run concurrently. Per endpoint it reports throughput, p50/p95/p99
+latency and the mean number of DB statements (read from the Server-Timing
+header), and writes everything to a JSON file that a later run can be
+compared against.
+
+The database is generated with benchmarks.synthetic in a temp directory.
+By default the app is driven in-process through httpx's ASGI transport;
+--server runs it in a uvicorn subprocess and goes over localhost instead.
+
+Run from backend/:
+    python -m benchmarks.load --scale 1k --out before.json
+    python -m benchmarks.load --scale 1k --out after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_BCRYPT_ROUNDS = 4
+
+if __name__ == "__main__":
+    # The app reads its configuration at import time, so point it at a scratch
+    # database (and turn on Server-Timing) before anything from src is imported
+    _workdir = tempfile.mkdtemp(prefix="coeus_load_")
+    _pre = argparse.ArgumentParser(add_help=False)
+    _pre.add_argument("--bcrypt-rounds", type=int, default=DEFAULT_BCRYPT_ROUNDS)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(_workdir, 'load.db')}",
+        "METRICS_SERVER_TIMING": "true",
+        "BCRYPT_ROUNDS": str(_pre.parse_known_args()[0].bcrypt_rounds),
+        "ANSWER_SPOOL_DIR": os.path.join(_workdir, "spool"),
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or "load-test-secret",
+        "ALGORITHM": os.environ.get("ALGORITHM") or "HS256",
+        # Virtual students answer at machine speed, far above any human rate limit
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    for _name in ("ASYNC_DATABASE_URL", "READ_REPLICA_URL"):
+        os.environ.pop(_name, None)
+
+from benchmarks.common import percentile, run_server
+from benchmarks.synthetic import PASSWORD, SCALES, create_database
+
+PORT = 8766
+_QUERIES = re.compile(r'queries;desc="(\d+)"')
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}   # endpoint -> [(seconds, status, queries)]
+
+    async def call(self, http, method: str, endpoint: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await http.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        match = _QUERIES.search(response.headers.get("server-timing", ""))
+        self.samples.setdefault(f"{method} {endpoint}", []).append(
+            (elapsed, response.status_code, int(match.group(1)) if match else None))
+        return response
+
+    def summary(self, wall: float) -> dict:
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = sorted(s[0] for s in samples)
+            queries = [s[2] for s in samples if s[2] is not None]
+            endpoints[name] = {
+                "count": len(samples),
+                "errors": sum(1 for s in samples if s[1] >= 400),
+                "throughput_rps": len(samples) / wall,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "queries_mean": sum(queries) / len(queries) if queries else None,
+            }
+        return endpoints
+
+
+async def student_session(http, recorder: Recorder, username: str, scale, rng: random.Random, accuracy: float):
+    response = await recorder.call(http, "POST", "/auth/login", "/auth/login",
+                                   json={"username_or_email": username, "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json().get('access_token', '')}"}
+
+    nxt = await recorder.call(http, "GET", "/content/next", "/content/next", headers=headers)
+    body = nxt.json() if nxt.status_code == 200 else {}
+    content_id = body.get("id") or rng.randint(1, scale.levels * scale.contents_per_level)
+
+    exam = await recorder.call(http, "GET", "/exam/{content_id}", f"/exam/{content_id}",
+                               params={"number_questions": 10}, headers=headers)
+    questions = exam.json().get("questions", []) if exam.status_code == 200 else []
+    await recorder.call(http, "POST", "/exam/{content_id}/submit", f"/exam/{content_id}/submit",
+                        json={"answers": _answer(questions, rng, accuracy)}, headers=headers)
+
+    recall = await recorder.call(http, "GET", "/remember", "/remember", headers=headers)
+    due = recall.json().get("due_recall_questions", []) if recall.status_code == 200 else []
+    if due:
+        await recorder.call(http, "POST", "/remember/submit", "/remember/submit",
+                            json={"answers": _answer(due, rng, accuracy)}, headers=headers)
+
+
+def _answer(questions: list, rng: random.Random, accuracy: float) -> list:
+    # The synthetic curriculum lists the correct option first
+    return [
+        {"question_id": q["question_id"],
+         "option_id": q["options"][0 if rng.random() < accuracy or len(q["options"]) < 2 else 1]["option_id"]}
+        for q in questions if q["options"]
+    ]
+
+
+async def drive(http, scale, students: int, sessions: int, seed: int, accuracy: float) -> dict:
+    recorder = Recorder()
+
+    async def student(i: int):
+        rng = random.Random(seed * 100003 + i)
+        username = f"user{i % scale.users + 1}"
+        for _ in range(sessions):
+            await student_session(http, recorder, username, scale, rng, accuracy)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(student(i) for i in range(students)))
+    wall = time.perf_counter() - start
+    return {
+        "wall_seconds": wall,
+        "sessions_per_second": students * sessions / wall,
+        "endpoints": recorder.summary(wall),
+    }
+
+
+async def run_in_process(scale, args) -> dict:
+    import httpx
+    from app import app
+    # Unhandled errors become 500s and are counted, as they would be over HTTP
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as http:
+        return await drive(http, scale, args.students, args.sessions, args.seed, args.accuracy)
+
+
+async def run_over_http(base_url: str, scale, args) -> dict:
+    import httpx
+    limits = httpx.Limits(max_connections=args.students, max_keepalive_connections=args.students)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as http:
+        return await drive(http, scale, args.students, args.sessions, args.seed, args.accuracy)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: dict, baseline: dict):
+    """
+    Print per-endpoint changes against a previous result file.
+    """
+    print(f"\n{'endpoint':<32} {'p50 ms':>16} {'p95 ms':>16} {'req/s':>16} {'queries':>10}")
+    for name, new in result["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old is None:
+            print(f"{name:<32} (new endpoint)")
+            continue
+
+        def delta(key):
+            if not old[key]:
+                return f"{new[key]:>8.1f}        "
+            return f"{new[key]:>8.1f} {100 * (new[key] - old[key]) / old[key]:>+6.1f}%"
+
+        queries = "" if new["queries_mean"] is None or old["queries_mean"] is None else \
+            f"{old['queries_mean']:.1f}->{new['queries_mean']:.1f}"
+        print(f"{name:<32} {delta('p50_ms')} {delta('p95_ms')} {delta('throughput_rps')} {queries:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--students", type=int, default=20, help="concurrent virtual students")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions per student")
+    parser.add_argument("--accuracy", type=float, default=0.8, help="share of answers that are correct")
+    parser.add_argument("--bcrypt-rounds", type=int, default=DEFAULT_BCRYPT_ROUNDS,
+                        help="cost factor for login (production uses BCRYPT_ROUNDS, default 12)")
+    parser.add_argument("--server", action="store_true", help="run uvicorn and drive it over localhost")
+    parser.add_argument("--out", default="load_results.json")
+    parser.add_argument("--compare", help="previous result file to diff against")
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    url = os.environ["DATABASE_URL"]
+
+    start = time.perf_counter()
+    data = create_database(url, scale, args.seed)
+    print(f"generated {data} in {time.perf_counter() - start:.1f}s")
+
+    if args.server:
+        with run_server("app:app", PORT) as base_url:
+            result = asyncio.run(run_over_http(base_url, scale, args))
+    else:
+        result = asyncio.run(run_in_process(scale, args))
+
+    result["meta"] = {
+        "scale": args.scale,
+        "seed": args.seed,
+        "students": args.students,
+        "sessions": args.sessions,
+        "mode": "server" if args.server else "in-process",
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "data": data,
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+    print(f"\n{result['sessions_per_second']:.1f} sessions/s over {result['wall_seconds']:.1f}s")
+    print(f"{'endpoint':<32} {'count':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, s in result["endpoints"].items():
+        queries = "-" if s["queries_mean"] is None else f"{s['queries_mean']:.1f}"
+        print(f"{name:<32} {s['count']:>6} {s['errors']:>4} {s['throughput_rps']:>8.1f} "
+              f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {queries:>8}")
+
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
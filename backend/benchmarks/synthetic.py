@@ -0,0 +1,176 @@
+"""
+Deterministic synthetic data: a curriculum (levels, contents, questions,
+options) plus users with realistic UserQuestionProgress, at a named scale.
+
+The same seed, scale and anchor time always produce the same rows. Ids are
+assigned explicitly and the first option of every question is the correct
+one, so load drivers can answer questions without reading the database.
+
+Users work through the curriculum in order: each has answered the first m
+questions (m log-normally distributed around the scale's mean), with
+per-user ability drawn from Beta(6, 2), and review schedules spread so that
+roughly a fifth of their items are due.
+
+Run from backend/:
+    python -m benchmarks.synthetic --scale 100k --url sqlite:////tmp/coeus_100k.db
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from src.hashing import get_pwd_context
+from src.migrations import migrate
+from src.models import (CatalogVersion, Content, Level, Option, Question, User, UserContentProgress,
+                        UserQuestionProgress)
+
+
+class Scale(NamedTuple):
+    levels: int
+    contents_per_level: int
+    questions_per_content: int
+    options_per_question: int
+    users: int
+    progress_per_user: int   # mean answered questions per user
+
+    @property
+    def questions(self) -> int:
+        return self.levels * self.contents_per_level * self.questions_per_content
+
+
+# Named by the approximate number of UserQuestionProgress rows
+SCALES = {
+    "1k": Scale(2, 5, 20, 4, 10, 100),
+    "100k": Scale(5, 20, 50, 4, 200, 500),
+    "1m": Scale(10, 50, 40, 4, 1000, 1000),
+}
+
+PASSWORD = "password"
+CHUNK = 10000
+
+
+def _insert(db: Session, model, rows):
+    rows = list(rows)
+    for start in range(0, len(rows), CHUNK):
+        db.execute(insert(model), rows[start:start + CHUNK])
+
+
+def option_id(question_id: int, position: int, options_per_question: int) -> int:
+    return (question_id - 1) * options_per_question + position + 1
+
+
+def generate(db: Session, scale: Scale, seed: int = 0, now: datetime = None) -> dict:
+    """
+    Fill an empty schema. Returns a summary with row counts.
+    `now` anchors all dates (defaults to the current hour).
+    """
+    rng = np.random.default_rng(seed)
+    now = now or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    # Curriculum
+    _insert(db, Level, ({"id": l, "key": f"L{l}", "title": f"Level {l}", "order_index": l}
+                        for l in range(1, scale.levels + 1)))
+    n_contents = scale.levels * scale.contents_per_level
+    _insert(db, Content, (
+        {"id": c, "key": f"C{c}", "level_id": (c - 1) // scale.contents_per_level + 1,
+         "title": f"Content {c}", "body": f"Lesson text for content {c}.", "order_index": c}
+        for c in range(1, n_contents + 1)
+    ))
+    _insert(db, Question, (
+        {"id": q, "key": f"Q{q}", "content_id": (q - 1) // scale.questions_per_content + 1,
+         "text": f"Question {q}?"}
+        for q in range(1, scale.questions + 1)
+    ))
+    k = scale.options_per_question
+    _insert(db, Option, (
+        {"id": option_id(q, j, k), "key": f"Q{q}#{j}", "question_id": q,
+         "text": f"Answer {j} to {q}", "is_correct": j == 0}
+        for q in range(1, scale.questions + 1) for j in range(k)
+    ))
+    db.merge(CatalogVersion(id=1, version=1))
+
+    # Users (one bcrypt hash shared by everyone; hashing per user would dominate setup)
+    hashed = get_pwd_context().hash(PASSWORD)
+    _insert(db, User, (
+        {"id": u, "username": f"user{u}", "email": f"user{u}@example.com", "name": f"User {u}",
+         "hashed_password": hashed, "is_active": True}
+        for u in range(1, scale.users + 1)
+    ))
+
+    # How far each user got: log-normal around the mean, capped at the curriculum
+    answered = rng.lognormal(0, 0.6, scale.users)
+    answered = np.clip(np.round(answered / answered.mean() * scale.progress_per_user), 1, scale.questions).astype(int)
+    ability = rng.beta(6, 2, scale.users)
+
+    progress_rows = 0
+    for u in range(scale.users):
+        m = int(answered[u])
+        attempts = 1 + rng.poisson(2, m)
+        times_correct = rng.binomial(attempts, ability[u])
+        interval = rng.lognormal(1.5, 1.0, m)                     # days
+        last_review = rng.uniform(0, 1.25, m) * interval          # days ago; ~20% past due
+        ease = np.clip(rng.normal(2.5, 0.25, m), 1.3, None)
+        last_correct = rng.random(m) < ability[u]
+        _insert(db, UserQuestionProgress, (
+            {
+                "user_id": u + 1,
+                "question_id": q + 1,
+                "last_answer_correct": bool(last_correct[q]),
+                "times_correct": int(times_correct[q]),
+                "times_incorrect": int(attempts[q] - times_correct[q]),
+                "ease": float(ease[q]),
+                "interval_days": float(interval[q]),
+                "repetitions": int(times_correct[q]),
+                "last_review_date": now - timedelta(days=float(last_review[q])),
+                "next_review_date": now + timedelta(days=float(interval[q] - last_review[q])),
+            }
+            for q in range(m)
+        ))
+        progress_rows += m
+
+        frontier = (m - 1) // scale.questions_per_content + 1
+        _insert(db, UserContentProgress, (
+            {"user_id": u + 1, "content_id": c, "answered_count": 0, "correct_count": 0,
+             "passed": c < frontier, "available": True}
+            for c in range(1, frontier + 1)
+        ))
+    db.commit()
+
+    return {
+        "levels": scale.levels,
+        "contents": n_contents,
+        "questions": scale.questions,
+        "options": scale.questions * k,
+        "users": scale.users,
+        "progress_rows": progress_rows,
+    }
+
+
+def create_database(url: str, scale: Scale, seed: int = 0, now: datetime = None) -> dict:
+    """
+    Create the schema at `url` and fill it.
+    """
+    engine = create_engine(url)
+    migrate(engine)
+    with Session(engine) as db:
+        summary = generate(db, scale, seed, now)
+    engine.dispose()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", required=True, help="database URL; the schema must be empty")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = create_database(args.url, SCALES[args.scale], args.seed)
+    print(summary, f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,104 @@ class Config:
     Adjust the database URI and SECRET_KEY for production.
     """
     DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///coeus.db")
+    # Defaults to DATABASE_URL with the async driver (aiosqlite/asyncpg) swapped in
+    ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+    # Optional read replica for the read-only question-delivery endpoints
+    READ_REPLICA_URL = os.environ.get("READ_REPLICA_URL")
+
+    # Connection pool (server databases: Postgres/MySQL)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # SQLite pragmas applied on every new connection
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
     SECRET_KEY = os.getenv('SECRET_KEY')
     ALGORITHM = os.getenv('ALGORITHM')
+    # Password hashing: bcrypt cost factor, size of the dedicated hashing process pool
+    # (0 = hash in the default thread executor) and how many hashes may be pending
+    # before requests are rejected with 503
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    HASH_POOL_WORKERS = int(os.getenv('HASH_POOL_WORKERS', min(2, os.cpu_count() or 1)))
+    HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', 32))
+    # Authenticated-principal cache used by get_current_user. Each worker has its own, so a
+    # deactivation or password change on one worker reaches the others within the TTL
+    AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 10000))
+    AUTH_CACHE_TTL_SECONDS = float(os.getenv('AUTH_CACHE_TTL_SECONDS', 300))
+    # Build the principal from token claims alone (no DB lookup at all); deactivation
+    # and password changes then only take effect on the worker that made them, and on
+    # the others when the token expires
+    AUTH_TRUST_TOKEN_CLAIMS = os.getenv('AUTH_TRUST_TOKEN_CLAIMS', 'false').lower() == 'true'
+    # Comma-separated usernames allowed to use the curriculum import/export endpoints
+    ADMIN_USERNAMES = {u.strip() for u in os.getenv('ADMIN_USERNAMES', '').split(',') if u.strip()}
+    # How often (seconds) each worker re-reads the catalog version to pick up content changes
+    CATALOG_VERSION_CHECK_SECONDS = float(os.getenv('CATALOG_VERSION_CHECK_SECONDS', 5))
+    # Request metrics (/metrics): Server-Timing response header on/off, and statements
+    # slower than SLOW_QUERY_MS are kept (last SLOW_QUERY_SAMPLES) at /metrics/slow-queries
+    METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'false').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_SAMPLES = int(os.getenv('SLOW_QUERY_SAMPLES', 50))
+    # Answer event log: where each worker spools events before they are written, and when
+    # the write-behind buffer flushes (batch size / seconds). Spool writes survive a process
+    # crash; set ANSWER_SPOOL_FSYNC to also survive power loss, at a cost per request
+    ANSWER_SPOOL_DIR = os.getenv('ANSWER_SPOOL_DIR', 'answer_spool')
+    ANSWER_FLUSH_SIZE = int(os.getenv('ANSWER_FLUSH_SIZE', 500))
+    ANSWER_FLUSH_INTERVAL_SECONDS = float(os.getenv('ANSWER_FLUSH_INTERVAL_SECONDS', 1.0))
+    ANSWER_SPOOL_FSYNC = os.getenv('ANSWER_SPOOL_FSYNC', 'false').lower() == 'true'
+    # HTTP caching of lessons (GET /content/{id}): how long clients may reuse one without
+    # revalidating (0 = always revalidate with the ETag), and the body size from which
+    # gzip/brotli variants are precomputed and served instead of the plain JSON, and the
+    # memory each worker keeps for rendered lessons (least recently used ones are dropped)
+    CONTENT_CACHE_MAX_AGE_SECONDS = int(os.getenv('CONTENT_CACHE_MAX_AGE_SECONDS', 0))
+    PRECOMPRESS_MIN_BYTES = int(os.getenv('PRECOMPRESS_MIN_BYTES', 1024))
+    CONTENT_RENDER_CACHE_BYTES = int(os.getenv('CONTENT_RENDER_CACHE_BYTES', 64 * 1024 * 1024))
+    # Worker startup: apply pending schema migrations at boot instead of as a deploy step
+    # (only for single-worker setups), warm pools/caches before reporting ready, and the
+    # boot time (process start to ready) above which a warning is logged
+    MIGRATE_ON_STARTUP = os.getenv('MIGRATE_ON_STARTUP', 'false').lower() == 'true'
+    WARMUP = os.getenv('WARMUP', 'true').lower() == 'true'
+    WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', 2))
+    BOOT_BUDGET_SECONDS = float(os.getenv('BOOT_BUDGET_SECONDS', 5))
+    # Per-client token-bucket rate limits (requests per minute and burst size) for submit
+    # endpoints and hot reads. State is per worker unless RATE_LIMIT_REDIS_URL points all
+    # workers at a shared Redis; RATE_LIMIT_MAX_KEYS bounds the in-process buckets
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL')
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    RATE_LIMIT_SUBMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_SUBMIT_PER_MINUTE', 20))
+    RATE_LIMIT_SUBMIT_BURST = int(os.getenv('RATE_LIMIT_SUBMIT_BURST', 5))
+    RATE_LIMIT_READ_PER_MINUTE = float(os.getenv('RATE_LIMIT_READ_PER_MINUTE', 120))
+    RATE_LIMIT_READ_BURST = int(os.getenv('RATE_LIMIT_READ_BURST', 30))
+    # Offline sync (POST /sync): most answers per batch, how far back a client timestamp is
+    # trusted (older ones are clamped), and how long applied idempotency keys are remembered
+    SYNC_MAX_EVENTS = int(os.getenv('SYNC_MAX_EVENTS', 500))
+    SYNC_MAX_CLIENT_AGE_DAYS = float(os.getenv('SYNC_MAX_CLIENT_AGE_DAYS', 30))
+    SYNC_RECEIPT_RETENTION_DAYS = float(os.getenv('SYNC_RECEIPT_RETENTION_DAYS', 90))
+    # Background jobs (src/jobs.py): on/off, the lock file that elects the one worker running
+    # them (Postgres uses an advisory lock instead), the hour (UTC) of the nightly jobs, how
+    # often the leader checks what is due, and users per chunk / pause between chunks, which
+    # bound how long a job holds the database at a time
+    JOBS_ENABLED = os.getenv('JOBS_ENABLED', 'true').lower() == 'true'
+    JOBS_LOCK_FILE = os.getenv('JOBS_LOCK_FILE', 'coeus-jobs.lock')
+    JOBS_NIGHTLY_HOUR_UTC = int(os.getenv('JOBS_NIGHTLY_HOUR_UTC', 2))
+    JOBS_TICK_SECONDS = float(os.getenv('JOBS_TICK_SECONDS', 30))
+    JOBS_CHUNK_USERS = int(os.getenv('JOBS_CHUNK_USERS', 500))
+    JOBS_CHUNK_PAUSE_SECONDS = float(os.getenv('JOBS_CHUNK_PAUSE_SECONDS', 0.05))
+    # Per-user progress storage split over more SQLite files (src/shards.py): comma-separated
+    # database URLs of the extra shards, which hold the users `python -m src.shards rebalance`
+    # assigns to them; shard 0 is DATABASE_URL. Postgres uses hash partitions instead
+    PROGRESS_SHARD_URLS = os.getenv('PROGRESS_SHARD_URLS', '')
+    # Full-text search (src/search.py): rank only the newest N matches of a query, trading
+    # exact ranking of very common words for a bounded cost; 0 ranks every match
+    SEARCH_RANK_WINDOW = int(os.getenv('SEARCH_RANK_WINDOW', 0))
+    # Spaced-repetition algorithm used when grading answers: "sm2" or "fsrs"
+    SCHEDULER = os.getenv('SCHEDULER', 'sm2')
 
 #
 #
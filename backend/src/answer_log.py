@@ -0,0 +1,441 @@
+"""
+Append-only answer event log.
+
+Graded answers are staged on the session, handed to a write-behind buffer
+when it commits, spooled to a local file and inserted into answer_event in
+batches. UserQuestionProgress stays the materialized view the request paths
+read; rebuild_progress() recomputes it from the log.
+
+Run from backend/:
+    python -m src.answer_log recover            # replay spools of dead workers
+    python -m src.answer_log rebuild [--user 1]  # recompute progress from the log
+"""
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from itertools import groupby
+from typing import Optional
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from config import Config
+from src.database import SessionLocal, dialect_insert
+from src.item_stats import apply_events
+from src.learning_state import rebuild_learning_state
+from src.models import AnswerEvent, UserQuestionProgress
+from src.scheduler import SchedulerState, get_scheduler, to_columns
+from src.shards import shards
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows): spool recovery assumes a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("exam", "recall", "review", "unit_exam")
+
+
+def _lock(f) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _parse(line: str) -> dict:
+    row = json.loads(line)
+    row["answered_at"] = datetime.fromisoformat(row["answered_at"])
+    return row
+
+
+def _unstored(db: Session, rows: list) -> list:
+    existing = set(db.scalars(select(AnswerEvent.event_id).where(
+        AnswerEvent.event_id.in_([row["event_id"] for row in rows]))))
+    return [row for row in rows if row["event_id"] not in existing]
+
+
+def insert_events(db: Session, rows: list, replay: bool = False):
+    """
+    Insert answer_event rows and fold them into the item statistics.
+    With `replay`, event_ids that are already stored are skipped, so
+    replaying a spool file twice is harmless. Does not commit.
+    """
+    if replay:
+        rows = _unstored(db, rows)
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    if insert is not None:
+        db.execute(insert(AnswerEvent.__table__).on_conflict_do_nothing(index_elements=["event_id"]), rows)
+    else:
+        db.execute(AnswerEvent.__table__.insert(), rows if replay else _unstored(db, rows))
+    apply_events(db, rows)
+
+
+class AnswerEventBuffer:
+    """
+    Write-behind buffer for answer events.
+
+    append() only writes the events to a local spool file and keeps them in
+    memory; a background thread inserts them in batches when the buffer
+    reaches `flush_size` or every `flush_interval` seconds. On flush the
+    spool file is sealed (renamed) and deleted once its batch is committed.
+    Sealed files whose insert failed, and spool files left behind by a
+    crashed worker, are replayed by recover(). Each worker holds an advisory
+    lock on the files it owns, so workers never replay each other's live spool.
+    """
+
+    def __init__(self, spool_dir: str, flush_size: int, flush_interval: float, fsync: bool = False,
+                 session_factory=SessionLocal):
+        self.spool_dir = spool_dir
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._spool = None
+        self._seq = 0
+        self._thread = None
+        self._stopping = False
+        self.appended = 0
+        self.flushed = 0
+        self.failed_flushes = 0
+
+    def _open_spool(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._seq += 1
+        path = os.path.join(self.spool_dir, f"answers-{os.getpid()}-{self._seq}.open")
+        self._spool = open(path, "a", encoding="utf-8")
+        _lock(self._spool)
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="answer-log-flusher", daemon=True)
+        self._thread.start()
+        # Scripts and test clients never run the app's shutdown hook
+        atexit.register(self.close)
+
+    def append(self, rows: list):
+        """
+        Queue answer_event rows (dicts) for insertion. Returns once they are
+        in the spool file.
+        """
+        if not rows:
+            return
+        lines = "".join(json.dumps(row, default=datetime.isoformat) + "\n" for row in rows)
+        with self._lock:
+            if self._spool is None:
+                self._open_spool()
+            self._spool.write(lines)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._pending.extend(rows)
+            self.appended += len(rows)
+            if self._thread is None:
+                self._start()
+            if len(self._pending) >= self.flush_size:
+                self._wake.set()
+
+    def flush(self) -> int:
+        """
+        Insert everything buffered so far. Returns the number of events written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, []
+                spool, self._spool = self._spool, None
+                sealed = spool.name[:-len(".open")] + ".sealed"
+                # Renamed while still locked, so recover() cannot pick it up mid-flush
+                os.rename(spool.name, sealed)
+            try:
+                db = self.session_factory()
+                try:
+                    insert_events(db, batch)
+                    db.commit()
+                finally:
+                    db.close()
+                os.remove(sealed)
+            except Exception:
+                self.failed_flushes += 1
+                logger.exception("answer log flush failed; %d events kept in %s", len(batch), sealed)
+                return 0
+            finally:
+                spool.close()
+            self.flushed += len(batch)
+            return len(batch)
+
+    def recover(self) -> int:
+        """
+        Replay spool files that no live worker owns: sealed files whose flush
+        failed and files left by crashed workers. Returns the events replayed.
+        """
+        replayed = 0
+        with self._flush_lock:
+            own = self._spool.name if self._spool is not None else None
+            paths = sorted(glob.glob(os.path.join(self.spool_dir, "answers-*.sealed"))
+                           + glob.glob(os.path.join(self.spool_dir, "answers-*.open")))
+            for path in paths:
+                if path == own:
+                    continue
+                try:
+                    f = open(path, "r", encoding="utf-8")
+                except FileNotFoundError:
+                    continue
+                with f:
+                    if not _lock(f):
+                        continue
+                    rows = []
+                    for line in f:
+                        try:
+                            rows.append(_parse(line))
+                        except ValueError:
+                            # A line torn by the crash (or a blank one): nothing to replay
+                            if line.strip():
+                                logger.warning("skipping unreadable line in %s", path)
+                    try:
+                        db = self.session_factory()
+                        try:
+                            insert_events(db, rows, replay=True)
+                            db.commit()
+                        finally:
+                            db.close()
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except Exception:
+                        logger.exception("answer log recovery failed for %s", path)
+                        continue
+                replayed += len(rows)
+        return replayed
+
+    def _run(self):
+        ticks = 0
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            ticks += 1
+            # Retry failed batches now and then
+            if self.failed_flushes and ticks % 30 == 0:
+                self.recover()
+
+    def close(self):
+        """
+        Stop the flusher thread and write out whatever is still buffered.
+        """
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "appended": self.appended,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+answer_buffer = AnswerEventBuffer(
+    Config.ANSWER_SPOOL_DIR,
+    flush_size=Config.ANSWER_FLUSH_SIZE,
+    flush_interval=Config.ANSWER_FLUSH_INTERVAL_SECONDS,
+    fsync=Config.ANSWER_SPOOL_FSYNC,
+)
+
+
+# ----------------------------
+# Recording from grading
+# ----------------------------
+
+def queue_answer_events(db: Session, user_id: int, graded: list, source: str, now: datetime):
+    """
+    Stage one event per graded answer on the session. They reach the buffer
+    when the session commits and are dropped if it rolls back, so the log
+    never contains answers whose grading was not stored.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"unknown answer source {source!r}")
+    if not graded or not db.info.get("answer_log"):
+        return
+    db.info.setdefault("answer_events", []).extend(
+        {
+            "event_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "question_id": g.question_id,
+            "option_id": g.option_id,
+            "correct": g.correct,
+            "source": source,
+            "answered_at": now,
+        }
+        for g in graded
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_answer_events(session):
+    events = session.info.pop("answer_events", None)
+    if events:
+        answer_buffer.append(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_answer_events(session):
+    session.info.pop("answer_events", None)
+
+
+def shutdown_answer_log():
+    answer_buffer.close()
+
+
+# ----------------------------
+# Progress projection
+# ----------------------------
+
+def project_progress(events: list) -> list:
+    """
+    Fold (user_id, question_id, answered_at, correct) tuples, sorted by
+    user, question and time, into UserQuestionProgress column dicts.
+
+    Answers sharing a timestamp came from one submission and count as one
+    review, exactly as record_progress folds them. The schedule is replayed
+    through the current scheduler one review step at a time, every item's
+    n-th review in the same vectorized call.
+    """
+    items = []      # (user_id, question_id)
+    counts = []     # [times_correct, times_incorrect]
+    reviews = []    # per item: [(answered_at, last correct), ...]
+    for (user_id, question_id), rows in groupby(events, key=lambda e: (e[0], e[1])):
+        correct = incorrect = 0
+        steps = []
+        for answered_at, group in groupby(rows, key=lambda e: e[2]):
+            last = None
+            for e in group:
+                correct += bool(e[3])
+                incorrect += not e[3]
+                last = bool(e[3])
+            steps.append((answered_at, last))
+        items.append((user_id, question_id))
+        counts.append((correct, incorrect))
+        reviews.append(steps)
+    if not items:
+        return []
+
+    scheduler = get_scheduler()
+    n = len(items)
+    state = SchedulerState.empty(n)
+    lengths = np.array([len(steps) for steps in reviews])
+    last_review = [None] * n
+    for step in range(int(lengths.max())):
+        idx = np.flatnonzero(lengths > step)
+        correct = np.array([reviews[i][step][1] for i in idx], dtype=bool)
+        elapsed = np.array([
+            np.nan if last_review[i] is None
+            else (reviews[i][step][0] - last_review[i]).total_seconds() / 86400
+            for i in idx
+        ])
+        new = scheduler.review(SchedulerState(*(field[idx] for field in state)), correct, elapsed)
+        for field, new_field in zip(state, new):
+            field[idx] = new_field
+        for i in idx:
+            last_review[i] = reviews[i][step][0]
+
+    rows = []
+    for i, (user_id, question_id) in enumerate(items):
+        schedule = to_columns(SchedulerState(*(field[i:i + 1] for field in state)), last_review[i])[0]
+        rows.append({
+            "user_id": user_id,
+            "question_id": question_id,
+            "last_answer_correct": reviews[i][-1][1],
+            "times_correct": counts[i][0],
+            "times_incorrect": counts[i][1],
+            **schedule,
+        })
+    return rows
+
+
+def rebuild_progress(db: Session, user_ids: Optional[list] = None, chunk_users: int = 500) -> int:
+    """
+    Recompute UserQuestionProgress (counters and schedule) and the learning
+    state from the answer log, for the given users or everyone in the log,
+    on each user's progress shard. Progress rows with no logged answers are
+    left alone. Commits per chunk of users and shard. Returns the number of progress rows written.
+    """
+    if user_ids is None:
+        user_ids = list(db.scalars(select(AnswerEvent.user_id).distinct().order_by(AnswerEvent.user_id)))
+    written = 0
+    for start in range(0, len(user_ids), chunk_users):
+        chunk = user_ids[start:start + chunk_users]
+        events = db.execute(
+            select(AnswerEvent.user_id, AnswerEvent.question_id, AnswerEvent.answered_at, AnswerEvent.correct)
+            .where(AnswerEvent.user_id.in_(chunk))
+            .order_by(AnswerEvent.user_id, AnswerEvent.question_id, AnswerEvent.answered_at, AnswerEvent.id)
+            .execution_options(yield_per=10000)
+        ).all()
+        rows = project_progress(events)
+        for shard, users in shards.group(chunk).items():
+            with shards.session(shard, db) as shard_db:
+                on_shard = set(users)
+                _write_projection(shard_db, [row for row in rows if row["user_id"] in on_shard])
+                for user_id in users:
+                    rebuild_learning_state(shard_db, user_id)
+                shard_db.commit()
+        written += len(rows)
+    return written
+
+
+def _write_projection(db: Session, rows: list):
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    if insert is None:
+        for row in rows:
+            db.merge(UserQuestionProgress(**row))
+        return
+    stmt = insert(UserQuestionProgress.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "question_id"],
+        set_={column: stmt.excluded[column] for column in rows[0] if column not in ("user_id", "question_id")},
+    )
+    db.execute(stmt, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("recover", help="replay spool files left by stopped workers")
+    rebuild = sub.add_parser("rebuild", help="recompute progress from the log")
+    rebuild.add_argument("--user", type=int, action="append", dest="user_ids", help="repeatable; default: all users")
+    args = parser.parse_args()
+
+    if args.command == "recover":
+        print(f"replayed {answer_buffer.recover()} events")
+        return
+    db = SessionLocal()
+    try:
+        print(f"rebuilt {rebuild_progress(db, args.user_ids)} progress rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
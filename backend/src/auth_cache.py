@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from config import Config
+
+
+class Principal(NamedTuple):
+    """
+    Slim, immutable view of an authenticated user. Safe to share between
+    requests, unlike an ORM User bound to a session.
+    """
+    id: int
+    username: str
+    email: Optional[str]
+    name: Optional[str]
+    is_active: bool
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.username, user.email, user.name, bool(user.is_active), user.token_version or 0)
+
+
+class PrincipalCache:
+    """
+    Bounded LRU cache with a per-entry TTL, keyed on the token subject
+    (user id when the token carries one, otherwise the username). Also
+    remembers the token version each invalidated user was revoked to, so
+    tokens checked from their claims alone can be refused on this worker.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._revoked = OrderedDict()  # user id -> oldest token version still valid
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Optional[Principal]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, principal: Principal):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, principal)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int, token_version: Optional[int] = None):
+        """
+        Drop every cached entry for a user. Rare (deactivation, password
+        change), so a scan is fine. With `token_version`, older tokens of
+        the user are also refused by `revoked`.
+        """
+        with self._lock:
+            for key in [k for k, (_, p) in self._data.items() if p.id == user_id]:
+                del self._data[key]
+            if token_version is not None:
+                self._revoked[user_id] = max(token_version, self._revoked.get(user_id, 0))
+                self._revoked.move_to_end(user_id)
+                while len(self._revoked) > max(self.maxsize, 1):
+                    self._revoked.popitem(last=False)
+
+    def revoked(self, user_id: int, token_version: int) -> bool:
+        with self._lock:
+            return token_version < self._revoked.get(user_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._revoked.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+principal_cache = PrincipalCache(Config.AUTH_CACHE_SIZE, Config.AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_principal(user_id: int, token_version: Optional[int] = None):
+    """
+    Drop this worker's cached principal of a user, so its next request
+    re-reads the user row. Other workers notice within AUTH_CACHE_TTL_SECONDS;
+    use revoke_tokens for changes that must also refuse the user's tokens.
+    """
+    principal_cache.invalidate(user_id, token_version)
+
+
+def revoke_tokens(user):
+    """
+    Call whenever a user is deactivated or changes password, before
+    committing: bumps the user's token version, so every access token issued
+    so far is refused (by every worker once the row is read again), and
+    invalidates this worker's cached principal.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    invalidate_principal(user.id, user.token_version)
@@ -0,0 +1,341 @@
+import asyncio
+import threading
+import time
+from typing import NamedTuple, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from config import Config
+from src.database import SessionLocal
+from src.models import CatalogVersion, Content, ContentPrerequisite, Level, Option, Question
+from src.singleflight import SingleFlight
+
+
+class OptionEntry(NamedTuple):
+    id: int
+    question_id: int
+    text: str
+    is_correct: bool
+
+
+class QuestionEntry(NamedTuple):
+    id: int
+    content_id: int
+    text: str
+    options: tuple
+    correct_option_ids: frozenset
+
+
+class ContentEntry(NamedTuple):
+    id: int
+    title: str
+    body: Optional[str]
+    level_id: Optional[int]
+    order_index: Optional[int]
+    question_ids: tuple
+
+
+class LevelEntry(NamedTuple):
+    id: int
+    title: str
+    order_index: Optional[int]
+    content_ids: tuple
+
+
+class Progression:
+    """
+    The unlock graph of the curriculum, precomputed so "what comes next" is
+    a dict lookup rather than a query:
+
+    - `order`: content ids in curriculum order (levels by order_index, then
+      contents by order_index, ids breaking ties; contents without a level
+      last). `position` maps an id to its index, which is how frontiers are
+      compared.
+    - `requires` / `unlocks`: prerequisite edges and their reverse. A
+      content requires its explicit prerequisites (ContentPrerequisite) or,
+      without any, the content before it in its level. The first content of
+      a level requires nothing; it is opened by passing the previous level.
+    - `next_level` / `level_entry`: the level that passing a level's exam
+      opens, and the content a level starts with.
+    """
+    __slots__ = ("order", "position", "requires", "unlocks", "next_level", "level_entry")
+
+    def __init__(self, levels: dict, contents: dict, prerequisites=()):
+        level_ids = sorted(levels, key=lambda lid: (levels[lid].order_index is None, levels[lid].order_index, lid))
+        sequences = [levels[lid].content_ids for lid in level_ids]
+        sequences.append(tuple(
+            c.id for c in sorted(contents.values(), key=lambda c: (c.order_index is None, c.order_index, c.id))
+            if c.level_id not in levels
+        ))
+
+        explicit = {}
+        for content_id, requires_id in prerequisites:
+            if content_id in contents and requires_id in contents and content_id != requires_id:
+                explicit.setdefault(content_id, []).append(requires_id)
+
+        self.order = tuple(cid for sequence in sequences for cid in sequence)
+        self.position = {cid: i for i, cid in enumerate(self.order)}
+        self.requires = {}
+        unlocks = {}
+        for sequence in sequences:
+            for previous, cid in zip((None,) + sequence, sequence):
+                required = tuple(sorted(set(explicit[cid]))) if cid in explicit else \
+                    (previous,) if previous is not None else ()
+                self.requires[cid] = required
+                for requires_id in required:
+                    unlocks.setdefault(requires_id, []).append(cid)
+        self.unlocks = {cid: tuple(dependents) for cid, dependents in unlocks.items()}
+        self.next_level = dict(zip(level_ids, level_ids[1:]))
+        self.level_entry = {lid: levels[lid].content_ids[0] for lid in level_ids if levels[lid].content_ids}
+
+    def furthest(self, content_ids) -> Optional[int]:
+        """
+        The content furthest along in curriculum order, ignoring unknown ids.
+        """
+        known = [cid for cid in content_ids if cid in self.position]
+        return max(known, key=self.position.__getitem__) if known else None
+
+
+class Catalog:
+    """
+    Immutable in-memory snapshot of the curriculum graph:
+    levels -> contents -> questions -> options, keyed by id, plus the
+    progression built from it.
+    A new Catalog is built on every change instead of mutating this one,
+    so readers never need a lock.
+    """
+    __slots__ = ("version", "levels", "contents", "questions", "options", "progression")
+
+    def __init__(self, version: int, levels: dict, contents: dict, questions: dict, options: dict,
+                 prerequisites=()):
+        self.version = version
+        self.levels = levels
+        self.contents = contents
+        self.questions = questions
+        self.options = options
+        self.progression = Progression(levels, contents, prerequisites)
+
+    def level_question_ids(self, level_id: int) -> list:
+        level = self.levels.get(level_id)
+        if level is None:
+            return []
+        return [qid for cid in level.content_ids for qid in self.contents[cid].question_ids]
+
+    def is_correct(self, option_id: int) -> Optional[bool]:
+        """
+        Return whether the option is correct, or None if it does not exist.
+        """
+        option = self.options.get(option_id)
+        return None if option is None else option.is_correct
+
+    def question_payloads(self, question_ids, text_key: str = "text") -> list:
+        """
+        Serialize questions as the { question_id, text, options[] } dicts served
+        to students. Unknown ids are skipped.
+        """
+        data = []
+        for qid in question_ids:
+            q = self.questions.get(qid)
+            if q is None:
+                continue
+            data.append({
+                "question_id": q.id,
+                text_key: q.text,
+                "options": [{"option_id": opt.id, "text": opt.text} for opt in q.options]
+            })
+        return data
+
+
+def _load_entries(db: Session, content_filter=None):
+    """
+    Read contents, questions and options as row tuples (optionally limited
+    to some contents) and build the immutable entries for them.
+    """
+    content_q = select(Content.id, Content.title, Content.body, Content.level_id, Content.order_index)
+    question_q = select(Question.id, Question.content_id, Question.text)
+    option_q = (
+        select(Option.id, Option.question_id, Option.text, Option.is_correct)
+        .join(Question, Question.id == Option.question_id)
+    )
+    if content_filter is not None:
+        content_q = content_q.where(Content.id.in_(content_filter))
+        question_q = question_q.where(Question.content_id.in_(content_filter))
+        option_q = option_q.where(Question.content_id.in_(content_filter))
+
+    options = {}
+    options_by_question = {}
+    for option_id, question_id, text, is_correct in db.execute(option_q.order_by(Option.id)):
+        opt = OptionEntry(option_id, question_id, text, bool(is_correct))
+        options[option_id] = opt
+        options_by_question.setdefault(question_id, []).append(opt)
+
+    questions = {}
+    questions_by_content = {}
+    for question_id, content_id, text in db.execute(question_q.order_by(Question.id)):
+        opts = tuple(options_by_question.get(question_id, ()))
+        questions[question_id] = QuestionEntry(
+            question_id, content_id, text, opts,
+            frozenset(opt.id for opt in opts if opt.is_correct)
+        )
+        questions_by_content.setdefault(content_id, []).append(question_id)
+
+    contents = {}
+    for content_id, title, body, level_id, order_index in db.execute(content_q):
+        contents[content_id] = ContentEntry(
+            content_id, title, body, level_id, order_index,
+            tuple(questions_by_content.get(content_id, ()))
+        )
+    return contents, questions, options
+
+
+def _build_levels(db: Session, contents: dict) -> dict:
+    by_level = {}
+    for c in sorted(contents.values(), key=lambda c: (c.order_index is None, c.order_index, c.id)):
+        if c.level_id is not None:
+            by_level.setdefault(c.level_id, []).append(c.id)
+    return {
+        level_id: LevelEntry(level_id, title, order_index, tuple(by_level.get(level_id, ())))
+        for level_id, title, order_index in db.execute(select(Level.id, Level.title, Level.order_index))
+    }
+
+
+def _load_prerequisites(db: Session) -> list:
+    return db.execute(select(ContentPrerequisite.content_id, ContentPrerequisite.requires_content_id)).all()
+
+
+def load_catalog(db: Session, version: int) -> Catalog:
+    """
+    Load the whole curriculum in five queries.
+    """
+    contents, questions, options = _load_entries(db)
+    return Catalog(version, _build_levels(db, contents), contents, questions, options, _load_prerequisites(db))
+
+
+def _read_version(db: Session) -> int:
+    version = db.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1))
+    return version or 0
+
+
+_catalog: Optional[Catalog] = None
+_checked_at = 0.0
+# Only taken off the event loop: async callers reload in the threadpool (see get_catalog_async)
+_lock = threading.Lock()
+_reloads = SingleFlight("catalog")
+
+
+def _fresh_catalog() -> Optional[Catalog]:
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _checked_at < Config.CATALOG_VERSION_CHECK_SECONDS:
+        return catalog
+    return None
+
+
+def get_catalog(db: Session) -> Catalog:
+    """
+    Return the cached catalog. The stored catalog version is re-read at most
+    every CATALOG_VERSION_CHECK_SECONDS, so a bump made by another worker is
+    picked up within that window; between checks this costs no query.
+    """
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog
+
+    if _on_event_loop():
+        # Sync code run by async handlers (run_sync) must not wait for a
+        # reload holding the lock in another thread: it keeps the current
+        # snapshot, which get_catalog_async refreshes off the loop
+        return _catalog if _catalog is not None else _reload(db)
+    with _lock:
+        catalog = _fresh_catalog()
+        if catalog is not None:
+            return catalog
+        return _reload(db)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _reload(db: Session) -> Catalog:
+    global _catalog, _checked_at
+    version = _read_version(db)
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        catalog = _catalog = load_catalog(db, version)
+    _checked_at = time.monotonic()
+    return catalog
+
+
+async def get_catalog_async(db: AsyncSession) -> Catalog:
+    """
+    get_catalog for async sessions. The reload runs in the threadpool, so
+    the event loop never waits on the lock or the queries, and only one
+    coroutine per worker starts it; the others share its result.
+    """
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog
+    return await _reloads.do("catalog", run_in_threadpool, _reload_sync)
+
+
+def _reload_sync() -> Catalog:
+    # Own session on the main database: the reload is shared, so it must
+    # not depend on the session of whichever request happened to start it
+    with SessionLocal() as db:
+        return get_catalog(db)
+
+
+def bump_catalog_version(db: Session, content_ids=None) -> int:
+    """
+    Call after writing Level/Content/Question/Option rows (in the same
+    transaction, before commit). Bumps the stored version so every worker
+    rebuilds its catalog. If `content_ids` is given, this worker refreshes
+    just those contents instead of reloading everything.
+    """
+    global _catalog, _checked_at
+    result = db.execute(
+        update(CatalogVersion).where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(CatalogVersion(id=1, version=1))
+        db.flush()
+    version = _read_version(db)
+
+    with _lock:
+        if _catalog is not None and content_ids is not None:
+            _catalog = _refresh_contents(db, _catalog, set(content_ids), version)
+            _checked_at = time.monotonic()
+        else:
+            _catalog = None
+    return version
+
+
+def _refresh_contents(db: Session, catalog: Catalog, content_ids: set, version: int) -> Catalog:
+    """
+    Copy-on-write targeted eviction: drop the given contents (and their
+    questions/options) from the snapshot and reload just those from the DB.
+    """
+    contents = {cid: c for cid, c in catalog.contents.items() if cid not in content_ids}
+    questions = {qid: q for qid, q in catalog.questions.items() if q.content_id not in content_ids}
+    options = {oid: o for oid, o in catalog.options.items() if o.question_id in questions}
+
+    new_contents, new_questions, new_options = _load_entries(db, content_ids)
+    contents.update(new_contents)
+    questions.update(new_questions)
+    options.update(new_options)
+    return Catalog(version, _build_levels(db, contents), contents, questions, options, _load_prerequisites(db))
+
+
+def clear_catalog():
+    """
+    Drop the cached catalog so the next request reloads it.
+    """
+    global _catalog
+    with _lock:
+        _catalog = None
@@ -0,0 +1,443 @@
+"""
+Streaming bulk import/export of the curriculum (levels, contents,
+questions, options).
+
+Records are plain dicts with a "type" and a natural "key"; parents are
+referenced by key. NDJSON lines look like:
+
+    {"type": "level", "key": "L1", "title": "Basics", "order_index": 1}
+    {"type": "content", "key": "L1-C1", "level": "L1", "title": "...", "body": "...", "order_index": 1}
+    {"type": "question", "key": "L1-C1-Q1", "content": "L1-C1", "text": "...",
+     "options": [{"text": "...", "correct": true}, {"text": "..."}]}
+    {"type": "prerequisite", "key": "L2-C1<L1-C3", "content": "L2-C1", "requires": "L1-C3"}
+
+CSV files use the same field names as columns, with one "option" row per
+option (type=option, question=<question key>, text, correct, key).
+Nested options without a key get "<question key>#<position>". A content
+record may list its prerequisites inline ("requires": ["L1-C3"]); they get
+the key "<content key><<required key>". Contents without prerequisites
+follow curriculum order (see Progression in src/catalog.py).
+
+Input is read line by line, validated and written in chunks of
+`chunk_size` records, one transaction per chunk, so memory stays flat
+regardless of file size. Re-importing the same file updates rows in place
+(upsert on key), so imports are idempotent.
+
+CLI, run from backend/:
+    python -m src.curriculum_io import curriculum.ndjson
+    python -m src.curriculum_io export curriculum.ndjson
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import logging
+import sys
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from src.catalog import bump_catalog_version
+from src.database import SessionLocal, dialect_insert
+from src.models import Content, ContentPrerequisite, Level, Option, Question
+from src.search import optimize_search_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+
+
+def _int(value):
+    return None if value in (None, "") else int(value)
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE
+
+
+def _str(limit=None):
+    def coerce(value):
+        if value is None:
+            return None
+        value = str(value)
+        if limit is not None and len(value) > limit:
+            raise ValueError(f"longer than {limit} characters")
+        return value
+    return coerce
+
+
+# Per record type: target model, references to other records (record field,
+# referenced model, FK column, required) and {record field: (column, coerce, required)}
+SCHEMA = {
+    "level": {
+        "model": Level, "refs": (),
+        "fields": {"title": ("title", _str(100), True), "order_index": ("order_index", _int, False)},
+    },
+    "content": {
+        "model": Content, "refs": (("level", Level, "level_id", False),),
+        "fields": {
+            "title": ("title", _str(100), True),
+            "body": ("body", _str(), False),
+            "order_index": ("order_index", _int, False),
+        },
+    },
+    "prerequisite": {
+        "model": ContentPrerequisite,
+        "refs": (("content", Content, "content_id", True), ("requires", Content, "requires_content_id", True)),
+        "fields": {},
+    },
+    "question": {
+        "model": Question, "refs": (("content", Content, "content_id", True),),
+        "fields": {"text": ("text", _str(), True)},
+    },
+    "option": {
+        "model": Option, "refs": (("question", Question, "question_id", True),),
+        "fields": {"text": ("text", _str(255), True), "correct": ("is_correct", _bool, False)},
+    },
+}
+WRITE_ORDER = ("level", "content", "prerequisite", "question", "option")
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.written = {t: 0 for t in WRITE_ORDER}
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {"read": self.read, "written": self.written, "error_count": self.error_count, "errors": self.errors}
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def read_records(stream, fmt: str):
+    """
+    Yield (line_number, record) from an NDJSON or CSV text stream, expanding
+    nested question options and content prerequisites into their own records.
+    """
+    if fmt == "csv":
+        rows = ((i + 2, row) for i, row in enumerate(csv.DictReader(stream)))
+    else:
+        rows = _ndjson_rows(stream)
+
+    for line, record in rows:
+        yield line, record
+        if record.get("type") == "question" and isinstance(record.get("options"), list):
+            for position, option in enumerate(record["options"]):
+                yield line, {
+                    "type": "option",
+                    "key": option.get("key") or f"{record.get('key')}#{position}",
+                    "question": record.get("key"),
+                    "text": option.get("text"),
+                    "correct": option.get("correct", False),
+                }
+        if record.get("type") == "content" and isinstance(record.get("requires"), list):
+            for requires in record["requires"]:
+                yield line, {
+                    "type": "prerequisite",
+                    "key": f"{record.get('key')}<{requires}",
+                    "content": record.get("key"),
+                    "requires": requires,
+                }
+
+
+def _ndjson_rows(stream):
+    for line, text in enumerate(stream, start=1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as exc:
+            yield line, {"_error": f"invalid JSON: {exc.msg}"}
+
+
+def validate(line: int, record: dict):
+    """
+    Return (type, key, {ref field: referenced key}, {column: value}) or raise ValueError.
+    """
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    rtype = record.get("type")
+    schema = SCHEMA.get(rtype)
+    if schema is None:
+        raise ValueError(f"unknown record type {rtype!r}")
+    key = record.get("key")
+    if not key:
+        raise ValueError("missing key")
+    if len(str(key)) > 100:
+        raise ValueError("key longer than 100 characters")
+
+    values = {}
+    for field, (column, coerce, required) in schema["fields"].items():
+        raw = record.get(field)
+        if raw in (None, "") and required:
+            raise ValueError(f"missing {field}")
+        try:
+            values[column] = coerce(raw)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"invalid {field}: {exc}")
+
+    ref_keys = {}
+    for ref_field, _, _, ref_required in schema["refs"]:
+        ref_keys[ref_field] = record.get(ref_field) or None
+        if ref_keys[ref_field] is None and ref_required:
+            raise ValueError(f"missing {ref_field}")
+    return rtype, str(key), ref_keys, values
+
+
+# ----------------------------
+# Writing
+# ----------------------------
+
+def _upsert(db: Session, model, rows: list):
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    table = model.__table__
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "key"},
+        )
+        db.execute(stmt, rows)
+        return
+
+    # No ON CONFLICT: split into inserts and updates by looking the keys up once
+    existing = dict(db.execute(select(table.c.key, table.c.id).where(table.c.key.in_([r["key"] for r in rows]))).all())
+    inserts = [r for r in rows if r["key"] not in existing]
+    updates = [dict(r, id=existing[r["key"]]) for r in rows if r["key"] in existing]
+    if inserts:
+        db.execute(table.insert(), inserts)
+    for row in updates:
+        db.execute(table.update().where(table.c.id == row.pop("id")).values(**row))
+
+
+def write_chunk(db: Session, chunk: list, report: ImportReport):
+    """
+    Validate and upsert one chunk, referenced records before the ones
+    referring to them. Referenced keys are resolved with one IN query per
+    reference.
+    """
+    by_type = {t: [] for t in WRITE_ORDER}
+    for line, record in chunk:
+        try:
+            rtype, key, ref_keys, values = validate(line, record)
+        except ValueError as exc:
+            report.error(line, str(exc))
+            continue
+        by_type[rtype].append((line, key, ref_keys, values))
+
+    for rtype in WRITE_ORDER:
+        items = by_type[rtype]
+        if not items:
+            continue
+        schema = SCHEMA[rtype]
+        ref_ids = {}
+        for ref_field, ref_model, _, _ in schema["refs"]:
+            keys = {r[ref_field] for _, _, r, _ in items if r[ref_field] is not None}
+            ref_ids[ref_field] = dict(db.execute(
+                select(ref_model.key, ref_model.id).where(ref_model.key.in_(keys))
+            ).all()) if keys else {}
+
+        rows = {}
+        for line, key, ref_keys, values in items:
+            row = {"key": key, **values}
+            for ref_field, _, ref_column, _ in schema["refs"]:
+                ref_key = ref_keys[ref_field]
+                if ref_key is not None and ref_key not in ref_ids[ref_field]:
+                    report.error(line, f"unknown {ref_field} {ref_key!r}")
+                    break
+                row[ref_column] = ref_ids[ref_field].get(ref_key)
+            else:
+                rows[key] = row  # last occurrence of a key within the chunk wins
+        _upsert(db, schema["model"], list(rows.values()))
+        report.written[rtype] += len(rows)
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_curriculum(db: Session, stream, fmt: str = "ndjson", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      progress=None) -> ImportReport:
+    """
+    Stream records from `stream` into the database, committing every
+    `chunk_size` records. `progress` is called with the report after each chunk.
+    Imports of more than one chunk merge the search index afterwards.
+    """
+    report = ImportReport()
+    committed = False
+    try:
+        for chunk in _chunks(read_records(stream, fmt), chunk_size):
+            report.read += len(chunk)
+            write_chunk(db, chunk, report)
+            db.commit()
+            committed = True
+            if progress:
+                progress(report)
+        if report.read > chunk_size:
+            optimize_search_index(db.connection())
+            db.commit()
+    except BaseException:
+        db.rollback()
+        if committed:
+            # The chunks committed before the failure changed the curriculum. Bumped
+            # on a new session, so a broken connection cannot hide the original error
+            try:
+                with Session(db.get_bind()) as fresh:
+                    bump_catalog_version(fresh)
+                    fresh.commit()
+            except Exception:
+                logger.exception("Could not bump the catalog version after a failed import")
+        raise
+    if report.read:
+        bump_catalog_version(db)
+        db.commit()
+    return report
+
+
+# ----------------------------
+# Exporting
+# ----------------------------
+
+def _export_key(prefix: str, key, row_id: int) -> str:
+    return key or f"{prefix}:{row_id}"
+
+
+def export_records(db: Session, batch_size: int = 1000):
+    """
+    Yield curriculum records in import order, streaming rows from the DB in
+    batches. Questions carry their options nested. Rows without a natural key
+    are given "<type>:<id>".
+    """
+    stream = {"yield_per": batch_size}
+
+    level_keys = {}
+    for level_id, key, title, order_index in db.execute(
+            select(Level.id, Level.key, Level.title, Level.order_index).order_by(Level.id)):
+        level_keys[level_id] = _export_key("level", key, level_id)
+        yield {"type": "level", "key": level_keys[level_id], "title": title, "order_index": order_index}
+
+    content_keys = {}
+    for content_id, key, level_id, title, body, order_index in db.execute(
+            select(Content.id, Content.key, Content.level_id, Content.title, Content.body, Content.order_index)
+            .order_by(Content.id).execution_options(**stream)):
+        content_keys[content_id] = _export_key("content", key, content_id)
+        yield {"type": "content", "key": content_keys[content_id], "level": level_keys.get(level_id),
+               "title": title, "body": body, "order_index": order_index}
+
+    for prerequisite_id, key, content_id, requires_id in db.execute(
+            select(ContentPrerequisite.id, ContentPrerequisite.key, ContentPrerequisite.content_id,
+                   ContentPrerequisite.requires_content_id).order_by(ContentPrerequisite.id)):
+        yield {"type": "prerequisite", "key": _export_key("prerequisite", key, prerequisite_id),
+               "content": content_keys.get(content_id), "requires": content_keys.get(requires_id)}
+
+    rows = db.execute(
+        select(Question.id, Question.key, Question.content_id, Question.text,
+               Option.id, Option.key, Option.text, Option.is_correct)
+        .outerjoin(Option, Option.question_id == Question.id)
+        .order_by(Question.id, Option.id)
+        .execution_options(**stream)
+    )
+    for question_id, group in itertools.groupby(rows, key=lambda r: r[0]):
+        group = list(group)
+        _, key, content_id, text = group[0][:4]
+        yield {
+            "type": "question",
+            "key": _export_key("question", key, question_id),
+            "content": content_keys.get(content_id),
+            "text": text,
+            "options": [
+                {"key": _export_key("option", option_key, option_id), "text": option_text, "correct": bool(correct)}
+                for _, _, _, _, option_id, option_key, option_text, correct in group if option_id is not None
+            ],
+        }
+
+
+CSV_FIELDS = ["type", "key", "level", "content", "question", "requires", "title", "body", "order_index", "text",
+              "correct"]
+
+
+def export_lines(db: Session, fmt: str = "ndjson"):
+    """
+    Serialize export_records as NDJSON lines or CSV rows (options flattened).
+    """
+    if fmt != "csv":
+        for record in export_records(db):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for record in export_records(db):
+        writer.writerow(record)
+        if record["type"] == "question":
+            for option in record["options"]:
+                writer.writerow({"type": "option", "question": record["key"], **option})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="load a curriculum file")
+    imp.add_argument("path", help="file to read, or - for stdin")
+    imp.add_argument("--format", choices=["ndjson", "csv"])
+    imp.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    exp = sub.add_parser("export", help="dump the curriculum")
+    exp.add_argument("path", help="file to write, or - for stdout")
+    exp.add_argument("--format", choices=["ndjson", "csv"])
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    db = SessionLocal()
+    try:
+        if args.command == "import":
+            start = time.perf_counter()
+
+            def progress(report):
+                rate = report.read / (time.perf_counter() - start)
+                print(f"{report.read} records, {report.error_count} errors, {rate:.0f} records/s", file=sys.stderr)
+
+            stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+            with stream:
+                report = import_curriculum(db, stream, fmt, args.chunk_size, progress)
+            print(json.dumps(report.as_dict(), indent=2))
+        else:
+            out = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+            with out:
+                for line in export_lines(db, fmt):
+                    out.write(line)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
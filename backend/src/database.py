@@ -1,12 +1,98 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import Config
 
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _engine_options(url: str) -> dict:
+    """
+    Pool settings for server databases; SQLite gets check_same_thread=False
+    and keeps SQLAlchemy's default pool for its driver.
+    """
+    if _is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}} if "aiosqlite" not in url else {}
+    return {
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while an exam submission is writing;
+    # NORMAL sync is durable across app crashes in WAL mode.
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+def make_engine(url: str):
+    engine = create_engine(url, **_engine_options(url))
+    if _is_sqlite(url):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+# Async drivers for the same database: aiosqlite locally, asyncpg on Postgres
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+def make_async_engine(url: str):
+    engine = create_async_engine(url, **_engine_options(url))
+    if _is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
 # Create the SQLAlchemy engine
-engine = create_engine(Config.DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in Config.DATABASE_URL else {})
+engine = make_engine(Config.DATABASE_URL)
+
+# Create a configured "Session" class.
+# info["answer_log"]: answers graded on these sessions are appended to the
+# answer event log on commit (see src/answer_log.py)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"answer_log": True})
+
+async_engine = make_async_engine(Config.ASYNC_DATABASE_URL or async_database_url(Config.DATABASE_URL))
+
+# expire_on_commit=False so rows stay readable after commit without an implicit (sync) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+                                       info={"answer_log": True})
 
-# Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read-only traffic goes to the replica when one is configured, otherwise to the primary
+if Config.READ_REPLICA_URL:
+    async_read_engine = make_async_engine(async_database_url(Config.READ_REPLICA_URL))
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+else:
+    async_read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+def dialect_insert(db):
+    """
+    The ON CONFLICT-capable insert() for the session's database, or None if
+    the dialect has no upsert support (callers then fall back to the ORM).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
 
 # Base class for our models
 Base = declarative_base()
@@ -19,5 +105,15 @@ def get_db():
     finally:
         db.close()
 
+# Async variant for `async def` endpoints
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Async session on the read replica, for endpoints that never write
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 
 #Note: For SQLite in-memory or file-based usage, you need check_same_thread=False if you use it in multiple threads, which FastAPI may do. For production, you’d likely use PostgreSQL or MySQL, in which case you remove that connect argument.
\ No newline at end of file
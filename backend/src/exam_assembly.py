@@ -0,0 +1,137 @@
+import random
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.catalog import Catalog
+from src.models import Question, UserQuestionProgress
+
+# Relative selection weights: questions the user last got wrong, has never
+# answered, and last got right
+WEIGHT_FAILED = 3.0
+WEIGHT_UNSEEN = 2.0
+WEIGHT_PASSED = 1.0
+
+# Rejection-sampling attempts for an unseen question before enumerating them
+_MAX_REJECTIONS = 64
+
+
+def _take(items: list, rng) -> int:
+    i = rng.randrange(len(items))
+    items[i], items[-1] = items[-1], items[i]
+    return items.pop()
+
+
+def weighted_draw(pool: tuple, k: int, failed: list, passed: list, rng=random) -> list:
+    """
+    Draw up to k distinct question ids from `pool` without replacement,
+    weighting failed / unseen / passed questions as configured above.
+
+    Only the user's failed and passed ids are materialized. Unseen ids are
+    drawn by rejection from the pool index, so the cost grows with k and the
+    user's history, not with the pool, unless the user has seen most of it.
+    """
+    k = min(k, len(pool))
+    seen = set(failed) | set(passed)
+    failed, passed = list(failed), list(passed)
+    unseen_left = max(len(pool) - len(seen), 0)
+    unseen = None
+    if unseen_left and unseen_left * 2 < len(pool):
+        unseen = [qid for qid in pool if qid not in seen]
+
+    chosen = []
+    taken = set()
+    while len(chosen) < k:
+        weights = (WEIGHT_FAILED * len(failed), WEIGHT_UNSEEN * unseen_left, WEIGHT_PASSED * len(passed))
+        if not any(weights):
+            break
+        bucket = rng.choices((0, 1, 2), weights)[0]
+        if bucket == 0:
+            qid = _take(failed, rng)
+        elif bucket == 2:
+            qid = _take(passed, rng)
+        else:
+            qid = None
+            if unseen is None:
+                for _ in range(_MAX_REJECTIONS):
+                    candidate = pool[rng.randrange(len(pool))]
+                    if candidate not in seen and candidate not in taken:
+                        qid = candidate
+                        break
+                else:
+                    unseen = [q for q in pool if q not in seen and q not in taken]
+            if qid is None:
+                if not unseen:
+                    unseen_left = 0
+                    continue
+                qid = _take(unseen, rng)
+            unseen_left -= 1
+        chosen.append(qid)
+        taken.add(qid)
+    return chosen
+
+
+def allocate(sizes: dict, k: int) -> dict:
+    """
+    Split k draws across strata proportionally to their sizes (largest
+    remainder), never giving a stratum more than it holds.
+    """
+    total = sum(sizes.values())
+    if total == 0:
+        return {key: 0 for key in sizes}
+    k = min(k, total)
+    quotas = {key: k * size / total for key, size in sizes.items()}
+    counts = {key: int(q) for key, q in quotas.items()}
+    leftover = k - sum(counts.values())
+    for key in sorted(quotas, key=lambda key: quotas[key] - counts[key], reverse=True)[:leftover]:
+        counts[key] += 1
+    return counts
+
+
+async def _user_history(db: AsyncSession, user_id: int, content_ids) -> dict:
+    """
+    {content_id: (failed ids, passed ids)} from the user's progress rows for
+    the given contents, in one query bounded by the user's history.
+    """
+    rows = await db.execute(
+        select(Question.content_id, UserQuestionProgress.question_id, UserQuestionProgress.last_answer_correct)
+        .join(Question, Question.id == UserQuestionProgress.question_id)
+        .where(UserQuestionProgress.user_id == user_id, Question.content_id.in_(list(content_ids)))
+    )
+    history = {}
+    for content_id, question_id, correct in rows:
+        failed, passed = history.setdefault(content_id, ([], []))
+        (passed if correct else failed).append(question_id)
+    return history
+
+
+async def assemble_content_exam(db: AsyncSession, catalog: Catalog, user_id: int, content_id: int,
+                                k: int, rng=random) -> list:
+    """
+    Question ids for an exam on one content, favouring failed and unseen questions.
+    """
+    content = catalog.contents.get(content_id)
+    if content is None or not content.question_ids:
+        return []
+    failed, passed = (await _user_history(db, user_id, [content_id])).get(content_id, ([], []))
+    return weighted_draw(content.question_ids, k, failed, passed, rng)
+
+
+async def assemble_level_exam(db: AsyncSession, catalog: Catalog, user_id: int, level_id: int,
+                              k: int, rng=random) -> list:
+    """
+    Question ids for a unit exam: k draws stratified across the level's
+    contents in proportion to their size, weighted within each content.
+    """
+    level = catalog.levels.get(level_id)
+    if level is None:
+        return []
+    pools = {cid: catalog.contents[cid].question_ids for cid in level.content_ids}
+    counts = allocate({cid: len(pool) for cid, pool in pools.items()}, k)
+    history = await _user_history(db, user_id, [cid for cid, n in counts.items() if n])
+
+    selected = []
+    for cid, n in counts.items():
+        if n:
+            failed, passed = history.get(cid, ([], []))
+            selected.extend(weighted_draw(pools[cid], n, failed, passed, rng))
+    rng.shuffle(selected)
+    return selected
@@ -0,0 +1,234 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from src.answer_log import queue_answer_events
+from src.catalog import Catalog, get_catalog, get_catalog_async
+from src.database import dialect_insert
+from src.learning_state import update_learning_state
+from src.models import UserQuestionProgress
+from src.scheduler import SchedulerState, elapsed_days, get_scheduler, to_columns
+
+
+class GradedAnswer(NamedTuple):
+    question_id: int
+    option_id: int
+    option_found: bool
+    correct: bool
+
+
+def resolve_options(catalog: Catalog, option_ids) -> dict:
+    """
+    Look up every chosen option in the content catalog (no query).
+    Returns {option_id: is_correct} for the options that exist.
+    """
+    resolved = {}
+    for oid in option_ids:
+        correct = catalog.is_correct(oid)
+        if correct is not None:
+            resolved[oid] = correct
+    return resolved
+
+
+def answer_rejection(catalog: Catalog, question_id, option_id) -> Optional[str]:
+    """
+    Why an answer can not be graded, or None if it picks one of its
+    question's options.
+    """
+    option = catalog.options.get(option_id)
+    if option is None or option.question_id != question_id:
+        return "unknown option for this question"
+    return None
+
+
+def exam_rejection(catalog: Catalog, answers: list, question_ids, minimum: int) -> Optional[str]:
+    """
+    Why a submitted exam can not be graded, or None. Every answer must pick
+    an option of its question, the questions must be among `question_ids`
+    (the content's or level's) and answered once each, and there must be at
+    least `minimum` answers, or one per question if there are fewer.
+    """
+    allowed = set(question_ids)
+    seen = set()
+    for answer in answers:
+        if not isinstance(answer, dict):
+            return "answers must be objects with question_id and option_id"
+        question_id = answer.get("question_id")
+        if question_id not in allowed:
+            return f"question {question_id} is not part of this exam"
+        if question_id in seen:
+            return f"question {question_id} is answered more than once"
+        seen.add(question_id)
+        error = answer_rejection(catalog, question_id, answer.get("option_id"))
+        if error:
+            return f"{error} (question {question_id})"
+    required = min(minimum, len(allowed))
+    if len(seen) < required:
+        return f"an attempt needs at least {required} answers"
+    return None
+
+
+def grade_answers(db: Session, user_id: int, answers: list, options: Optional[dict] = None,
+                  source: str = "exam", now: Optional[datetime] = None) -> list:
+    """
+    Grade a list of { "question_id": x, "option_id": y } answers, record the
+    result in UserQuestionProgress and schedule each question's next review.
+    Each answer is also appended to the answer event log, tagged with
+    `source`, once the session commits.
+
+    Options are resolved from the in-memory catalog (async callers resolve
+    them up front and pass `options`), so the whole submission costs one
+    read of the existing progress rows and one bulk upsert, regardless of
+    how many answers there are. `now` is when the answers were given
+    (default: the current time); reviews are scheduled from it.
+    Does not commit.
+    """
+    if options is None:
+        options = resolve_options(get_catalog(db), (ans["option_id"] for ans in answers))
+
+    graded = []
+    for ans in answers:
+        option_id = ans["option_id"]
+        found = option_id in options
+        graded.append(GradedAnswer(
+            question_id=ans["question_id"],
+            option_id=option_id,
+            option_found=found,
+            correct=found and options[option_id],
+        ))
+
+    now = now or datetime.utcnow()
+    record_progress(db, user_id, graded, now)
+    queue_answer_events(db, user_id, graded, source, now)
+    return graded
+
+
+async def grade_answers_async(db: AsyncSession, user_id: int, answers: list, options: Optional[dict] = None,
+                              source: str = "exam") -> list:
+    """
+    grade_answers for async sessions: options come from the catalog without
+    a query, and the progress read/upsert run on the async connection.
+    """
+    if options is None:
+        catalog = await get_catalog_async(db)
+        options = resolve_options(catalog, (ans["option_id"] for ans in answers))
+    return await db.run_sync(grade_answers, user_id, answers, options, source)
+
+
+_STATE_COLUMNS = ("ease", "stability", "difficulty", "interval_days", "repetitions",
+                  "last_review_date", "next_review_date")
+
+
+def record_progress(db: Session, user_id: int, graded: list, now: Optional[datetime] = None):
+    """
+    Apply the counter updates and rescheduling for a set of graded answers.
+    Repeated answers to the same question within a submission are folded
+    together first; the last one decides `last_answer_correct` and the schedule.
+    """
+    if not graded:
+        return
+
+    now = now or datetime.utcnow()
+    per_question = {}
+    for g in graded:
+        times_correct, times_incorrect, _ = per_question.get(g.question_id, (0, 0, False))
+        per_question[g.question_id] = (
+            times_correct + int(g.correct),
+            times_incorrect + int(not g.correct),
+            g.correct,
+        )
+    question_ids = list(per_question)
+
+    # One bulk read of the prior scheduling state
+    prior = {
+        row[0]: row[1:]
+        for row in db.execute(
+            select(
+                UserQuestionProgress.question_id, UserQuestionProgress.ease,
+                UserQuestionProgress.stability, UserQuestionProgress.difficulty,
+                UserQuestionProgress.interval_days, UserQuestionProgress.repetitions,
+                UserQuestionProgress.last_review_date, UserQuestionProgress.last_answer_correct,
+                UserQuestionProgress.next_review_date
+            ).where(
+                UserQuestionProgress.user_id == user_id,
+                UserQuestionProgress.question_id.in_(question_ids)
+            )
+        )
+    }
+    empty = (None, None, None, None, 0, None, None, None)
+    states = [prior.get(qid, empty) for qid in question_ids]
+
+    # Vectorized rescheduling of the whole submission
+    new_state = get_scheduler().review(
+        SchedulerState.from_rows(st[:5] for st in states),
+        np.array([per_question[qid][2] for qid in question_ids], dtype=bool),
+        elapsed_days([st[5] for st in states], now),
+    )
+
+    rows = []
+    for question_id, schedule in zip(question_ids, to_columns(new_state, now)):
+        times_correct, times_incorrect, last_correct = per_question[question_id]
+        row = {
+            "user_id": user_id,
+            "question_id": question_id,
+            "last_answer_correct": last_correct,
+            "times_correct": times_correct,
+            "times_incorrect": times_incorrect,
+        }
+        row.update(schedule)
+        rows.append(row)
+
+    _upsert_progress(db, user_id, rows)
+
+    update_learning_state(
+        db, user_id,
+        prior=[(st[6], st[7]) for qid, st in zip(question_ids, states) if qid in prior],
+        rows=rows,
+        now=now,
+    )
+
+
+def _upsert_progress(db: Session, user_id: int, rows: list):
+    insert = dialect_insert(db)
+    if insert is None:
+        _record_progress_orm(db, user_id, rows)
+        return
+
+    table = UserQuestionProgress.__table__
+    stmt = insert(table)
+    set_ = {
+        "last_answer_correct": stmt.excluded.last_answer_correct,
+        "times_correct": func.coalesce(table.c.times_correct, 0) + stmt.excluded.times_correct,
+        "times_incorrect": func.coalesce(table.c.times_incorrect, 0) + stmt.excluded.times_incorrect,
+    }
+    for column in _STATE_COLUMNS:
+        set_[column] = stmt.excluded[column]
+    stmt = stmt.on_conflict_do_update(index_elements=["user_id", "question_id"], set_=set_)
+    db.execute(stmt, rows)
+
+
+def _record_progress_orm(db: Session, user_id: int, rows: list):
+    """
+    Fallback for dialects without ON CONFLICT: load every existing progress
+    row in one read, then create or update through the session.
+    """
+    existing = {
+        uq.question_id: uq
+        for uq in db.query(UserQuestionProgress).filter(
+            UserQuestionProgress.user_id == user_id,
+            UserQuestionProgress.question_id.in_([row["question_id"] for row in rows])
+        )
+    }
+    for row in rows:
+        uq = existing.get(row["question_id"])
+        if not uq:
+            uq = UserQuestionProgress(user_id=user_id, question_id=row["question_id"],
+                                      times_correct=0, times_incorrect=0)
+            db.add(uq)
+        uq.last_answer_correct = row["last_answer_correct"]
+        uq.times_correct = (uq.times_correct or 0) + row["times_correct"]
+        uq.times_incorrect = (uq.times_incorrect or 0) + row["times_incorrect"]
+        for column in _STATE_COLUMNS:
+            setattr(uq, column, row[column])
@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from config import Config
+
+_context = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+def get_pwd_context():
+    """
+    Password hashing context. Hashes made with a different cost factor are
+    flagged by verify_and_update and transparently re-hashed on login.
+    Built on first use, so passlib and its bcrypt backend stay off the
+    import path of workers (and of pool processes) until they hash.
+    """
+    global _context
+    if _context is None:
+        from passlib.context import CryptContext
+        _context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=Config.BCRYPT_ROUNDS)
+    return _context
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(password, hashed_password)
+
+
+def _load_backend() -> bool:
+    get_pwd_context().handler().get_backend()
+    return True
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None and Config.HASH_POOL_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=Config.HASH_POOL_WORKERS)
+    return _pool
+
+
+async def _run(fn, *args):
+    """
+    Run a hashing call on the dedicated process pool (or the default thread
+    executor when HASH_POOL_WORKERS=0). At most HASH_QUEUE_LIMIT calls may be
+    pending per app worker; beyond that callers get a 503 immediately
+    instead of queueing behind a login storm.
+    """
+    global _pending
+    if _pending >= Config.HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication is busy, please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash uses an
+    outdated scheme or cost factor and should replace it.
+    """
+    return await _run(_verify_and_update, password, hashed_password)
+
+
+def warm_up_hashing():
+    """
+    Load passlib/bcrypt here and start the hashing processes (each loading
+    the backend), so the first logins after boot do not pay for it.
+    Blocking; call from a thread.
+    """
+    _load_backend()
+    pool = _get_pool()
+    if pool is not None:
+        for future in [pool.submit(_load_backend) for _ in range(Config.HASH_POOL_WORKERS)]:
+            future.result()
+
+
+def hashing_stats() -> dict:
+    return {
+        "workers": Config.HASH_POOL_WORKERS,
+        "pending": _pending,
+        "queue_limit": Config.HASH_QUEUE_LIMIT,
+    }
+
+
+def shutdown_hash_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from config import Config
+from src.singleflight import SingleFlight
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone is served without it
+    brotli = None
+
+# Cache-Control by endpoint kind. Lessons only change with a curriculum import, so
+# clients keep them and revalidate with the ETag; exams, recall and review payloads
+# are per-user draws that change with every answer and must not be stored
+CONTENT_CACHE_CONTROL = (f"private, max-age={Config.CONTENT_CACHE_MAX_AGE_SECONDS}"
+                         if Config.CONTENT_CACHE_MAX_AGE_SECONDS > 0 else "private, no-cache")
+STATS_CACHE_CONTROL = "private, max-age=60"
+NO_STORE = {"Cache-Control": "no-store"}
+
+
+def cache_control(value: str):
+    """
+    Route dependency setting Cache-Control on responses the handler returns
+    as plain data. Handlers returning a Response object set it themselves.
+    """
+    def set_header(response: Response):
+        response.headers["Cache-Control"] = value
+    return Depends(set_header)
+
+
+class Representation(NamedTuple):
+    """
+    A rendered JSON body with its strong ETag and, for large bodies, the
+    same bytes precompressed. Encoded variants get their own ETag.
+    """
+    etag: str
+    body: bytes
+    gzip: Optional[bytes]
+    br: Optional[bytes]
+
+
+def build_representation(body: bytes) -> Representation:
+    revision = hashlib.blake2b(body, digest_size=12).hexdigest()
+    if len(body) < Config.PRECOMPRESS_MIN_BYTES:
+        return Representation(f'"{revision}"', body, None, None)
+    return Representation(
+        f'"{revision}"',
+        body,
+        gzip.compress(body, compresslevel=9, mtime=0),
+        brotli.compress(body, quality=11) if brotli is not None else None,
+    )
+
+
+class RepresentationCache:
+    """
+    Rendered representations keyed by id, each tied to the catalog entry it
+    was built from. A lookup with a different entry (the content was
+    re-imported) rebuilds it; an equal entry from a reloaded catalog keeps
+    the cached bytes. Holds at most `max_bytes` of bodies, dropping the
+    least recently used.
+    """
+    def __init__(self, name: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (source, representation, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._builds = SingleFlight(name)
+
+    def _cached(self, key, source) -> Optional[Representation]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (cached[0] is source or cached[0] == source):
+                self._entries.move_to_end(key)
+                return cached[1]
+        return None
+
+    def get(self, key, source, render) -> Representation:
+        representation = self._cached(key, source)
+        if representation is None:
+            representation = build_representation(render(source))
+            self._put(key, source, representation)
+        return representation
+
+    def _put(self, key, source, representation: Representation):
+        size = sum(len(body) for body in (representation.body, representation.gzip, representation.br) if body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (source, representation, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    async def get_async(self, key, source, render) -> Representation:
+        """
+        `get` for the event loop: a miss is rendered and compressed in the
+        threadpool, once, however many requests ask for it at the same time.
+        """
+        representation = self._cached(key, source)
+        if representation is not None:
+            return representation
+        return await self._builds.do((key, id(source)), run_in_threadpool, self.get, key, source, render)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def _accepts(request: Request, coding: str) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def conditional_response(request: Optional[Request], representation: Representation,
+                         cache_control: str = CONTENT_CACHE_CONTROL) -> Response:
+    """
+    Serve a representation: 304 when the client's If-None-Match already
+    names it, otherwise the smallest encoding the client accepts.
+    """
+    body, encoding, etag = representation.body, None, representation.etag
+    if request is not None:
+        if representation.br is not None and _accepts(request, "br"):
+            body, encoding, etag = representation.br, "br", representation.etag[:-1] + '-br"'
+        elif representation.gzip is not None and _accepts(request, "gzip"):
+            body, encoding, etag = representation.gzip, "gzip", representation.etag[:-1] + '-gz"'
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if representation.gzip is not None:
+        headers["Vary"] = "Accept-Encoding"
+    if request is not None and _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,260 @@
+"""
+Item analysis: per-question difficulty (p-value), option selection
+distribution and discrimination index.
+
+Aggregates live in question_stats / option_stats and are additive, so the
+answer log's write-behind flush folds each batch in with one upsert per
+table, and a full recompute is the same vectorized aggregation run over the
+whole log in user chunks.
+
+Discrimination is the corrected point-biserial correlation between getting
+the item right and the rest score (fraction correct on the other answers of
+the same submission). Single-answer submissions (review) have no rest score
+and only count towards the p-value and option distribution.
+
+Run from backend/:
+    python -m src.item_stats recompute
+"""
+import argparse
+import math
+from datetime import datetime
+import numpy as np
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+from src.database import SessionLocal, dialect_insert
+from src.models import AnswerEvent, OptionStats, QuestionStats
+
+_SUM_COLUMNS = ("attempts", "correct", "disc_n", "disc_correct", "rest_sum", "rest_sq_sum", "correct_rest_sum")
+_INT_COLUMNS = {"attempts", "correct", "disc_n", "disc_correct"}
+
+# Thresholds for flagging questions worth a look
+MIN_ATTEMPTS = 30
+TOO_HARD = 0.2
+TOO_EASY = 0.95
+LOW_DISCRIMINATION = 0.1
+
+
+def aggregate(user_ids, question_ids, option_ids, correct, answered_at):
+    """
+    Sum the stats columns over a set of answers given as parallel arrays.
+    Answers of one user with the same timestamp form one submission.
+    Returns ({question_id: {column: value}}, {option_id: (question_id, selections)}).
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    question_ids = np.asarray(question_ids, dtype=np.int64)
+    correct = np.asarray(correct, dtype=float)
+    stamps = np.asarray(answered_at, dtype="datetime64[us]").astype(np.int64)
+    if len(question_ids) == 0:
+        return {}, {}
+
+    _, submission = np.unique(np.stack([user_ids, stamps]), axis=1, return_inverse=True)
+    submission = submission.ravel()
+    size = np.bincount(submission)[submission]
+    total = np.bincount(submission, weights=correct)[submission]
+    multi = (size > 1).astype(float)
+    rest = np.where(size > 1, (total - correct) / np.maximum(size - 1, 1), 0.0)
+
+    qids, qidx = np.unique(question_ids, return_inverse=True)
+    sums = {
+        "attempts": np.ones_like(correct),
+        "correct": correct,
+        "disc_n": multi,
+        "disc_correct": correct * multi,
+        "rest_sum": rest,
+        "rest_sq_sum": rest * rest,
+        "correct_rest_sum": correct * rest,
+    }
+    columns = {name: np.bincount(qidx, weights=w, minlength=len(qids)) for name, w in sums.items()}
+    per_question = {
+        int(qid): {
+            name: int(columns[name][i]) if name in _INT_COLUMNS else float(columns[name][i])
+            for name in _SUM_COLUMNS
+        }
+        for i, qid in enumerate(qids)
+    }
+
+    option_ids = np.array([-1 if o is None else o for o in option_ids], dtype=np.int64)
+    known = option_ids >= 0
+    oids, first, counts = np.unique(option_ids[known], return_index=True, return_counts=True)
+    option_questions = question_ids[known][first]
+    per_option = {int(o): (int(q), int(n)) for o, q, n in zip(oids, option_questions, counts)}
+    return per_question, per_option
+
+
+def apply_events(db: Session, rows: list, now: datetime = None):
+    """
+    Fold a batch of answer_event rows (dicts) into the running aggregates.
+    Called by the answer log flush in the transaction that stores the events.
+    Does not commit.
+    """
+    if not rows:
+        return
+    per_question, per_option = aggregate(
+        [r["user_id"] for r in rows], [r["question_id"] for r in rows], [r["option_id"] for r in rows],
+        [r["correct"] for r in rows], [r["answered_at"] for r in rows],
+    )
+    _write(db, per_question, per_option, now or datetime.utcnow(), increment=True)
+
+
+def _write(db: Session, per_question: dict, per_option: dict, now: datetime, increment: bool):
+    question_rows = [{"question_id": qid, "updated_at": now, **sums} for qid, sums in per_question.items()]
+    option_rows = [{"option_id": oid, "question_id": qid, "selections": n} for oid, (qid, n) in per_option.items()]
+    insert = dialect_insert(db)
+    if insert is None:
+        _write_orm(db, question_rows, option_rows, increment)
+        return
+
+    if question_rows:
+        table = QuestionStats.__table__
+        stmt = insert(table)
+        set_ = {"updated_at": stmt.excluded.updated_at}
+        for column in _SUM_COLUMNS:
+            set_[column] = table.c[column] + stmt.excluded[column] if increment else stmt.excluded[column]
+        db.execute(stmt.on_conflict_do_update(index_elements=["question_id"], set_=set_), question_rows)
+    if option_rows:
+        table = OptionStats.__table__
+        stmt = insert(table)
+        selections = table.c.selections + stmt.excluded.selections if increment else stmt.excluded.selections
+        db.execute(stmt.on_conflict_do_update(index_elements=["option_id"], set_={"selections": selections}),
+                   option_rows)
+
+
+def _write_orm(db: Session, question_rows: list, option_rows: list, increment: bool):
+    questions = {s.question_id: s for s in db.query(QuestionStats).filter(
+        QuestionStats.question_id.in_([r["question_id"] for r in question_rows]))}
+    for row in question_rows:
+        stats = questions.get(row["question_id"])
+        if stats is None:
+            db.add(QuestionStats(**row))
+            continue
+        for column in _SUM_COLUMNS:
+            setattr(stats, column, (getattr(stats, column) if increment else 0) + row[column])
+        stats.updated_at = row["updated_at"]
+
+    options = {s.option_id: s for s in db.query(OptionStats).filter(
+        OptionStats.option_id.in_([r["option_id"] for r in option_rows]))}
+    for row in option_rows:
+        stats = options.get(row["option_id"])
+        if stats is None:
+            db.add(OptionStats(**row))
+        else:
+            stats.selections = (stats.selections if increment else 0) + row["selections"]
+
+
+def _accumulate(per_question: dict, per_option: dict, events: list):
+    if not events:
+        return
+    chunk_questions, chunk_options = aggregate(*zip(*events))
+    for qid, sums in chunk_questions.items():
+        acc = per_question.setdefault(qid, dict.fromkeys(_SUM_COLUMNS, 0))
+        for column in _SUM_COLUMNS:
+            acc[column] += sums[column]
+    for oid, (qid, n) in chunk_options.items():
+        per_option[oid] = (qid, per_option.get(oid, (qid, 0))[1] + n)
+
+
+def recompute_item_stats(db: Session, chunk_users: int = 1000) -> int:
+    """
+    Rebuild both stats tables from the whole answer log, reading it in
+    chunks of users (submissions never span users, so chunk sums add up).
+    Commits once at the end. Returns the number of questions with stats.
+
+    Safe while the app is writing. On Postgres the stats tables are locked
+    for the whole run, which only holds up the answer log's write-behind
+    flushes. SQLite has a single writer, so the log is read up to a
+    watermark without locking, and the events committed after it are folded
+    in once the rewrite holds the write lock.
+    """
+    columns = (AnswerEvent.user_id, AnswerEvent.question_id, AnswerEvent.option_id,
+               AnswerEvent.correct, AnswerEvent.answered_at)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE question_stats, option_stats IN EXCLUSIVE MODE"))
+    watermark = db.scalar(select(func.max(AnswerEvent.id))) or 0
+    user_ids = list(db.scalars(select(AnswerEvent.user_id).distinct().order_by(AnswerEvent.user_id)))
+    per_question, per_option = {}, {}
+    for start in range(0, len(user_ids), chunk_users):
+        chunk = user_ids[start:start + chunk_users]
+        _accumulate(per_question, per_option, db.execute(
+            select(*columns).where(AnswerEvent.user_id.in_(chunk), AnswerEvent.id <= watermark)
+        ).all())
+
+    # On SQLite the first delete takes the write lock
+    db.execute(delete(QuestionStats))
+    db.execute(delete(OptionStats))
+    _accumulate(per_question, per_option, db.execute(select(*columns).where(AnswerEvent.id > watermark)).all())
+    _write(db, per_question, per_option, datetime.utcnow(), increment=False)
+    db.commit()
+    return len(per_question)
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def discrimination(stats: QuestionStats):
+    """
+    Corrected point-biserial correlation from the running sums, or None when
+    there is no variance to correlate.
+    """
+    n, sx = stats.disc_n, stats.disc_correct
+    if n < 2:
+        return None
+    denominator = (n * sx - sx * sx) * (n * stats.rest_sq_sum - stats.rest_sum ** 2)
+    if denominator <= 0:
+        return None
+    return (n * stats.correct_rest_sum - sx * stats.rest_sum) / math.sqrt(denominator)
+
+
+def stats_payload(stats: QuestionStats, options: list, correct_option_ids=frozenset()) -> dict:
+    """
+    Serialize one question's stats; `options` are its OptionStats rows.
+    `correct_option_ids` (from the catalog) is used to spot distractors that
+    are picked more often than the key.
+    """
+    p_value = stats.correct / stats.attempts if stats.attempts else None
+    disc = discrimination(stats)
+    distribution = {
+        o.option_id: o.selections / stats.attempts if stats.attempts else 0.0
+        for o in options
+    }
+
+    flags = []
+    if stats.attempts >= MIN_ATTEMPTS:
+        if p_value < TOO_HARD:
+            flags.append("too_hard")
+        if p_value > TOO_EASY:
+            flags.append("too_easy")
+        if disc is not None and disc < LOW_DISCRIMINATION:
+            flags.append("low_discrimination")
+        key_share = max((distribution.get(oid, 0.0) for oid in correct_option_ids), default=None)
+        if key_share is not None and any(
+                share > key_share for oid, share in distribution.items() if oid not in correct_option_ids):
+            flags.append("distractor_beats_key")
+
+    return {
+        "question_id": stats.question_id,
+        "attempts": stats.attempts,
+        "p_value": p_value,
+        "discrimination": disc,
+        "option_distribution": distribution,
+        "flags": flags,
+        "updated_at": stats.updated_at,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    recompute = sub.add_parser("recompute", help="rebuild the stats tables from the answer log")
+    recompute.add_argument("--chunk-users", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"recomputed stats for {recompute_item_stats(db, args.chunk_users)} questions")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+In-process background jobs for precomputation and maintenance.
+
+Every worker runs a scheduler, but only the one holding the jobs lock runs
+jobs: a Postgres advisory lock held on a dedicated connection, or an
+flock'ed JOBS_LOCK_FILE on other databases (one host). When the leader
+stops or dies its lock is released and another worker takes over within
+JOBS_TICK_SECONDS. The last run of each job is kept in job_run, so a new
+leader does not repeat a job that already ran.
+
+Jobs run in a worker thread and go through the users of each progress
+shard (src/shards.py) in chunks of JOBS_CHUNK_USERS, one short transaction per chunk with a pause of
+JOBS_CHUNK_PAUSE_SECONDS in between, so requests never wait long behind
+them. On shutdown a job stops at the next chunk boundary.
+
+    compact_progress  nightly   delete progress rows of deleted questions
+                                and rows that were never answered
+    due_queues        nightly   refresh each user's due-queue summary
+                                (learning state) before the day starts
+    item_stats        nightly   recompute question/option stats from the log
+    sync_receipts     6-hourly  forget old /sync idempotency keys
+
+Nightly jobs run at JOBS_NIGHTLY_HOUR_UTC.
+
+Run from backend/:
+    python -m src.jobs status
+    python -m src.jobs run due_queues
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, delete, or_, select, text
+from sqlalchemy.engine import Engine
+from config import Config
+from src.database import SessionLocal, engine as default_engine
+from src.item_stats import recompute_item_stats
+from src.learning_state import refresh_due_summaries
+from src.models import JobRun, Question, UserLearningState, UserQuestionProgress
+from src.shards import shards
+from src.sync import prune_receipts
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows): the lock file assumes a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class JobStopped(Exception):
+    pass
+
+
+class Job(NamedTuple):
+    name: str
+    run: Callable           # run(context) -> dict with what it did
+    every: Optional[float] = None  # seconds between runs; None = nightly
+
+    def due(self, last_started: Optional[datetime], now: datetime) -> bool:
+        if self.every is not None:
+            return last_started is None or (now - last_started).total_seconds() >= self.every
+        slot = now.replace(hour=Config.JOBS_NIGHTLY_HOUR_UTC, minute=0, second=0, microsecond=0)
+        if slot > now:
+            slot -= timedelta(days=1)
+        if last_started is None:
+            # Never ran: wait for the nightly hour rather than starting mid-day
+            return now - slot < timedelta(hours=1)
+        return last_started < slot
+
+
+class JobContext:
+    """
+    What a running job gets: sessions on the main database and on each
+    progress shard, and chunked iteration that pauses between chunks and
+    stops when the scheduler is shutting down.
+    """
+    def __init__(self, stopping: threading.Event, session_factory=SessionLocal, shard_factories: list = None,
+                 chunk_users: int = None, pause: float = None):
+        self.stopping = stopping
+        self.session_factory = session_factory
+        self.shard_factories = shard_factories or shards.sessionmakers()
+        self.chunk_users = chunk_users or Config.JOBS_CHUNK_USERS
+        self.pause = Config.JOBS_CHUNK_PAUSE_SECONDS if pause is None else pause
+
+    def session(self):
+        return self.session_factory()
+
+    def chunks(self, ids: list):
+        for start in range(0, len(ids), self.chunk_users):
+            if self.stopping.is_set():
+                raise JobStopped()
+            if start and self.pause:
+                time.sleep(self.pause)
+            yield ids[start:start + self.chunk_users]
+
+
+# ----------------------------
+# Jobs
+# ----------------------------
+
+def compact_progress(context: JobContext) -> dict:
+    uqp = UserQuestionProgress
+    stale = or_(
+        ~uqp.question_id.in_(select(Question.id)),
+        and_(uqp.next_review_date == None,
+             or_(uqp.times_correct == None, uqp.times_correct == 0),
+             or_(uqp.times_incorrect == None, uqp.times_incorrect == 0)),
+    )
+    users = deleted = 0
+    for shard_session in context.shard_factories:
+        with shard_session() as db:
+            user_ids = list(db.scalars(select(uqp.user_id).distinct().order_by(uqp.user_id)))
+        for chunk in context.chunks(user_ids):
+            with shard_session() as db:
+                deleted += db.execute(delete(uqp).where(uqp.user_id.in_(chunk), stale)).rowcount
+                db.commit()
+        users += len(user_ids)
+    return {"users": users, "deleted": deleted}
+
+
+def refresh_due_queues(context: JobContext) -> dict:
+    now = datetime.utcnow()
+    refreshed = 0
+    for shard_session in context.shard_factories:
+        with shard_session() as db:
+            user_ids = list(db.scalars(select(UserLearningState.user_id).order_by(UserLearningState.user_id)))
+        for chunk in context.chunks(user_ids):
+            with shard_session() as db:
+                refreshed += refresh_due_summaries(db, chunk, now)
+                db.commit()
+    return {"users": refreshed}
+
+
+def refresh_item_stats(context: JobContext) -> dict:
+    # Reads the log in user chunks; the rewrite is one transaction
+    with context.session() as db:
+        return {"questions": recompute_item_stats(db, context.chunk_users)}
+
+
+def prune_sync_receipts(context: JobContext) -> dict:
+    deleted = 0
+    for shard_session in context.shard_factories:
+        with shard_session() as db:
+            deleted += prune_receipts(db)
+            db.commit()
+    return {"deleted": deleted}
+
+
+# In run order: compaction first, so the summaries are computed without the rows it drops
+JOBS = [
+    Job("compact_progress", compact_progress),
+    Job("due_queues", refresh_due_queues),
+    Job("item_stats", refresh_item_stats),
+    Job("sync_receipts", prune_sync_receipts, every=6 * 3600),
+]
+
+
+# ----------------------------
+# Leader election
+# ----------------------------
+
+class FileLeaderLock:
+    """
+    Leader lock for one host: an exclusive flock on a file, released by the
+    OS when the holder exits, however it exits.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AdvisoryLeaderLock:
+    """
+    Leader lock for every worker of a Postgres deployment: a session-level
+    advisory lock held on a connection kept out of the pool. If that
+    connection breaks, the server drops the lock and so does this worker.
+    """
+    KEY = "coeus_background_jobs"
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._conn = None
+
+    def acquire(self) -> bool:
+        if self._conn is not None:
+            try:
+                self._conn.exec_driver_sql("SELECT 1")
+                self._conn.commit()
+                return True
+            except Exception:
+                logger.warning("Lost the background jobs lock connection")
+                self._conn.invalidate()
+                self._conn = None
+        conn = self.engine.connect()
+        acquired = conn.scalar(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": self.KEY})
+        conn.commit()
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.scalar(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": self.KEY})
+                self._conn.commit()
+                self._conn.close()
+            except Exception:
+                self._conn.invalidate()
+            self._conn = None
+
+
+def make_leader_lock(engine: Engine = default_engine):
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLeaderLock(engine)
+    return FileLeaderLock(Config.JOBS_LOCK_FILE)
+
+
+# ----------------------------
+# Scheduler
+# ----------------------------
+
+class JobScheduler:
+    """
+    Checks every JOBS_TICK_SECONDS whether this worker is the leader and,
+    if so, runs the jobs that are due, one after another, in a thread.
+    """
+    def __init__(self, jobs: list, lock, session_factory=SessionLocal):
+        self.jobs = jobs
+        self.lock = lock
+        self.session_factory = session_factory
+        self.leader = False
+        self._stopping = threading.Event()
+        self._task = None
+
+    def last_runs(self) -> dict:
+        with self.session_factory() as db:
+            return {run.name: run for run in db.scalars(select(JobRun))}
+
+    def run_job(self, job: Job) -> JobRun:
+        """
+        Run one job now, recording it in job_run.
+        """
+        started = datetime.utcnow()
+        with self.session_factory() as db:
+            run = db.get(JobRun, job.name) or JobRun(name=job.name)
+            run.started_at, run.finished_at, run.status, run.detail = started, None, "running", None
+            db.add(run)
+            db.commit()
+
+            detail = None
+            try:
+                detail = job.run(JobContext(self._stopping, self.session_factory))
+                status = "ok"
+            except JobStopped:
+                status = "stopped"
+            except Exception as exc:
+                logger.exception("Background job %s failed", job.name)
+                status, detail = "failed", {"error": repr(exc)}
+            run.finished_at, run.status = datetime.utcnow(), status
+            run.detail = json.dumps(dict(detail or {}, seconds=round((run.finished_at - started).total_seconds(), 3)))
+            db.commit()
+            db.refresh(run)
+            return run
+
+    def run_due(self):
+        runs = self.last_runs()
+        for job in self.jobs:
+            if self._stopping.is_set():
+                return
+            last = runs.get(job.name)
+            if job.due(last.started_at if last else None, datetime.utcnow()):
+                self.run_job(job)
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.leader = await run_in_threadpool(self.lock.acquire)
+                if self.leader:
+                    await run_in_threadpool(self.run_due)
+            except Exception:
+                logger.exception("Background job scheduler tick failed")
+            await asyncio.sleep(Config.JOBS_TICK_SECONDS)
+
+    def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """
+        Stop the loop, let a running job reach its next chunk boundary and
+        give up the lock.
+        """
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.lock.release)
+        self.leader = False
+
+
+scheduler = JobScheduler(JOBS, make_leader_lock())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="last run of every job")
+    run = sub.add_parser("run", help="run one job now (needs the jobs lock)")
+    run.add_argument("name", choices=[job.name for job in JOBS])
+    args = parser.parse_args()
+
+    if args.command == "status":
+        runs = scheduler.last_runs()
+        now = datetime.utcnow()
+        for job in JOBS:
+            last = runs.get(job.name)
+            due = job.due(last.started_at if last else None, now)
+            print(f"{job.name:<18} {'due' if due else '':<4} "
+                  + (f"{last.status:<8} {last.started_at:%Y-%m-%d %H:%M:%S}  {last.detail or ''}" if last else "never run"))
+        return
+
+    if not scheduler.lock.acquire():
+        parser.exit(1, "another worker holds the jobs lock; try again later\n")
+    try:
+        run = scheduler.run_job(next(job for job in JOBS if job.name == args.name))
+        print(f"{run.name}: {run.status} {run.detail}")
+    finally:
+        scheduler.lock.release()
+
+
+if __name__ == "__main__":
+    main()
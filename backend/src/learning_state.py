@@ -0,0 +1,135 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from src.catalog import get_catalog
+from src.database import dialect_insert
+from src.models import UserContentProgress, UserLearningState, UserQuestionProgress
+
+
+def _summary_columns() -> tuple:
+    # failed_count, earliest_due_at over a set of progress rows
+    uqp = UserQuestionProgress
+    return (
+        func.sum(case((uqp.last_answer_correct == False, 1), else_=0)),
+        func.min(uqp.next_review_date),
+    )
+
+
+def rebuild_learning_state(db: Session, user_id: int, now: Optional[datetime] = None) -> UserLearningState:
+    """
+    Recompute a user's learning state from the progress tables. Used the
+    first time a user needs one and for repairs; the grading paths keep it
+    current afterwards. Does not commit.
+    """
+    now = now or datetime.utcnow()
+    failed_count, earliest_due_at = db.execute(
+        select(*_summary_columns()).where(UserQuestionProgress.user_id == user_id)
+    ).one()
+
+    available = db.scalars(
+        select(UserContentProgress.content_id).filter_by(user_id=user_id, available=True)
+    ).all()
+    catalog = get_catalog(db)
+    frontier_content_id = catalog.progression.furthest(available)
+
+    state = db.get(UserLearningState, user_id)
+    if state is None:
+        insert = dialect_insert(db)
+        if insert is not None:
+            # Concurrent first requests for a user may all get here: let one insert win
+            db.execute(insert(UserLearningState.__table__).values(user_id=user_id)
+                       .on_conflict_do_nothing(index_elements=["user_id"]))
+            state = db.get(UserLearningState, user_id)
+        else:
+            state = UserLearningState(user_id=user_id)
+            db.add(state)
+    state.failed_count = failed_count or 0
+    state.earliest_due_at = earliest_due_at
+    state.frontier_content_id = frontier_content_id
+    state.frontier_level_id = catalog.contents[frontier_content_id].level_id if frontier_content_id else None
+    state.updated_at = now
+    db.flush()
+    return state
+
+
+def refresh_due_summaries(db: Session, user_ids: list, now: Optional[datetime] = None) -> int:
+    """
+    Recompute the due-queue part of the learning state (failed count,
+    earliest due date) for existing state rows of
+    many users, with one grouped read and one bulk update. Users without a
+    state row are skipped; theirs is built on first use. Does not commit.
+    """
+    now = now or datetime.utcnow()
+    user_ids = list(db.scalars(select(UserLearningState.user_id).where(UserLearningState.user_id.in_(user_ids))))
+    if not user_ids:
+        return 0
+    summaries = {user_id: (0, None) for user_id in user_ids}
+    for user_id, failed_count, earliest_due_at in db.execute(
+            select(UserQuestionProgress.user_id, *_summary_columns())
+            .where(UserQuestionProgress.user_id.in_(user_ids))
+            .group_by(UserQuestionProgress.user_id)):
+        summaries[user_id] = (failed_count or 0, earliest_due_at)
+    db.execute(update(UserLearningState), [
+        {"user_id": user_id, "failed_count": failed, "earliest_due_at": earliest, "updated_at": now}
+        for user_id, (failed, earliest) in summaries.items()
+    ])
+    return len(summaries)
+
+
+def update_learning_state(db: Session, user_id: int, prior: list, rows: list, now: datetime):
+    """
+    Apply one graded submission to the user's learning state.
+    `prior` holds (last_answer_correct, next_review_date) of the graded
+    questions that already had progress rows, `rows` the values just written.
+    """
+    state = db.get(UserLearningState, user_id)
+    if state is None:
+        rebuild_learning_state(db, user_id, now)
+        return
+
+    prior_failed = sum(1 for last_correct, _ in prior if last_correct is not None and not last_correct)
+    new_failed = sum(1 for row in rows if not row["last_answer_correct"])
+    state.failed_count = max(0, (state.failed_count or 0) + new_failed - prior_failed)
+
+    prior_due_dates = [due for _, due in prior if due is not None]
+
+    new_earliest = min(row["next_review_date"] for row in rows)
+    if state.earliest_due_at is not None and any(due <= state.earliest_due_at for due in prior_due_dates):
+        # The earliest item was just rescheduled: look up the new minimum on the due-queue index
+        state.earliest_due_at = db.scalar(
+            select(func.min(UserQuestionProgress.next_review_date)).where(
+                UserQuestionProgress.user_id == user_id,
+                UserQuestionProgress.next_review_date != None
+            )
+        )
+    elif state.earliest_due_at is None or new_earliest < state.earliest_due_at:
+        state.earliest_due_at = new_earliest
+    state.updated_at = now
+
+
+def advance_frontier(db: Session, user_id: int, content_id: int):
+    """
+    Record a newly unlocked content, if it is further along than the current frontier.
+    """
+    catalog = get_catalog(db)
+    position = catalog.progression.position
+    if content_id not in position:
+        return
+    state = db.get(UserLearningState, user_id) or rebuild_learning_state(db, user_id)
+    current = state.frontier_content_id
+    if current not in position or position[content_id] > position[current]:
+        state.frontier_content_id = content_id
+        state.frontier_level_id = catalog.contents[content_id].level_id
+
+
+async def get_learning_state(db: AsyncSession, user_id: int) -> UserLearningState:
+    """
+    One primary-key read; the state is built (and committed) on first use.
+    """
+    state = await db.get(UserLearningState, user_id)
+    if state is None:
+        state = await db.run_sync(rebuild_learning_state, user_id)
+        await db.commit()
+    return state
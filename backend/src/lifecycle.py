@@ -0,0 +1,141 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from fastapi.concurrency import run_in_threadpool
+from config import Config
+from src.catalog import get_catalog
+from src.database import SessionLocal, async_engine, async_read_engine, engine
+from src.hashing import warm_up_hashing
+from src.migrations import migrate, schema_status
+from src.shards import shards
+
+logger = logging.getLogger(__name__)
+
+# Modules request code imports on first use; warm-up loads them before traffic
+DEFERRED_IMPORTS = ("jose.jwt",)
+
+
+class BootState:
+    """
+    Per-worker startup timeline: how long each phase took, whether the
+    schema matches the code, and when the worker became ready.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.schema = None
+        self.ready_at = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - start, 4)
+
+    @property
+    def boot_seconds(self) -> float:
+        return (self.ready_at or time.perf_counter()) - self.started
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None and bool(self.schema and self.schema["up_to_date"])
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "boot_seconds": round(self.boot_seconds, 4),
+            "budget_seconds": Config.BOOT_BUDGET_SECONDS,
+            "phases": self.phases,
+            "schema": self.schema,
+        }
+
+
+boot = BootState()
+
+
+def _load_catalog():
+    db = SessionLocal()
+    try:
+        get_catalog(db)
+    finally:
+        db.close()
+
+
+def _import_deferred():
+    for module in DEFERRED_IMPORTS:
+        importlib.import_module(module)
+
+
+def _open_sync_connections(n: int):
+    connections = [engine.connect() for _ in range(n)]
+    for connection in connections:
+        connection.close()
+
+
+async def _open_async_connections(async_eng, n: int):
+    connections = [await async_eng.connect() for _ in range(n)]
+    for connection in connections:
+        await connection.close()
+
+
+async def warm_up(load_catalog: bool = True):
+    """
+    Do before traffic what the first requests would otherwise pay for: fill
+    the connection pools, load the catalog, import the deferred modules and
+    start the password hashing processes.
+    """
+    n = Config.WARMUP_CONNECTIONS
+    await run_in_threadpool(_open_sync_connections, n)
+    await _open_async_connections(async_engine, n)
+    if async_read_engine is not async_engine:
+        await _open_async_connections(async_read_engine, n)
+    for shard in shards.shards[1:]:
+        await _open_async_connections(shard.async_engine, n)
+    if load_catalog:
+        await run_in_threadpool(_load_catalog)
+    await run_in_threadpool(_import_deferred)
+    await run_in_threadpool(warm_up_hashing)
+
+
+async def start_worker():
+    """
+    Startup sequence run by the app lifespan. The schema is only checked,
+    not changed, unless MIGRATE_ON_STARTUP is set (single-worker setups).
+    """
+    with boot.phase("schema"):
+        if Config.MIGRATE_ON_STARTUP:
+            await run_in_threadpool(migrate)
+        boot.schema = await run_in_threadpool(schema_status)
+    if not boot.schema["up_to_date"]:
+        logger.error("Database schema is at version %s, the code expects %s; "
+                     "run `python -m src.migrations upgrade`",
+                     boot.schema["current"], boot.schema["latest"])
+    else:
+        # Which progress shard holds which users
+        await run_in_threadpool(shards.load)
+
+    if Config.WARMUP:
+        with boot.phase("warmup"):
+            # The catalog tables may not exist yet on a schema that is behind
+            await warm_up(load_catalog=boot.schema["up_to_date"])
+
+    boot.ready_at = time.perf_counter()
+    if boot.boot_seconds > Config.BOOT_BUDGET_SECONDS:
+        logger.warning("Worker took %.2fs to become ready, over the %.2fs budget: %s",
+                       boot.boot_seconds, Config.BOOT_BUDGET_SECONDS, boot.phases)
+
+
+async def readiness() -> dict:
+    """
+    Boot state for the readiness probe. A worker that started before the
+    deploy's migration ran re-checks the schema here and turns ready once
+    it is current.
+    """
+    if boot.ready_at is not None and not boot.ready:
+        boot.schema = await run_in_threadpool(schema_status)
+        if boot.schema["up_to_date"]:
+            await run_in_threadpool(shards.load)
+    return boot.as_dict()
@@ -0,0 +1,229 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Optional
+from sqlalchemy import event
+from config import Config
+
+# Latency buckets in seconds (Prometheus defaults, plus a few sub-millisecond ones for DB calls)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by a tuple of label values.
+    """
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for label_values, counts, total in sorted(series):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: tuple, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _gauge(name: str, help: str, value) -> list:
+    return [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+
+request_latency = Histogram(
+    "coeus_request_duration_seconds", "HTTP request latency by route.", ("method", "route"), LATENCY_BUCKETS)
+request_total = Counter(
+    "coeus_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+request_queries = Histogram(
+    "coeus_request_db_queries", "Database statements issued per request.", ("method", "route"), QUERY_COUNT_BUCKETS)
+request_db_time = Histogram(
+    "coeus_request_db_seconds", "Cumulative database time per request.", ("method", "route"), LATENCY_BUCKETS)
+query_latency = Histogram(
+    "coeus_db_query_duration_seconds", "Latency of individual database statements.", ("engine",), LATENCY_BUCKETS)
+coalesced_calls = Counter(
+    "coeus_coalesced_calls_total", "Calls that joined an identical call already in flight.", ("group",))
+rate_limited = Counter(
+    "coeus_rate_limited_total", "Requests rejected by the rate limiter.", ("limit",))
+sync_events = Counter(
+    "coeus_sync_events_total", "Answers received through /sync, by outcome.", ("status",))
+
+
+# ----------------------------
+# Per-request accounting
+# ----------------------------
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+slow_queries = deque(maxlen=Config.SLOW_QUERY_SAMPLES)
+
+
+def instrument_engine(engine, name: str):
+    """
+    Time every statement on a (sync) Engine and charge it to the current
+    request. For async engines pass `async_engine.sync_engine`.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        query_latency.observe((name,), elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed * 1000 >= Config.SLOW_QUERY_MS:
+            slow_queries.append({
+                "statement": statement[:2000],
+                "executemany": executemany,
+                "seconds": round(elapsed, 6),
+                "engine": name,
+                "route": _route_template(stats.scope) if stats is not None else None,
+                "at": time.time(),
+            })
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        # Keep the start-time stack balanced when a statement fails
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: times every HTTP request, counts the statements
+    and DB time it caused (via the engine hooks and a context variable) and
+    optionally reports them in a Server-Timing header.
+    """
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    value = (f"app;dur={elapsed_ms:.2f}, db;dur={stats.db_time * 1000:.2f}, "
+                             f'queries;desc="{stats.queries}"')
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = _route_template(scope)
+            labels = (scope["method"], route)
+            request_latency.observe(labels, elapsed)
+            request_total.inc((scope["method"], route, str(status)))
+            request_queries.observe(labels, stats.queries)
+            request_db_time.observe(labels, stats.db_time)
+            _current.reset(token)
+
+
+def _route_template(scope) -> str:
+    # Label by the matched route's template, not the raw path, to keep
+    # cardinality bounded. Routers included with a prefix may report their
+    # template without it; the prefix is static, so take it from the path.
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    path_segments = scope["path"].rstrip("/").split("/")
+    extra = len(path_segments) - len(template.rstrip("/").split("/"))
+    if extra > 0:
+        template = "/".join(path_segments[:extra + 1]) + template
+    return template
+
+
+# ----------------------------
+# Exposition
+# ----------------------------
+
+def render(extra_gauges=()) -> str:
+    """
+    All metrics in the Prometheus text exposition format. `extra_gauges`
+    are (name, help, value) triples sampled at scrape time.
+    """
+    lines = []
+    for metric in (request_latency, request_total, request_queries, request_db_time, query_latency,
+                   coalesced_calls, rate_limited, sync_events):
+        lines.extend(metric.render())
+    for name, help, value in extra_gauges:
+        lines.extend(_gauge(name, help, value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,290 @@
+"""
+Schema migrations, run as an explicit deploy step instead of by every
+worker at boot:
+
+    python -m src.migrations upgrade    # apply pending migrations
+    python -m src.migrations status     # print current / latest version
+
+Migrations are numbered functions applied in order inside one transaction;
+the last applied number is kept in the single-row schema_version table.
+Workers only read that number (see src/lifecycle.py) and report not ready
+while it is behind.
+
+Migration 1 brings any older database up to the baseline schema frozen
+below (the models as they stood when migrations were introduced): missing
+tables, columns and indexes are created, nothing is dropped or altered.
+It never follows the live models, so later migrations find the same schema
+on every database. New schema changes get a new numbered function appended
+to MIGRATIONS.
+
+Migration 2 adds the full-text search index and its sync triggers (see
+src/search.py), migration 3 the content_prerequisite table and migration 4
+the sync_receipt table (src/sync.py), migration 5 the job_run table
+(src/jobs.py), migration 6 the shard_assignment table (src/shards.py) and
+migration 7 drops user_learning_state.due_recall_count, which nothing read,
+and migration 8 adds user.token_version (src/auth_cache.py).
+"""
+import argparse
+from datetime import datetime
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+                        Text, inspect, literal, select, text)
+from sqlalchemy.engine import Connection, Engine
+from src.database import engine as default_engine
+from src.models import ContentPrerequisite, JobRun, SchemaVersion, ShardAssignment, SyncReceipt
+from src.search import create_search_index
+
+# Schema of migration 1, frozen: never edit these to follow the models,
+# append a migration instead
+_baseline = MetaData()
+
+Table(
+    "user", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String(50), nullable=False),
+    Column("name", String(100), nullable=False),
+    Column("username", String(50), unique=True, index=True, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("is_active", Boolean, default=True),
+)
+Table(
+    "level", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("key", String(100), unique=True, nullable=True),
+    Column("title", String(100), nullable=False),
+    Column("order_index", Integer, nullable=True),
+)
+Table(
+    "content", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("key", String(100), unique=True, nullable=True),
+    Column("title", String(100), nullable=False),
+    Column("body", Text, nullable=True),
+    Column("level_id", Integer, ForeignKey("level.id"), nullable=True),
+    Column("order_index", Integer, nullable=True),
+)
+Table(
+    "question", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("key", String(100), unique=True, nullable=True),
+    Column("content_id", Integer, ForeignKey("content.id"), nullable=False),
+    Column("text", Text, nullable=False),
+)
+Table(
+    "option", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("key", String(100), unique=True, nullable=True),
+    Column("question_id", Integer, ForeignKey("question.id"), nullable=False),
+    Column("text", String(255), nullable=False),
+    Column("is_correct", Boolean, default=False),
+)
+Table(
+    "catalog_version", _baseline,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+Table(
+    "schema_version", _baseline,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("applied_at", DateTime, nullable=True),
+)
+Table(
+    "user_content_progress", _baseline,
+    Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+    Column("content_id", Integer, ForeignKey("content.id"), primary_key=True),
+    Column("answered_count", Integer, default=0),
+    Column("correct_count", Integer, default=0),
+    Column("passed", Boolean, default=False),
+    Column("available", Boolean, default=False),
+)
+_progress = Table(
+    "user_question_progress", _baseline,
+    Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+    Column("question_id", Integer, ForeignKey("question.id"), primary_key=True),
+    Column("last_answer_correct", Boolean, default=False),
+    Column("next_review_date", DateTime, default=None),
+    Column("times_correct", Integer, default=0),
+    Column("times_incorrect", Integer, default=0),
+    Column("ease", Float, nullable=True),
+    Column("stability", Float, nullable=True),
+    Column("difficulty", Float, nullable=True),
+    Column("interval_days", Float, nullable=True),
+    Column("repetitions", Integer, default=0),
+    Column("last_review_date", DateTime, default=None),
+)
+Index("ix_user_question_progress_due", _progress.c.user_id, _progress.c.next_review_date, _progress.c.question_id,
+      sqlite_where=_progress.c.next_review_date.isnot(None),
+      postgresql_where=_progress.c.next_review_date.isnot(None))
+Table(
+    "answer_event", _baseline,
+    Column("id", Integer, primary_key=True),
+    Column("event_id", String(32), unique=True, nullable=False),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+    Column("question_id", Integer, ForeignKey("question.id"), nullable=False),
+    Column("option_id", Integer, nullable=True),
+    Column("correct", Boolean, nullable=False),
+    Column("source", String(20), nullable=False),
+    Column("answered_at", DateTime, nullable=False),
+    Index("ix_answer_event_user_question", "user_id", "question_id", "answered_at"),
+)
+Table(
+    "question_stats", _baseline,
+    Column("question_id", Integer, ForeignKey("question.id"), primary_key=True),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("correct", Integer, nullable=False, default=0),
+    Column("disc_n", Integer, nullable=False, default=0),
+    Column("disc_correct", Integer, nullable=False, default=0),
+    Column("rest_sum", Float, nullable=False, default=0.0),
+    Column("rest_sq_sum", Float, nullable=False, default=0.0),
+    Column("correct_rest_sum", Float, nullable=False, default=0.0),
+    Column("updated_at", DateTime, nullable=True),
+)
+Table(
+    "option_stats", _baseline,
+    Column("option_id", Integer, primary_key=True),
+    Column("question_id", Integer, ForeignKey("question.id"), nullable=False, index=True),
+    Column("selections", Integer, nullable=False, default=0),
+)
+Table(
+    "user_learning_state", _baseline,
+    Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+    Column("due_recall_count", Integer, default=0),
+    Column("earliest_due_at", DateTime, nullable=True),
+    Column("failed_count", Integer, default=0),
+    Column("frontier_content_id", Integer, ForeignKey("content.id"), nullable=True),
+    Column("frontier_level_id", Integer, ForeignKey("level.id"), nullable=True),
+    Column("updated_at", DateTime, nullable=True),
+)
+
+
+def _add_missing_columns(conn: Connection, metadata: MetaData):
+    """
+    Add columns that exist in `metadata` but not in the database. They are
+    added nullable (with the model's scalar default, if any) since existing
+    rows have no value; unique columns get a unique index instead of a
+    constraint, which SQLite cannot add to an existing table.
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = (f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                   f"{preparer.format_column(column)} {column.type.compile(conn.dialect)}")
+            if column.default is not None and column.default.is_scalar:
+                value = literal(column.default.arg, column.type)
+                ddl += f" DEFAULT {value.compile(conn, compile_kwargs={'literal_binds': True})}"
+            conn.exec_driver_sql(ddl)
+            if column.unique:
+                name = preparer.quote(f"uq_{table.name}_{column.name}")
+                conn.exec_driver_sql(f"CREATE UNIQUE INDEX {name} ON {preparer.format_table(table)} "
+                                     f"({preparer.format_column(column)})")
+
+
+def _sync_with_baseline(conn: Connection):
+    _baseline.create_all(bind=conn)
+    _add_missing_columns(conn, _baseline)
+    for table in _baseline.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _add_content_prerequisites(conn: Connection):
+    ContentPrerequisite.__table__.create(conn, checkfirst=True)
+
+
+def _add_sync_receipts(conn: Connection):
+    SyncReceipt.__table__.create(conn, checkfirst=True)
+
+
+def _add_job_runs(conn: Connection):
+    JobRun.__table__.create(conn, checkfirst=True)
+
+
+def _add_shard_assignments(conn: Connection):
+    ShardAssignment.__table__.create(conn, checkfirst=True)
+
+
+def _drop_due_recall_count(conn: Connection):
+    inspector = inspect(conn)
+    if inspector.has_table("user_learning_state") and \
+            "due_recall_count" in {c["name"] for c in inspector.get_columns("user_learning_state")}:
+        conn.exec_driver_sql("ALTER TABLE user_learning_state DROP COLUMN due_recall_count")
+
+
+def _add_user_token_version(conn: Connection):
+    conn.exec_driver_sql('ALTER TABLE "user" ADD COLUMN token_version INTEGER DEFAULT 0 NOT NULL')
+
+
+# (version, description, function); append only, never renumber
+MIGRATIONS = [
+    (1, "create missing tables, columns and indexes", _sync_with_baseline),
+    (2, "full-text search index over contents and questions", create_search_index),
+    (3, "explicit content prerequisites", _add_content_prerequisites),
+    (4, "processed idempotency keys of synced answers", _add_sync_receipts),
+    (5, "background job runs", _add_job_runs),
+    (6, "user bucket to progress shard assignments", _add_shard_assignments),
+    (7, "drop the unused learning-state due count", _drop_due_recall_count),
+    (8, "token version to revoke a user's access tokens", _add_user_token_version),
+]
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    """
+    The applied schema version, 0 for a database never migrated.
+    """
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return 0
+    return conn.scalar(select(SchemaVersion.version).where(SchemaVersion.id == 1)) or 0
+
+
+def schema_status(engine: Engine = default_engine) -> dict:
+    with engine.connect() as conn:
+        current = current_version(conn)
+    return {"current": current, "latest": LATEST, "up_to_date": current >= LATEST}
+
+
+def migrate(engine: Engine = default_engine) -> list:
+    """
+    Apply pending migrations in one transaction. Returns the versions
+    applied. Concurrent runs on Postgres are serialized by an advisory lock.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('coeus_schema_migrations'))"))
+        current = current_version(conn)
+        applied = []
+        for version, _, migration in MIGRATIONS:
+            if version > current:
+                migration(conn)
+                applied.append(version)
+        if applied:
+            SchemaVersion.__table__.create(conn, checkfirst=True)
+            conn.execute(SchemaVersion.__table__.delete())
+            conn.execute(SchemaVersion.__table__.insert().values(id=1, version=applied[-1],
+                                                                 applied_at=datetime.utcnow()))
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["upgrade", "status"])
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = migrate()
+        print(f"applied migrations {applied}" if applied else "schema already up to date")
+        for version, description, _ in MIGRATIONS:
+            if version in applied:
+                print(f"  {version}: {description}")
+    status = schema_status()
+    print(f"schema version {status['current']} (latest {status['latest']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Float, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 from pydantic import BaseModel
@@ -11,10 +11,13 @@ class User(Base):
     username = Column(String(50), unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Carried in access tokens; bumped to revoke the ones issued so far (see src/auth_cache.py)
+    token_version = Column(Integer, nullable=False, default=0)
 
 class Level(Base):
     __tablename__ = "level"
     id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(100), unique=True, nullable=True)  # natural key used by curriculum import
     title = Column(String(100), nullable=False)
     order_index = Column(Integer, nullable=True)
 
@@ -23,6 +26,7 @@ class Level(Base):
 class Content(Base):
     __tablename__ = "content"
     id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(100), unique=True, nullable=True)  # natural key used by curriculum import
     title = Column(String(100), nullable=False)
     body = Column(Text, nullable=True)
     level_id = Column(Integer, ForeignKey("level.id"), nullable=True)
@@ -34,6 +38,7 @@ class Content(Base):
 class Question(Base):
     __tablename__ = "question"
     id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(100), unique=True, nullable=True)  # natural key used by curriculum import
     content_id = Column(Integer, ForeignKey("content.id"), nullable=False)
     text = Column(Text, nullable=False)
 
@@ -43,12 +48,44 @@ class Question(Base):
 class Option(Base):
     __tablename__ = "option"
     id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(100), unique=True, nullable=True)  # natural key used by curriculum import
     question_id = Column(Integer, ForeignKey("question.id"), nullable=False)
     text = Column(String(255), nullable=False)
     is_correct = Column(Boolean, default=False)
 
     question = relationship("Question", back_populates="options")
 
+class ContentPrerequisite(Base):
+    """
+    Explicit prerequisite edge: `content_id` unlocks once every content it
+    requires is passed. Contents without any follow curriculum order (see
+    Progression in src/catalog.py).
+    """
+    __tablename__ = "content_prerequisite"
+    id = Column(Integer, primary_key=True)
+    key = Column(String(100), unique=True, nullable=True)  # natural key used by curriculum import
+    content_id = Column(Integer, ForeignKey("content.id"), nullable=False, index=True)
+    requires_content_id = Column(Integer, ForeignKey("content.id"), nullable=False)
+
+class CatalogVersion(Base):
+    """
+    Single-row table (id=1) bumped on every curriculum write so each worker
+    knows when to rebuild its in-memory catalog (see src/catalog.py).
+    """
+    __tablename__ = "catalog_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class SchemaVersion(Base):
+    """
+    Single-row table (id=1) recording the last migration applied by
+    `python -m src.migrations upgrade` (see src/migrations.py).
+    """
+    __tablename__ = "schema_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, nullable=True)
+
 class UserContentProgress(Base):
     __tablename__ = "user_content_progress"
     user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
@@ -66,6 +103,115 @@ class UserQuestionProgress(Base):
     next_review_date = Column(DateTime, default=None)
     times_correct = Column(Integer, default=0)
     times_incorrect = Column(Integer, default=0)
+    # Spaced-repetition state (see src/scheduler); NULL until first scheduled
+    ease = Column(Float, nullable=True)            # SM-2 ease factor
+    stability = Column(Float, nullable=True)       # FSRS memory stability (days)
+    difficulty = Column(Float, nullable=True)      # FSRS difficulty (1-10)
+    interval_days = Column(Float, nullable=True)
+    repetitions = Column(Integer, default=0)
+    last_review_date = Column(DateTime, default=None)
+
+    __table_args__ = (
+        # Due-queue access path for recall: one user's scheduled rows in due order,
+        # covering the question ids so paging never touches the table.
+        # Partial where supported, since unscheduled rows are never due.
+        Index(
+            "ix_user_question_progress_due", "user_id", "next_review_date", "question_id",
+            sqlite_where=next_review_date.isnot(None),
+            postgresql_where=next_review_date.isnot(None),
+        ),
+    )
+
+class AnswerEvent(Base):
+    """
+    Append-only log of every graded answer. Written in batches by the
+    write-behind buffer in src/answer_log.py; UserQuestionProgress can be
+    rebuilt from it as a projection.
+    """
+    __tablename__ = "answer_event"
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String(32), unique=True, nullable=False)  # makes spool replays idempotent
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("question.id"), nullable=False)
+    option_id = Column(Integer, nullable=True)  # no FK: unknown options are logged as answered
+    correct = Column(Boolean, nullable=False)
+    source = Column(String(20), nullable=False)  # exam / recall / review / unit_exam
+    answered_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_answer_event_user_question", "user_id", "question_id", "answered_at"),
+    )
+
+class QuestionStats(Base):
+    """
+    Running item-analysis aggregates per question, maintained from the answer
+    log (see src/item_stats.py). The disc_* / *_sum columns only count answers
+    from multi-question submissions and feed the discrimination index.
+    """
+    __tablename__ = "question_stats"
+    question_id = Column(Integer, ForeignKey("question.id"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    disc_n = Column(Integer, nullable=False, default=0)
+    disc_correct = Column(Integer, nullable=False, default=0)
+    rest_sum = Column(Float, nullable=False, default=0.0)           # sum of rest scores
+    rest_sq_sum = Column(Float, nullable=False, default=0.0)        # sum of squared rest scores
+    correct_rest_sum = Column(Float, nullable=False, default=0.0)   # sum of rest scores when correct
+    updated_at = Column(DateTime, nullable=True)
+
+class OptionStats(Base):
+    __tablename__ = "option_stats"
+    option_id = Column(Integer, primary_key=True)  # no FK, like answer_event.option_id
+    question_id = Column(Integer, ForeignKey("question.id"), nullable=False, index=True)
+    selections = Column(Integer, nullable=False, default=0)
+
+class UserLearningState(Base):
+    """
+    Compact per-user summary of what to study next, maintained incrementally
+    by the grading paths (see src/learning_state.py) so /content/next can
+    decide from this one row.
+    """
+    __tablename__ = "user_learning_state"
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    earliest_due_at = Column(DateTime, nullable=True)
+    failed_count = Column(Integer, default=0)
+    frontier_content_id = Column(Integer, ForeignKey("content.id"), nullable=True)
+    frontier_level_id = Column(Integer, ForeignKey("level.id"), nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+class SyncReceipt(Base):
+    """
+    Idempotency keys of the answers applied through POST /sync, kept as a
+    64-bit hash per user so the index stays a few bytes per answer (see
+    src/sync.py). Pruned after SYNC_RECEIPT_RETENTION_DAYS.
+    """
+    __tablename__ = "sync_receipt"
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    key_hash = Column(BigInteger, primary_key=True)
+    processed_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class JobRun(Base):
+    """
+    Last run of each background job (see src/jobs.py), so whichever worker
+    holds the jobs lock knows what is due, even right after taking over.
+    """
+    __tablename__ = "job_run"
+    name = Column(String(50), primary_key=True)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    status = Column(String(10), nullable=False)  # running / ok / failed / stopped
+    detail = Column(Text, nullable=True)
+
+class ShardAssignment(Base):
+    """
+    Which progress shard holds the users of each hash bucket (see
+    src/shards.py). Buckets without a row are on shard 0, the main database.
+    """
+    __tablename__ = "shard_assignment"
+    bucket = Column(Integer, primary_key=True)
+    shard = Column(Integer, nullable=False)
 
 class SubmittedExam(BaseModel):
     answers: list
\ No newline at end of file
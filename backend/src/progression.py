@@ -0,0 +1,106 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from src.catalog import get_catalog
+from src.database import dialect_insert
+from src.learning_state import advance_frontier
+from src.models import UserContentProgress
+
+
+def unlock_contents(db: Session, user_id: int, content_ids) -> list:
+    """
+    Make the contents available to the user with one statement, creating
+    progress rows that do not exist yet, and move the user's frontier.
+    Returns the ids unlocked. Does not commit.
+    """
+    content_ids = sorted(set(content_ids))
+    if not content_ids:
+        return []
+    insert = dialect_insert(db)
+    if insert is not None:
+        stmt = insert(UserContentProgress.__table__).values([
+            {"user_id": user_id, "content_id": cid, "available": True, "passed": False,
+             "answered_count": 0, "correct_count": 0}
+            for cid in content_ids
+        ])
+        db.execute(stmt.on_conflict_do_update(index_elements=["user_id", "content_id"], set_={"available": True}))
+    else:
+        existing = {
+            ucp.content_id: ucp
+            for ucp in db.query(UserContentProgress).filter(
+                UserContentProgress.user_id == user_id,
+                UserContentProgress.content_id.in_(content_ids)
+            )
+        }
+        for cid in content_ids:
+            ucp = existing.get(cid)
+            if ucp is None:
+                db.add(UserContentProgress(user_id=user_id, content_id=cid, available=True, passed=False,
+                                           answered_count=0, correct_count=0))
+            else:
+                ucp.available = True
+
+    advance_frontier(db, user_id, get_catalog(db).progression.furthest(content_ids))
+    return content_ids
+
+
+def unlock_after_content(db: Session, user_id: int, content_id: int) -> list:
+    """
+    Unlock what passing `content_id` opens: the contents that require it
+    and whose other prerequisites, if any, the user has passed already.
+    """
+    progression = get_catalog(db).progression
+    candidates = progression.unlocks.get(content_id, ())
+    others = {r for cid in candidates for r in progression.requires[cid] if r != content_id}
+    passed = {content_id}
+    if others:
+        passed.update(db.scalars(
+            select(UserContentProgress.content_id).where(
+                UserContentProgress.user_id == user_id,
+                UserContentProgress.content_id.in_(others),
+                UserContentProgress.passed == True
+            )
+        ))
+    return unlock_contents(db, user_id, [
+        cid for cid in candidates if all(r in passed for r in progression.requires[cid])
+    ])
+
+
+def unlock_after_level(db: Session, user_id: int, level_id: int) -> list:
+    """
+    Unlock the first content of the level after `level_id`, if there is one.
+    """
+    progression = get_catalog(db).progression
+    entry = progression.level_entry.get(progression.next_level.get(level_id))
+    return unlock_contents(db, user_id, [entry] if entry is not None else [])
+
+
+# Pass criteria for a content exam
+PASS_SCORE = 0.8        # this attempt
+PASS_MIN_ANSWERED = 30  # answers on the content so far
+PASS_MIN_RATIO = 0.5    # correct ratio so far
+
+
+def record_exam_attempt(db: Session, user_id: int, content_id: int, answered: int, correct: int):
+    """
+    Add one exam attempt on a content to the user's progress and, if it
+    passes, mark the content passed and unlock what it opens. Returns the
+    progress row and the ids unlocked. Does not commit.
+    """
+    ucp = db.get(UserContentProgress, (user_id, content_id))
+    if not ucp:
+        ucp = UserContentProgress(user_id=user_id, content_id=content_id,
+                                  answered_count=0, correct_count=0)
+        db.add(ucp)
+
+    ucp.answered_count = (ucp.answered_count or 0) + answered
+    ucp.correct_count = (ucp.correct_count or 0) + correct
+
+    score_this_attempt = correct / answered if answered > 0 else 0.0
+    overall_correct_ratio = ucp.correct_count / ucp.answered_count if ucp.answered_count > 0 else 0.0
+
+    unlocked = []
+    if score_this_attempt >= PASS_SCORE and ucp.answered_count >= PASS_MIN_ANSWERED \
+            and overall_correct_ratio >= PASS_MIN_RATIO:
+        ucp.passed = True
+        unlocked = unlock_after_content(db, user_id, content_id)
+    return ucp, unlocked
@@ -0,0 +1,133 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request
+from config import Config
+from src.metrics import rate_limited
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """
+    Token buckets in this process: {key: (tokens, updated_at)}, LRU-bounded.
+    Each worker limits on its own, so with N workers a client can get up to
+    N times the configured rate; use the shared backend when that matters.
+    Only touched from the event loop, so it needs no lock.
+    """
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Same bucket arithmetic as MemoryBackend, atomically in Redis, on the
+# server's clock so workers on different hosts agree
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """
+    Token buckets shared by all workers, in Redis (RATE_LIMIT_REDIS_URL).
+    If Redis is unreachable, requests are let through rather than failed.
+    """
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(await self._script(keys=[f"coeus:rate:{key}"], args=[rate, burst]))
+        except Exception:
+            logger.exception("Rate limit backend unavailable; allowing request")
+            return 0.0
+
+
+def make_backend():
+    if Config.RATE_LIMIT_REDIS_URL:
+        return RedisBackend(Config.RATE_LIMIT_REDIS_URL)
+    return MemoryBackend(Config.RATE_LIMIT_MAX_KEYS)
+
+
+backend = make_backend()
+
+
+def client_key(request: Request) -> str:
+    """
+    Who to limit: the user id of a valid bearer token, otherwise the client
+    address. The token is verified so a client cannot spread its requests
+    over made-up user ids.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        from jose import JWTError, jwt
+        try:
+            payload = jwt.decode(authorization[7:], Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
+            if payload.get("uid") is not None:
+                return f"user:{payload['uid']}"
+        except JWTError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(name: str, per_minute: float, burst: int):
+    """
+    Route dependency: a token bucket per client and per `name` (one name per
+    route or group of routes) refilled at `per_minute`, holding up to
+    `burst` requests. Over the limit the request gets a 429 with Retry-After.
+    """
+    rate = per_minute / 60
+
+    async def check(request: Request):
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+        wait = await backend.take(f"{name}:{client_key(request)}", rate, burst)
+        if wait > 0:
+            rate_limited.inc((name,))
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+    return Depends(check)
+
+
+def submit_limit(name: str):
+    return rate_limit(name, Config.RATE_LIMIT_SUBMIT_PER_MINUTE, Config.RATE_LIMIT_SUBMIT_BURST)
+
+
+def read_limit(name: str):
+    return rate_limit(name, Config.RATE_LIMIT_READ_PER_MINUTE, Config.RATE_LIMIT_READ_BURST)
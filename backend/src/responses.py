@@ -0,0 +1,26 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson (datetimes, numpy scalars and
+    non-string keys included). Used as the app's default response class.
+
+    Endpoints serving large payloads built from trusted internal data (the
+    catalog) return it directly with `trusted(...)`: FastAPI then skips
+    response-model validation and jsonable_encoder, while the declared
+    response_model still documents the shape.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def trusted(content, status_code: int = 200, headers: dict = None) -> FastJSONResponse:
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
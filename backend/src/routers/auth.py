@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from config import Config
 
-from src.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.auth_cache import Principal, principal_cache
+from src.database import get_async_db
+from src.hashing import hash_password, hashing_stats, verify_password
 from src.models import User
 from fastapi.security import OAuth2PasswordBearer
 
@@ -16,14 +17,7 @@ SECRET_KEY = Config.SECRET_KEY  # Use a long random string in production
 ALGORITHM = Config.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# Password hashing runs off the event loop in a bounded pool (see src/hashing.py)
 
 # ----------------------------
 # Pydantic Schemas
@@ -34,6 +28,7 @@ class UserCreate(BaseModel):
     username: str
     email: str
     password: str
+    name: str | None = None
 
 class UserLogin(BaseModel):
     username_or_email: str
@@ -48,53 +43,66 @@ class Token(BaseModel):
 # ----------------------------
 
 @router.post("/register", response_model=Token)
-def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user with username and password, returning a JWT.
     If you want to separate registration from login, you can do so,
     but here we just show an example that returns token immediately after registering.
     """
     # Check if user already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User.id).filter(User.username == user_data.username))
+    existing_email = await db.scalar(select(User.id).filter(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=400,
             detail="Username already registered."
         )
+    if existing_email:
+        raise HTTPException(
+            status_code=400,
+            detail="Email already registered."
+        )
 
-    hashed_pw = get_password_hash(user_data.password)
+    hashed_pw = await hash_password(user_data.password)
     new_user = User(
         username=user_data.username,
+        email=user_data.email,
+        name=user_data.name or user_data.username,
         hashed_password=hashed_pw
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     # Generate a token for the newly created user
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": new_user.username},
+        data={"sub": new_user.username, "uid": new_user.id, "ver": new_user.token_version},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Log in an existing user and return a JWT on success.
+    Hashes made with an outdated cost factor are upgraded on the way.
     """
-    user = db.query(User).filter(User.username == user_data.username_or_email).first()
+    user = await db.scalar(select(User).filter(User.username == user_data.username_or_email))
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    valid, new_hash = await verify_password(user_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
 
     # Create a new token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version},
         expires_delta=access_token_expires
     )
 
@@ -104,7 +112,9 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """
     Encode a JWT token with the provided data. 
-    'data' typically has 'sub' key referencing username or user ID.
+    'data' typically has 'sub' key referencing username, 'uid' with the user ID
+    so get_current_user can resolve the principal without a username lookup,
+    and 'ver' with the user's token version, bumped to revoke the token.
     """
     to_encode = data.copy()
     if expires_delta:
@@ -112,6 +122,8 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    # python-jose loads its crypto backends on import, so it is imported on first use
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -122,10 +134,13 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
     """
-    Decodes the JWT token, returns the user.
-    If invalid or expired, raises 401.
+    Decodes the JWT token, returns the user as an immutable Principal.
+    If invalid, expired, revoked or deactivated, raises 401.
+    Principals are cached (see src/auth_cache.py), so most requests never
+    touch the database; the session is only opened on a cache miss, or when
+    the token is newer than the cached principal.
     """
     credentials_exception = HTTPException(
         status_code=401,
@@ -133,18 +148,62 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
         username: str = payload.get("sub")
+        user_id = payload.get("uid")
+        token_version = payload.get("ver", 0)
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    if Config.AUTH_TRUST_TOKEN_CLAIMS and user_id is not None:
+        if principal_cache.revoked(user_id, token_version):
+            raise credentials_exception
+        return Principal(user_id, username, None, None, True, token_version)
+
+    cache_key = user_id if user_id is not None else f"sub:{username}"
+    principal = principal_cache.get(cache_key)
+    if principal is None or principal.token_version < token_version:
+        if user_id is not None:
+            user = await db.get(User, user_id)
+        else:
+            user = await db.scalar(select(User).filter(User.username == username))
+        if user is None or user.username != username:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(cache_key, principal)
+
+    if not principal.is_active or principal.token_version != token_version:
         raise credentials_exception
-    return user
+    return principal
+
+
+async def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """
+    Like get_current_user, but only lets through users listed in ADMIN_USERNAMES.
+    """
+    if current_user.username not in Config.ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+@router.get("/principal-cache", dependencies=[Depends(require_admin)])
+def principal_cache_stats():
+    """
+    Hit/miss counters of the authenticated-principal cache, for sizing it.
+    """
+    return principal_cache.stats()
+
+
+@router.get("/hashing", dependencies=[Depends(require_admin)])
+def password_hashing_stats():
+    """
+    Size and current backlog of the password hashing pool.
+    """
+    return hashing_stats()
 
 """ To protect routings:
 
@@ -155,11 +214,11 @@ router = APIRouter()
 @router.get("/next")
 def get_next_content(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     ###
     Protected endpoint - only accessible if a valid token is provided.
-    'current_user' will be the user object from DB if token is valid.
+    'current_user' will be the user's Principal (id, username, ...) if token is valid.
     ###
     
     user_id = current_user.id
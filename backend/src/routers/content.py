@@ -1,56 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+import io
+import tempfile
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from src.database import get_db
-from src.models import (
-    Content, UserContentProgress, UserQuestionProgress
-)
-from recall import get_recall_questions
-from review import get_review_questions
+from config import Config
+from src.auth_cache import Principal
+from src.catalog import get_catalog_async
+from src.curriculum_io import export_lines, import_curriculum
+from src.database import SessionLocal, get_db
+from src.http_cache import RepresentationCache, cache_control, conditional_response
+from src.learning_state import get_learning_state
+from src.models import UserContentProgress
+from src.rate_limit import read_limit
+from src.responses import dumps
+from src.routers.auth import get_current_user, require_admin
+from src.routers.recall import get_recall_questions
+from src.routers.review import get_review_questions
+from src.schemas import ContentOut, RecallOut, ReviewOut, SearchOut
+from src.search import SearchUnavailable, search
+from src.shards import get_user_async_db, get_user_async_read_db
 
 router = APIRouter()
 
-@router.get("/next")
-def get_next_content(db: Session = Depends(get_db)):
+# Uploads larger than this are spooled to disk before importing
+IMPORT_SPOOL_MEMORY = 8 * 1024 * 1024
+
+# Rendered (and precompressed) lesson bodies, rebuilt when a content changes
+_content_representations = RepresentationCache("content_representation", Config.CONTENT_RENDER_CACHE_BYTES)
+
+
+def _render_content(content) -> bytes:
+    return dumps({
+        "id": content.id,
+        "title": content.title,
+        "body": content.body,
+        "level_id": content.level_id
+    })
+
+@router.get("/next", response_model=ContentOut | RecallOut | ReviewOut, dependencies=[read_limit("content_next")])
+async def get_next_content(request: Request, db: AsyncSession = Depends(get_user_async_db),
+                           current_user: Principal = Depends(get_current_user)):
     """
     GET /content/next
     - Illustrates the logic for the work queue: 
       recall -> review -> new content.
-    - Currently a placeholder with minimal logic.
+    - Decides from the user's learning-state row and only fetches the
+      payload it returns.
     """
-    user_id = 1  # Hardcoded example
+    user_id = current_user.id
+
+    state = await get_learning_state(db, user_id)
+    now = datetime.utcnow()
 
     #   1) Check if user has questions due for recall
-    recall_questions = get_recall_questions()
-    if len(recall_questions["due_recall_questions"]) > 0:
-        return recall_questions
+    if state.earliest_due_at is not None and state.earliest_due_at <= now:
+        return await get_recall_questions(db, current_user)
 
     #   2) Check if user has pending reviews 
-    review_questions = get_review_questions()
-    if len(review_questions["failed_questions"]):
-        return review_questions
+    if state.failed_count > 0:
+        return await get_review_questions(db, current_user)
+
     #   3) Otherwise, serve new content
-    last_content = None #placeholder
-    return get_content(last_content)
+    if state.frontier_content_id is None:
+        raise HTTPException(status_code=404, detail="No content available yet")
+    return await get_content(state.frontier_content_id, db, request, current_user)
 
 
-@router.get("/{content_id}")
-def get_content(content_id: int = Path(description="ID number of the content to GET from database"), db: Session = Depends(get_db)):
+@router.get("/search", response_model=SearchOut,
+            dependencies=[read_limit("content_search"), cache_control("no-store")])
+async def search_content(q: str = Query(min_length=1, max_length=200), level_id: int | None = None,
+                         limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0, le=1000),
+                         db: AsyncSession = Depends(get_user_async_read_db),
+                         current_user: Principal = Depends(get_current_user)):
+    """
+    GET /content/search?q=...
+    Ranked full-text search over lesson titles, bodies and question text,
+    limited to the contents the user has unlocked (optionally one level).
+    Every word must match; the last one also matches as a prefix. Matches
+    in the snippet are wrapped in <mark> tags.
+    """
+    user_id = current_user.id
+
+    try:
+        hits = await search(db, user_id, q, level_id, limit + 1, offset)
+    except SearchUnavailable as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    return {"query": q, "results": hits[:limit], "limit": limit, "offset": offset, "has_more": len(hits) > limit}
+
+
+@router.post("/import", dependencies=[Depends(require_admin)])
+async def import_content(request: Request, format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """
+    POST /content/import
+    Bulk-load levels, contents, questions and options from an NDJSON or CSV
+    request body (e.g. curl --data-binary @curriculum.ndjson), see
+    src/curriculum_io.py. The body is spooled to a temp file and written in
+    chunks; re-importing the same file updates rows in place.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    def run():
+        db = SessionLocal()
+        try:
+            stream = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+            return import_curriculum(db, stream, format).as_dict()
+        finally:
+            db.close()
+            spool.close()
+
+    return await run_in_threadpool(run)
+
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+def export_content(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """
+    GET /content/export
+    Stream the whole curriculum in the import format.
+    """
+    def generate():
+        # The session has to outlive the handler, so the generator owns it
+        db = SessionLocal()
+        try:
+            yield from export_lines(db, format)
+        finally:
+            db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="curriculum.{format}"'})
+
+
+@router.get("/{content_id}", response_model=ContentOut, dependencies=[read_limit("content")])
+async def get_content(content_id: int = Path(description="ID number of the content to GET from database"), db: AsyncSession = Depends(get_user_async_read_db),
+                      request: Request = None, current_user: Principal = Depends(get_current_user)):
     """
     GET /content/{content_id}
     Return the details of a specific lesson/content unit.
+    - Carries a strong ETag of the rendered lesson; a matching If-None-Match
+      gets a 304 without the body. Large bodies are served precompressed.
     """
-    content = db.query(Content).filter(Content.id == content_id).first()
+    user_id = current_user.id
+
+    content = (await get_catalog_async(db)).contents.get(content_id)
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
-    progress = db.query(UserContentProgress).filter(Content.id == content_id).first()
-    if progress.available:
-        return {
-            "id": content.id,
-            "title": content.title,
-            "body": content.body,
-            "level_id": content.level_id
-        }
+    available = await db.scalar(
+        select(UserContentProgress.available).filter_by(user_id=user_id, content_id=content_id)
+    )
+    if available:
+        return conditional_response(
+            request, await _content_representations.get_async(content_id, content, _render_content))
     else: 
         raise HTTPException(status_code=403, detail="Content not available to you yet")
 
@@ -1,114 +1,72 @@
-import random
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
-from src.models import (
-    Question, Option,
-    UserContentProgress, UserQuestionProgress, SubmittedExam
-)
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.auth_cache import Principal
+from src.catalog import get_catalog_async
+from src.exam_assembly import assemble_content_exam
+from src.grading import exam_rejection, grade_answers_async
+from src.http_cache import NO_STORE
+from src.models import SubmittedExam
+from src.progression import record_exam_attempt
+from src.rate_limit import read_limit, submit_limit
+from src.responses import trusted
+from src.routers.auth import get_current_user
+from src.schemas import ExamOut, ExamResultOut
+from src.shards import get_user_async_db, get_user_async_read_db
 
 router = APIRouter()
 
-@router.get("/{content_id}")
-def start_exam(content_id: int, db: Session = Depends(get_db), number_questions: int = 10):
+# Questions drawn by default, and answers a submission needs (fewer only if the content has fewer)
+EXAM_QUESTIONS = 10
+
+@router.get("/{content_id}", response_model=ExamOut, dependencies=[read_limit("exam")])
+async def start_exam(content_id: int, db: AsyncSession = Depends(get_user_async_read_db),
+                     current_user: Principal = Depends(get_current_user), number_questions: int = EXAM_QUESTIONS):
     """
     GET /exam/{content_id}
-    Return a number of random questions for the given content.
+    Return a number of random questions for the given content, favouring
+    the ones the user failed or has not seen yet.
     """
-    user_id = 1  # Hardcoded example
+    user_id = current_user.id
 
-    questions = db.query(Question).filter(Question.content_id == content_id).all()
-    random.shuffle(questions)
-    selected_questions = questions[:number_questions]
+    catalog = await get_catalog_async(db)
+    selected_ids = await assemble_content_exam(db, catalog, user_id, content_id, number_questions)
 
-    response_data = []
-    for q in selected_questions:
-        response_data.append({
-            "question_id": q.id,
-            "question_text": q.text,
-            "options": [
-                {"option_id": opt.id, "text": opt.text}
-                for opt in q.options
-            ]
-        })
+    response_data = catalog.question_payloads(selected_ids, text_key="question_text")
 
-    return {
+    return trusted({
         "content_id": content_id,
         "questions": response_data
-    }
+    }, headers=NO_STORE)
 
-@router.post("/{content_id}/submit")
-def submit_exam(content_id: int, answers: SubmittedExam, db: Session = Depends(get_db)):
+@router.post("/{content_id}/submit", response_model=ExamResultOut, dependencies=[submit_limit("exam_submit")])
+async def submit_exam(content_id: int, answers: SubmittedExam, db: AsyncSession = Depends(get_user_async_db),
+                      current_user: Principal = Depends(get_current_user)):
     """
     POST /exam/{content_id}/submit
     Expects JSON: { "answers": [ { "question_id": x, "option_id": y }, ... ] }
     Grades the exam, updates progress, checks pass/fail.
     """
-    user_id = 1  # Hardcoded example
+    user_id = current_user.id
 
     # Extract answers list from payload
-    submitted_answers = answers.get("answers", [])
-    correct_count_this_attempt = 0
-
-    # Grade each answer
-    for ans in submitted_answers:
-        question_id = ans["question_id"]
-        chosen_option_id = ans["option_id"]
-
-        chosen_option = db.query(Option).filter(Option.id == chosen_option_id).first()
-        if chosen_option and chosen_option.is_correct:
-            correct_count_this_attempt += 1
-            # Update UserQuestionProgress
-            uq = db.query(UserQuestionProgress).filter_by(
-                user_id=user_id, question_id=question_id
-            ).first()
-            if not uq:
-                uq = UserQuestionProgress(user_id=user_id, question_id=question_id)
-                db.add(uq)
-            uq.last_answer_correct = True
-            uq.times_correct += 1
-        else:
-            uq = db.query(UserQuestionProgress).filter_by(
-                user_id=user_id, question_id=question_id
-            ).first()
-            if not uq:
-                uq = UserQuestionProgress(user_id=user_id, question_id=question_id)
-                db.add(uq)
-            uq.last_answer_correct = False
-            uq.times_incorrect += 1
-
-    # Update UserContentProgress
-    ucp = db.query(UserContentProgress).filter_by(
-        user_id=user_id, content_id=content_id
-    ).first()
-    if not ucp:
-        ucp = UserContentProgress(user_id=user_id, content_id=content_id)
-        db.add(ucp)
-
-    ucp.answered_count += len(submitted_answers)
-    ucp.correct_count += correct_count_this_attempt
-
-    # Check pass criteria
-    score_this_attempt = 0.0
-    if len(submitted_answers) > 0:
-        score_this_attempt = correct_count_this_attempt / len(submitted_answers)
-    overall_correct_ratio = 0.0
-    if ucp.answered_count > 0:
-        overall_correct_ratio = ucp.correct_count / ucp.answered_count
-
-    pass_80_percent = (score_this_attempt >= 0.8)
-    pass_30_min = (ucp.answered_count >= 30)
-    pass_50_ratio = (overall_correct_ratio >= 0.5)
-
-
-    #Update UserContentProgress.passed and Content.available in db
-    if pass_80_percent and pass_30_min and pass_50_ratio:
-        ucp.passed = True
-        next_ucp = db.query(UserContentProgress).filter_by(
-        user_id=user_id, content_id=content_id+1
-        ).first()
-        next_ucp.available = True
-    db.commit()
+    submitted_answers = answers.answers
+
+    catalog = await get_catalog_async(db)
+    content = catalog.contents.get(content_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    error = exam_rejection(catalog, submitted_answers, content.question_ids, EXAM_QUESTIONS)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    # Grade all answers in one batch
+    graded = await grade_answers_async(db, user_id, submitted_answers, source="exam")
+    correct_count_this_attempt = sum(1 for g in graded if g.correct)
+
+    # Update UserContentProgress, check pass criteria and unlock what it opens
+    ucp, _ = await db.run_sync(record_exam_attempt, user_id, content_id,
+                               len(submitted_answers), correct_count_this_attempt)
+    await db.commit()
 
     return {
         "message": "Exam submitted",
@@ -1,76 +1,84 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from src.database import get_db
-from src.models import (
-    Question, Option, UserQuestionProgress
-)
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.auth_cache import Principal
+from src.catalog import get_catalog_async
+from src.grading import grade_answers_async
+from src.http_cache import NO_STORE, cache_control
+from src.models import UserQuestionProgress
+from src.rate_limit import submit_limit
+from src.responses import trusted
+from src.routers.auth import get_current_user
+from src.schemas import MessageOut, RecallCountOut, RecallOut
+from src.shards import get_user_async_db, get_user_async_read_db
 
 router = APIRouter()
 
-@router.get("")
-def get_recall_questions(db: Session = Depends(get_db)):
-    """
-    GET /remember
-    Return a set of previously learned questions due for spaced repetition (next_review_date <= now).
-    """
-    user_id = 1  # Hardcoded
+MAX_RECALL_PAGE = 100
 
-    now = datetime.utcnow()
-    due_questions = db.query(UserQuestionProgress).filter(
+def _due_filter(user_id: int, now: datetime):
+    return (
         UserQuestionProgress.user_id == user_id,
         UserQuestionProgress.next_review_date != None,
         UserQuestionProgress.next_review_date <= now
-    ).all()
+    )
+
+async def count_due_recall(db: AsyncSession, user_id: int, now: datetime = None) -> int:
+    """
+    Number of questions due for recall, answered from the due-queue index alone.
+    """
+    now = now or datetime.utcnow()
+    return await db.scalar(
+        select(func.count()).select_from(UserQuestionProgress).where(*_due_filter(user_id, now))
+    )
+
+@router.get("", response_model=RecallOut)
+async def get_recall_questions(db: AsyncSession = Depends(get_user_async_read_db),
+                               current_user: Principal = Depends(get_current_user), limit: int = 20, offset: int = 0):
+    """
+    GET /remember?limit=20&offset=0
+    Return a page of previously learned questions due for spaced repetition (next_review_date <= now),
+    most overdue first.
+    """
+    user_id = current_user.id
+    limit = max(1, min(limit, MAX_RECALL_PAGE))
 
-    data = []
-    for uq in due_questions:
-        q = db.query(Question).filter(Question.id == uq.question_id).first()
-        if q:
-            data.append({
-                "question_id": q.id,
-                "text": q.text,
-                "options": [
-                    {"option_id": opt.id, "text": opt.text}
-                    for opt in q.options
-                ]
-            })
+    now = datetime.utcnow()
+    due_question_ids = (await db.scalars(
+        select(UserQuestionProgress.question_id)
+        .where(*_due_filter(user_id, now))
+        .order_by(UserQuestionProgress.next_review_date, UserQuestionProgress.question_id)
+        .limit(limit)
+        .offset(max(offset, 0))
+    )).all()
+
+    data = (await get_catalog_async(db)).question_payloads(due_question_ids)
 
-    return {"due_recall_questions": data}
+    return trusted({"due_recall_questions": data}, headers=NO_STORE)
 
-@router.post("/submit")
-def submit_recall_answers(payload: dict, db: Session = Depends(get_db)):
+@router.get("/count", response_model=RecallCountOut, dependencies=[cache_control("no-store")])
+async def get_recall_count(db: AsyncSession = Depends(get_user_async_read_db),
+                           current_user: Principal = Depends(get_current_user)):
+    """
+    GET /remember/count
+    Return how many questions are due for recall, without loading them.
+    """
+    user_id = current_user.id
+
+    return {"due_count": await count_due_recall(db, user_id)}
+
+@router.post("/submit", response_model=MessageOut, dependencies=[submit_limit("recall_submit")])
+async def submit_recall_answers(payload: dict, db: AsyncSession = Depends(get_user_async_db),
+                                current_user: Principal = Depends(get_current_user)):
     """
     POST /remember/submit
     Expects JSON: { "answers": [ { "question_id": X, "option_id": Y }, ... ] }
     """
-    user_id = 1  # Hardcoded
-    now = datetime.utcnow()
+    user_id = current_user.id
 
     answers = payload.get("answers", [])
-    for ans in answers:
-        question_id = ans["question_id"]
-        option_id = ans["option_id"]
-
-        chosen_option = db.query(Option).filter(Option.id == option_id).first()
-        uq = db.query(UserQuestionProgress).filter_by(
-            user_id=user_id, question_id=question_id
-        ).first()
-        if not uq:
-            # Create new progress record if doesn't exist
-            uq = UserQuestionProgress(user_id=user_id, question_id=question_id)
-            db.add(uq)
-
-        if chosen_option and chosen_option.is_correct:
-            uq.last_answer_correct = True
-            uq.times_correct += 1
-            # Example: Next review in 7 days
-            uq.next_review_date = now + timedelta(days=7)
-        else:
-            uq.last_answer_correct = False
-            uq.times_incorrect += 1
-            # Fail => schedule sooner
-            uq.next_review_date = now + timedelta(days=1)
+    await grade_answers_async(db, user_id, answers, source="recall")
 
-    db.commit()
+    await db.commit()
     return {"message": "Recall answers processed. Next reviews scheduled."}
@@ -1,72 +1,63 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from src.database import get_db
-from src.models import (
-    Question, Option, UserQuestionProgress
-)
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.auth_cache import Principal
+from src.catalog import get_catalog_async
+from src.grading import grade_answers_async, resolve_options
+from src.http_cache import NO_STORE
+from src.models import UserQuestionProgress
+from src.rate_limit import submit_limit
+from src.responses import trusted
+from src.routers.auth import get_current_user
+from src.schemas import ReviewOut, ReviewResultOut
+from src.shards import get_user_async_db, get_user_async_read_db
 
 router = APIRouter()
 
-@router.get("")
-def get_review_questions(db: Session = Depends(get_db)):
+@router.get("", response_model=ReviewOut)
+async def get_review_questions(db: AsyncSession = Depends(get_user_async_read_db),
+                               current_user: Principal = Depends(get_current_user)):
     """
     GET /review
     Return a list of questions the user last answered incorrectly.
     """
-    user_id = 1  # Hardcoded example
+    user_id = current_user.id
 
-    failed_questions = db.query(UserQuestionProgress).filter_by(
-        user_id=user_id, last_answer_correct=False
-    ).all()
+    failed_question_ids = (await db.scalars(
+        select(UserQuestionProgress.question_id).filter_by(
+            user_id=user_id, last_answer_correct=False
+        )
+    )).all()
 
-    data = []
-    for fq in failed_questions:
-        question = db.query(Question).filter(Question.id == fq.question_id).first()
-        if question:
-            data.append({
-                "question_id": question.id,
-                "text": question.text,
-                "options": [
-                    {"option_id": opt.id, "text": opt.text}
-                    for opt in question.options
-                ]
-            })
+    data = (await get_catalog_async(db)).question_payloads(failed_question_ids)
 
-    return {"failed_questions": data}
+    return trusted({"failed_questions": data}, headers=NO_STORE)
 
-@router.post("")
-def post_review_answer(payload: dict, db: Session = Depends(get_db)):
+@router.post("", response_model=ReviewResultOut, dependencies=[submit_limit("review_submit")])
+async def post_review_answer(payload: dict, db: AsyncSession = Depends(get_user_async_db),
+                             current_user: Principal = Depends(get_current_user)):
     """
     POST /review
     Expects JSON: { "question_id": X, "selected_option_id": Y }
     Attempt to correct a previously failed question.
     """
-    user_id = 1
+    user_id = current_user.id
     question_id = payload.get("question_id")
     selected_option_id = payload.get("selected_option_id")
 
-    chosen_option = db.query(Option).filter(Option.id == selected_option_id).first()
-    if not chosen_option:
-        return {"message": "Option not found or invalid."}, 400
+    options = resolve_options(await get_catalog_async(db), [selected_option_id])
+    if selected_option_id not in options:
+        raise HTTPException(status_code=400, detail="Option not found or invalid.")
 
-    uq = db.query(UserQuestionProgress).filter_by(
-        user_id=user_id, question_id=question_id
-    ).first()
-    if not uq:
-        # If there's no record, create it
-        uq = UserQuestionProgress(user_id=user_id, question_id=question_id)
-        db.add(uq)
+    graded = await grade_answers_async(
+        db, user_id,
+        [{"question_id": question_id, "option_id": selected_option_id}],
+        options=options, source="review"
+    )
 
-    if chosen_option.is_correct:
-        uq.last_answer_correct = True
-        uq.times_correct += 1
-    else:
-        uq.last_answer_correct = False
-        uq.times_incorrect += 1
-
-    db.commit()
+    await db.commit()
 
     return {
         "question_id": question_id,
-        "correct": chosen_option.is_correct
+        "correct": graded[0].correct
     }
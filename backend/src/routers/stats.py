@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.catalog import get_catalog_async
+from src.database import get_async_read_db
+from src.http_cache import STATS_CACHE_CONTROL, cache_control
+from src.item_stats import stats_payload
+from src.models import OptionStats, QuestionStats
+from src.routers.auth import require_admin
+
+# Item analysis for curriculum authors, not students
+router = APIRouter(dependencies=[Depends(require_admin), cache_control(STATS_CACHE_CONTROL)])
+
+@router.get("/questions/{question_id}")
+async def get_question_stats(question_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    GET /stats/questions/{question_id}
+    p-value, discrimination index, option distribution and quality flags for
+    one question, read from the precomputed aggregates (two primary-key/index
+    lookups, independent of how many answers exist).
+    """
+    stats = await db.get(QuestionStats, question_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No answers recorded for this question yet")
+    options = (await db.scalars(select(OptionStats).where(OptionStats.question_id == question_id))).all()
+    question = (await get_catalog_async(db)).questions.get(question_id)
+    return stats_payload(stats, options, question.correct_option_ids if question else frozenset())
+
+
+@router.get("/contents/{content_id}")
+async def get_content_stats(content_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    GET /stats/contents/{content_id}
+    Stats for every answered question of a content, flagged questions first.
+    """
+    catalog = await get_catalog_async(db)
+    content = catalog.contents.get(content_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    question_ids = content.question_ids
+    stats = (await db.scalars(select(QuestionStats).where(QuestionStats.question_id.in_(question_ids)))).all()
+    options = {}
+    for o in await db.scalars(select(OptionStats).where(OptionStats.question_id.in_(question_ids))):
+        options.setdefault(o.question_id, []).append(o)
+
+    data = [
+        stats_payload(s, options.get(s.question_id, []), catalog.questions[s.question_id].correct_option_ids)
+        for s in stats
+    ]
+    data.sort(key=lambda d: (not d["flags"], d["question_id"]))
+    return {"content_id": content_id, "questions": data}
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.auth_cache import Principal
+from src.catalog import get_catalog_async
+from src.http_cache import NO_STORE
+from src.rate_limit import submit_limit
+from src.responses import trusted
+from src.routers.auth import get_current_user
+from src.schemas import SyncIn, SyncOut
+from src.shards import get_user_async_db
+from src.sync import apply_sync_batch
+
+router = APIRouter()
+
+@router.post("", response_model=SyncOut, dependencies=[submit_limit("sync")])
+async def sync_answers(batch: SyncIn, db: AsyncSession = Depends(get_user_async_db),
+                       current_user: Principal = Depends(get_current_user)):
+    """
+    POST /sync
+    Expects JSON: { "events": [ { "key": "...", "kind": "recall" | "review" | "exam",
+                                  "question_id": x, "option_id": y, "answered_at": "...",
+                                  "content_id": c, "attempt": "..." }, ... ] }
+    Applies answers queued offline in one transaction. Keys already applied
+    are reported as duplicates and not graded again, so a client can resend
+    a batch whose response it never received. See src/sync.py.
+    """
+    user_id = current_user.id
+
+    # A stale catalog is reloaded here, coalesced (see get_catalog_async); the batch then reads it from memory
+    await get_catalog_async(db)
+    result = await db.run_sync(apply_sync_batch, user_id, [event.model_dump() for event in batch.events])
+    await db.commit()
+
+    return trusted(result, headers=NO_STORE)
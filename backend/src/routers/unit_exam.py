@@ -1,84 +1,64 @@
-import random
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
-from src.models import (
-    Level, Question, Option, UserQuestionProgress
-)
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.auth_cache import Principal
+from src.catalog import get_catalog_async
+from src.exam_assembly import assemble_level_exam
+from src.grading import exam_rejection, grade_answers_async
+from src.http_cache import NO_STORE
+from src.progression import unlock_after_level
+from src.rate_limit import read_limit, submit_limit
+from src.responses import trusted
+from src.routers.auth import get_current_user
+from src.schemas import UnitExamOut, UnitExamResultOut
+from src.shards import get_user_async_db, get_user_async_read_db
 
 router = APIRouter()
 
-@router.get("/{level_id}")
-def start_unit_exam(level_id: int, db: Session = Depends(get_db)):
+# Questions drawn for a unit exam, and answers a submission needs (fewer only if the level has fewer)
+UNIT_EXAM_QUESTIONS = 20
+
+@router.get("/{level_id}", response_model=UnitExamOut, dependencies=[read_limit("unit_exam")])
+async def start_unit_exam(level_id: int, db: AsyncSession = Depends(get_user_async_read_db),
+                          current_user: Principal = Depends(get_current_user)):
     """
     GET /unit_exam/{level_id}
     Gather a pool of questions from the given level (and optionally earlier ones),
     then return a random subset (e.g., 20).
     """
-    user_id = 1  # Hardcoded
+    user_id = current_user.id
 
-    level = db.query(Level).filter(Level.id == level_id).first()
-    if not level:
+    catalog = await get_catalog_async(db)
+    if level_id not in catalog.levels:
         raise HTTPException(status_code=404, detail="Level not found")
 
-    # Collect all question objects from the content of this level
-    all_questions = []
-    for content in level.contents:
-        all_questions.extend(content.questions)
-
-    random.shuffle(all_questions)
-    # Example: pick 20
-    selected = all_questions[:20]
+    # Spread over the level's contents by size and weighted toward failed/unseen questions
+    selected = await assemble_level_exam(db, catalog, user_id, level_id, UNIT_EXAM_QUESTIONS)
 
-    data = []
-    for q in selected:
-        data.append({
-            "question_id": q.id,
-            "text": q.text,
-            "options": [
-                {"option_id": opt.id, "text": opt.text}
-                for opt in q.options
-            ]
-        })
+    data = catalog.question_payloads(selected)
 
-    return {"level_id": level_id, "questions": data}
+    return trusted({"level_id": level_id, "questions": data}, headers=NO_STORE)
 
-@router.post("/{level_id}/submit")
-def submit_unit_exam(level_id: int, payload: dict, db: Session = Depends(get_db)):
+@router.post("/{level_id}/submit", response_model=UnitExamResultOut,
+             dependencies=[submit_limit("unit_exam_submit")])
+async def submit_unit_exam(level_id: int, payload: dict, db: AsyncSession = Depends(get_user_async_db),
+                           current_user: Principal = Depends(get_current_user)):
     """
     POST /unit_exam/{level_id}/submit
     Expects JSON: { "answers": [ { "question_id": x, "option_id": y }, ... ] }
     Grades, checks pass/fail, unlocks next level, etc.
     """
-    user_id = 1  # Hardcoded
+    user_id = current_user.id
     answers = payload.get("answers", [])
-    correct_count = 0
 
-    for ans in answers:
-        question_id = ans["question_id"]
-        chosen_option_id = ans["option_id"]
-        chosen_option = db.query(Option).filter(Option.id == chosen_option_id).first()
-        if chosen_option and chosen_option.is_correct:
-            correct_count += 1
-            uq = db.query(UserQuestionProgress).filter_by(
-                user_id=user_id, question_id=question_id
-            ).first()
-            if not uq:
-                uq = UserQuestionProgress(user_id=user_id, question_id=question_id)
-                db.add(uq)
-            uq.last_answer_correct = True
-            uq.times_correct += 1
-        else:
-            uq = db.query(UserQuestionProgress).filter_by(
-                user_id=user_id, question_id=question_id
-            ).first()
-            if not uq:
-                uq = UserQuestionProgress(user_id=user_id, question_id=question_id)
-                db.add(uq)
-            uq.last_answer_correct = False
-            uq.times_incorrect += 1
+    catalog = await get_catalog_async(db)
+    if level_id not in catalog.levels:
+        raise HTTPException(status_code=404, detail="Level not found")
+    error = exam_rejection(catalog, answers, catalog.level_question_ids(level_id), UNIT_EXAM_QUESTIONS)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
-    db.commit()
+    graded = await grade_answers_async(db, user_id, answers, source="unit_exam")
+    correct_count = sum(1 for g in graded if g.correct)
 
     total_questions = len(answers)
     score = 0.0
@@ -88,10 +68,11 @@ def submit_unit_exam(level_id: int, payload: dict, db: Session = Depends(get_db)
     passed_exam = (score >= 0.8)  # Example threshold: 80%
 
     if passed_exam:
-        message = f"Passed Level {level_id} exam. Next level unlocked!"
-        # You'd typically mark the level completed for the user, etc.
+        unlocked = await db.run_sync(unlock_after_level, user_id, level_id)
+        message = f"Passed Level {level_id} exam. " + ("Next level unlocked!" if unlocked else "No further levels.")
     else:
         message = f"Failed Level {level_id} exam. Please review and try again."
+    await db.commit()
 
     return {
         "correct": correct_count,
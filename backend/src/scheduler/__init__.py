@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+import numpy as np
+from config import Config
+from src.scheduler.base import Scheduler, SchedulerState
+from src.scheduler.fsrs import FSRSScheduler
+from src.scheduler.sm2 import SM2Scheduler
+
+SCHEDULERS = {
+    SM2Scheduler.name: SM2Scheduler,
+    FSRSScheduler.name: FSRSScheduler,
+}
+
+_default = None
+
+
+def register_scheduler(cls):
+    """
+    Make a Scheduler subclass selectable by name through Config.SCHEDULER.
+    """
+    SCHEDULERS[cls.name] = cls
+    return cls
+
+
+def get_scheduler(name: str = None) -> Scheduler:
+    """
+    Return the scheduler named `name`, or the configured default instance.
+    """
+    global _default
+    if name is not None:
+        return SCHEDULERS[name]()
+    if _default is None:
+        _default = SCHEDULERS[Config.SCHEDULER]()
+    return _default
+
+
+def elapsed_days(last_review_dates, now: datetime) -> np.ndarray:
+    """
+    Days since each last review as a float array (NaN where never reviewed).
+    Never negative: answers synced from a client's clock may predate the
+    last review recorded.
+    """
+    return np.array(
+        [np.nan if d is None else max(0.0, (now - d).total_seconds() / 86400) for d in last_review_dates],
+        dtype=float
+    )
+
+
+def to_columns(state: SchedulerState, now: datetime) -> list:
+    """
+    Turn a batch state back into per-item dicts of UserQuestionProgress
+    column values, including the next review date.
+    """
+    def value(x):
+        return None if np.isnan(x) else float(x)
+
+    return [
+        {
+            "ease": value(state.ease[i]),
+            "stability": value(state.stability[i]),
+            "difficulty": value(state.difficulty[i]),
+            "interval_days": value(state.interval[i]),
+            "repetitions": int(state.repetitions[i]),
+            "last_review_date": now,
+            "next_review_date": now + timedelta(days=float(state.interval[i])),
+        }
+        for i in range(len(state.interval))
+    ]
+
+
+__all__ = [
+    "SCHEDULERS", "Scheduler", "SchedulerState", "SM2Scheduler", "FSRSScheduler",
+    "register_scheduler", "get_scheduler", "elapsed_days", "to_columns",
+]
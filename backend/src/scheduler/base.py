@@ -0,0 +1,55 @@
+from typing import NamedTuple
+import numpy as np
+
+
+class SchedulerState(NamedTuple):
+    """
+    Per-item scheduling state as parallel float arrays, one slot per item.
+    Missing values (never reviewed, or not used by an algorithm) are NaN.
+    """
+    ease: np.ndarray
+    stability: np.ndarray
+    difficulty: np.ndarray
+    interval: np.ndarray       # days until the next review
+    repetitions: np.ndarray    # consecutive successful reviews
+
+    @classmethod
+    def empty(cls, n: int) -> "SchedulerState":
+        nan = np.full(n, np.nan)
+        return cls(nan.copy(), nan.copy(), nan.copy(), nan.copy(), np.zeros(n))
+
+    @classmethod
+    def from_rows(cls, rows) -> "SchedulerState":
+        """
+        Build from (ease, stability, difficulty, interval, repetitions) tuples; None -> NaN.
+        """
+        arr = np.array(
+            [[np.nan if v is None else v for v in row] for row in rows], dtype=float
+        ).reshape(-1, 5)
+        return cls(arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3], np.nan_to_num(arr[:, 4]))
+
+
+class Scheduler:
+    """
+    Base class for spaced-repetition algorithms.
+
+    Subclasses work on whole batches at once: every method takes and returns
+    NumPy arrays, so grading one submission and re-tuning the whole history
+    go through the same code.
+    """
+    name = None
+
+    def review(self, state: SchedulerState, correct: np.ndarray, elapsed_days: np.ndarray) -> SchedulerState:
+        """
+        Apply one review to every item. `correct` is a bool array, `elapsed_days`
+        the time since each item's previous review (NaN for a first review).
+        Returns the new state; `interval` holds the days until the next review.
+        """
+        raise NotImplementedError
+
+    def next_interval(self, state: SchedulerState) -> np.ndarray:
+        """
+        Interval (days) implied by a stored state under the current parameters.
+        Used to reschedule existing items after the parameters change.
+        """
+        return state.interval
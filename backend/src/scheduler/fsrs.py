@@ -0,0 +1,66 @@
+import numpy as np
+from src.scheduler.base import Scheduler, SchedulerState
+
+# FSRS-4.5 default parameters
+DEFAULT_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1
+
+AGAIN, GOOD = 1, 3
+
+
+class FSRSScheduler(Scheduler):
+    """
+    Free Spaced Repetition Scheduler (FSRS-4.5). Binary answers are mapped to
+    the Again/Good ratings. Intervals target `desired_retention`.
+    """
+    name = "fsrs"
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, desired_retention: float = 0.9, maximum_interval: float = 36500):
+        self.w = np.asarray(weights, dtype=float)
+        self.desired_retention = desired_retention
+        self.maximum_interval = maximum_interval
+
+    def _init_difficulty(self, rating):
+        return np.clip(self.w[4] - (rating - 3) * self.w[5], 1, 10)
+
+    def _retrievability(self, elapsed_days, stability):
+        return (1 + FACTOR * elapsed_days / stability) ** DECAY
+
+    def _interval(self, stability):
+        interval = stability / FACTOR * (self.desired_retention ** (1 / DECAY) - 1)
+        return np.clip(np.round(interval), 1, self.maximum_interval)
+
+    def review(self, state: SchedulerState, correct: np.ndarray, elapsed_days: np.ndarray) -> SchedulerState:
+        w = self.w
+        correct = np.asarray(correct, dtype=bool)
+        rating = np.where(correct, GOOD, AGAIN)
+        first = np.isnan(state.stability)
+
+        # Placeholders keep the math NaN-free for first reviews; those slots are overwritten below
+        s = np.where(first, 1.0, state.stability)
+        d = np.where(np.isnan(state.difficulty), self._init_difficulty(rating), state.difficulty)
+        t = np.where(np.isnan(elapsed_days), 0.0, np.maximum(elapsed_days, 0.0))
+        r = self._retrievability(t, s)
+
+        next_d = d - w[6] * (rating - 3)
+        next_d = np.clip(w[7] * self._init_difficulty(4) + (1 - w[7]) * next_d, 1, 10)
+
+        recall_s = s * (1 + np.exp(w[8]) * (11 - d) * s ** -w[9] * (np.exp((1 - r) * w[10]) - 1))
+        forget_s = w[11] * d ** -w[12] * ((s + 1) ** w[13] - 1) * np.exp((1 - r) * w[14])
+        next_s = np.where(correct, recall_s, np.minimum(forget_s, s))
+
+        next_s = np.where(first, w[rating - 1], next_s)
+        next_d = np.where(first, self._init_difficulty(rating), next_d)
+
+        new_interval = np.where(correct, self._interval(next_s), 1.0)
+        new_reps = np.where(correct, state.repetitions + 1, 0)
+        return SchedulerState(state.ease, next_s, next_d, new_interval, new_reps)
+
+    def next_interval(self, state: SchedulerState) -> np.ndarray:
+        # Items in relearning (last answer wrong) keep their short interval
+        settled = ~np.isnan(state.stability) & (state.repetitions > 0)
+        return np.where(settled, self._interval(np.where(settled, state.stability, 1.0)), state.interval)
@@ -0,0 +1,88 @@
+"""
+Offline rescheduling after scheduler parameters change.
+
+Streams every scheduled UserQuestionProgress row in primary-key chunks,
+one progress shard after the other, recomputes the interval from the
+stored state with the vectorized Scheduler.next_interval, and writes
+next_review_date back with one executemany per chunk.
+
+Run from backend/:
+    python -m src.scheduler.retune --scheduler fsrs --desired-retention 0.85
+"""
+import argparse
+from datetime import timedelta
+from sqlalchemy import bindparam, select, tuple_, update
+from sqlalchemy.orm import Session
+from src.models import UserQuestionProgress
+from src.scheduler import SCHEDULERS, Scheduler, SchedulerState
+from src.shards import shards
+
+
+def reschedule_all(db: Session, scheduler: Scheduler, chunk_size: int = 10000) -> int:
+    """
+    Recompute next_review_date for every reviewed item. Commits after each
+    chunk so locks are held briefly. Returns the number of rows updated.
+    """
+    uqp = UserQuestionProgress
+    table = uqp.__table__
+    stmt = (
+        update(table)
+        .where(table.c.user_id == bindparam("b_user_id"), table.c.question_id == bindparam("b_question_id"))
+        .values(interval_days=bindparam("b_interval"), next_review_date=bindparam("b_next"))
+    )
+
+    total = 0
+    last_key = None
+    while True:
+        query = (
+            select(uqp.user_id, uqp.question_id, uqp.ease, uqp.stability, uqp.difficulty,
+                   uqp.interval_days, uqp.repetitions, uqp.last_review_date)
+            .where(uqp.last_review_date != None)
+            .order_by(uqp.user_id, uqp.question_id)
+            .limit(chunk_size)
+        )
+        if last_key is not None:
+            query = query.where(tuple_(uqp.user_id, uqp.question_id) > last_key)
+        rows = db.execute(query).all()
+        if not rows:
+            break
+
+        intervals = scheduler.next_interval(SchedulerState.from_rows(row[2:7] for row in rows))
+        db.execute(stmt, [
+            {
+                "b_user_id": row[0],
+                "b_question_id": row[1],
+                "b_interval": float(interval),
+                "b_next": row[7] + timedelta(days=float(interval)),
+            }
+            for row, interval in zip(rows, intervals)
+        ])
+        db.commit()
+
+        total += len(rows)
+        last_key = (rows[-1][0], rows[-1][1])
+        print(f"rescheduled {total} items")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS), required=True)
+    parser.add_argument("--desired-retention", type=float, help="FSRS target recall probability")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    if args.desired_retention is not None and args.scheduler != "fsrs":
+        parser.error("--desired-retention only applies to --scheduler fsrs")
+
+    params = {}
+    if args.desired_retention is not None:
+        params["desired_retention"] = args.desired_retention
+    scheduler = SCHEDULERS[args.scheduler](**params)
+
+    for shard_session in shards.sessionmakers():
+        with shard_session() as db:
+            reschedule_all(db, scheduler, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
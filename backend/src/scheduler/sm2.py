@@ -0,0 +1,41 @@
+import numpy as np
+from src.scheduler.base import Scheduler, SchedulerState
+
+
+class SM2Scheduler(Scheduler):
+    """
+    SuperMemo-2. Binary answers are mapped to a quality grade
+    (correct -> `correct_quality`, wrong -> `wrong_quality`).
+    """
+    name = "sm2"
+
+    def __init__(self, initial_ease: float = 2.5, min_ease: float = 1.3,
+                 correct_quality: int = 4, wrong_quality: int = 1):
+        self.initial_ease = initial_ease
+        self.min_ease = min_ease
+        self.correct_quality = correct_quality
+        self.wrong_quality = wrong_quality
+
+    def review(self, state: SchedulerState, correct: np.ndarray, elapsed_days: np.ndarray) -> SchedulerState:
+        correct = np.asarray(correct, dtype=bool)
+        ease = np.where(np.isnan(state.ease), self.initial_ease, state.ease)
+        interval = np.where(np.isnan(state.interval), 0.0, state.interval)
+        reps = state.repetitions
+
+        q = np.where(correct, self.correct_quality, self.wrong_quality)
+        new_ease = np.maximum(self.min_ease, ease + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)))
+
+        passed = q >= 3
+        new_interval = np.where(
+            ~passed, 1.0,
+            np.where(reps == 0, 1.0, np.where(reps == 1, 6.0, np.round(interval * ease)))
+        )
+        new_reps = np.where(passed, reps + 1, 0)
+
+        return SchedulerState(new_ease, state.stability, state.difficulty, new_interval, new_reps)
+
+    def next_interval(self, state: SchedulerState) -> np.ndarray:
+        # The first two steps are fixed; later intervals compound the eases of
+        # past reviews, so they stand as stored. Relearning items keep 1 day.
+        reps = state.repetitions
+        return np.where(reps == 1, 1.0, np.where(reps == 2, 6.0, state.interval))
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from config import Config
+
+# Response schemas (and the /sync request). The question payloads mirror
+# Catalog.question_payloads.
+
+
+class OptionOut(BaseModel):
+    option_id: int
+    text: str
+
+
+class QuestionOut(BaseModel):
+    question_id: int
+    text: str
+    options: list[OptionOut]
+
+
+class ExamQuestionOut(BaseModel):
+    question_id: int
+    question_text: str
+    options: list[OptionOut]
+
+
+class ExamOut(BaseModel):
+    content_id: int
+    questions: list[ExamQuestionOut]
+
+
+class ExamResultOut(BaseModel):
+    message: str
+    correct_this_attempt: int
+    total_answered_so_far: int
+    total_correct_so_far: int
+    passed: Optional[bool]
+
+
+class UnitExamOut(BaseModel):
+    level_id: int
+    questions: list[QuestionOut]
+
+
+class UnitExamResultOut(BaseModel):
+    correct: int
+    total: int
+    score: float
+    passed: bool
+    message: str
+
+
+class RecallOut(BaseModel):
+    due_recall_questions: list[QuestionOut]
+
+
+class RecallCountOut(BaseModel):
+    due_count: int
+
+
+class ReviewOut(BaseModel):
+    failed_questions: list[QuestionOut]
+
+
+class ReviewResultOut(BaseModel):
+    question_id: int
+    correct: bool
+
+
+class ContentOut(BaseModel):
+    id: int
+    title: str
+    body: Optional[str]
+    level_id: Optional[int]
+
+
+class SearchHitOut(BaseModel):
+    kind: str
+    content_id: int
+    question_id: Optional[int]
+    title: str
+    level_id: Optional[int]
+    snippet: str
+    score: float
+
+
+class SearchOut(BaseModel):
+    query: str
+    results: list[SearchHitOut]
+    limit: int
+    offset: int
+    has_more: bool
+
+
+class MessageOut(BaseModel):
+    message: str
+
+
+class SyncEventIn(BaseModel):
+    key: str = Field(min_length=1, max_length=100, description="Client-generated idempotency key")
+    kind: Literal["recall", "review", "exam"]
+    question_id: int
+    option_id: int
+    answered_at: Optional[datetime] = None
+    content_id: Optional[int] = None
+    attempt: Optional[str] = Field(None, max_length=100, description="Groups exam answers into one attempt")
+
+
+class SyncIn(BaseModel):
+    events: list[SyncEventIn] = Field(max_length=Config.SYNC_MAX_EVENTS)
+
+
+class SyncResultOut(BaseModel):
+    key: str
+    status: str
+    correct: Optional[bool]
+    error: Optional[str]
+
+
+class SyncQuestionOut(BaseModel):
+    question_id: int
+    correct_delta: int
+    incorrect_delta: int
+    times_correct: Optional[int]
+    times_incorrect: Optional[int]
+    last_answer_correct: Optional[bool]
+    next_review_date: Optional[datetime]
+
+
+class SyncContentOut(BaseModel):
+    content_id: int
+    answered_count: int
+    correct_count: int
+    passed: bool
+
+
+class SyncOut(BaseModel):
+    results: list[SyncResultOut]
+    applied: int
+    duplicates: int
+    rejected: int
+    questions: list[SyncQuestionOut]
+    contents: list[SyncContentOut]
+    unlocked: list[int]
+    due_count: int
+    server_time: datetime
@@ -0,0 +1,366 @@
+"""
+Full-text search over lesson titles/bodies and question text.
+
+The index is a real inverted index kept by the database itself:
+
+  SQLite    FTS5 virtual table `search_index`
+  Postgres  table `search_document` with a tsvector column and a GIN index
+
+One index row per content (title, body) and per question (text), with id
+2*content_id / 2*question_id+1. Triggers on `content` and `question` keep it
+in sync with every write, including the curriculum import's upserts, so no
+application code has to remember to update it. The index and triggers are
+created by migration 2 (src/migrations.py); `rebuild` refills the index
+from the tables.
+
+Every match of a query is ranked. SEARCH_RANK_WINDOW > 0 ranks only that
+many matches, the newest ones: a query matching most of the corpus (a very
+common word) is then as fast as a rare one, at the cost of only ranking
+recent lessons for it.
+
+Snippets are HTML: the indexed text is escaped and only the matches are
+wrapped in <mark> tags.
+
+Run from backend/:
+    python -m src.search rebuild
+    python -m src.search optimize
+    python -m src.search query "photosynthesis light" --user 1
+"""
+import argparse
+import html
+import re
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import Config
+
+# Relative weight of a title match against a body/question-text match
+TITLE_WEIGHT = 10.0
+SNIPPET_TOKENS = 12
+MARK_START, MARK_END = "<mark>", "</mark>"
+# Highlight delimiters asked of the database, replaced by the tags once the text is escaped
+_HIGHLIGHT_START, _HIGHLIGHT_END = "\x02", "\x03"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+# ----------------------------
+# Index DDL
+# ----------------------------
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_content_insert AFTER INSERT ON content BEGIN
+        INSERT INTO search_index (rowid, title, body) VALUES (new.id * 2, new.title, coalesce(new.body, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_content_update AFTER UPDATE OF title, body ON content BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index (rowid, title, body) VALUES (new.id * 2, new.title, coalesce(new.body, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_content_delete AFTER DELETE ON content BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_question_insert AFTER INSERT ON question BEGIN
+        INSERT INTO search_index (rowid, title, body) VALUES (new.id * 2 + 1, '', new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_question_update AFTER UPDATE OF text ON question BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_index (rowid, title, body) VALUES (new.id * 2 + 1, '', new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_question_delete AFTER DELETE ON question BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_document (
+        id BIGINT PRIMARY KEY,
+        kind VARCHAR(10) NOT NULL,
+        ref_id INTEGER NOT NULL,
+        content_id INTEGER NOT NULL,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_document_document ON search_document USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_content ON search_document (content_id)",
+    """
+    CREATE OR REPLACE FUNCTION search_content_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM search_document WHERE id = OLD.id * 2;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO search_document (id, kind, ref_id, content_id, document)
+            VALUES (NEW.id * 2, 'content', NEW.id, NEW.id,
+                    setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+                    setweight(to_tsvector('simple', coalesce(NEW.body, '')), 'B'));
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION search_question_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM search_document WHERE id = OLD.id * 2 + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO search_document (id, kind, ref_id, content_id, document)
+            VALUES (NEW.id * 2 + 1, 'question', NEW.id, NEW.content_id,
+                    setweight(to_tsvector('simple', NEW.text), 'B'));
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS search_content_sync ON content",
+    """
+    CREATE TRIGGER search_content_sync AFTER INSERT OR DELETE OR UPDATE OF title, body ON content
+    FOR EACH ROW EXECUTE FUNCTION search_content_sync()
+    """,
+    "DROP TRIGGER IF EXISTS search_question_sync ON question",
+    """
+    CREATE TRIGGER search_question_sync AFTER INSERT OR DELETE OR UPDATE OF text, content_id ON question
+    FOR EACH ROW EXECUTE FUNCTION search_question_sync()
+    """,
+]
+
+
+def create_search_index(conn: Connection):
+    """
+    Create the index and its triggers for the connection's dialect and fill
+    it from the existing rows. Other dialects get no index (search then
+    answers 501).
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        for ddl in _SQLITE_DDL:
+            conn.exec_driver_sql(ddl)
+    elif dialect == "postgresql":
+        for ddl in _POSTGRES_DDL:
+            conn.exec_driver_sql(ddl)
+    else:
+        return
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn: Connection):
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("DELETE FROM search_index")
+        conn.exec_driver_sql(
+            "INSERT INTO search_index (rowid, title, body) SELECT id * 2, title, coalesce(body, '') FROM content")
+        conn.exec_driver_sql(
+            "INSERT INTO search_index (rowid, title, body) SELECT id * 2 + 1, '', text FROM question")
+        optimize_search_index(conn)
+    elif conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("TRUNCATE search_document")
+        conn.exec_driver_sql(
+            "INSERT INTO search_document (id, kind, ref_id, content_id, document) "
+            "SELECT id * 2, 'content', id, id, setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(body, '')), 'B') FROM content")
+        conn.exec_driver_sql(
+            "INSERT INTO search_document (id, kind, ref_id, content_id, document) "
+            "SELECT id * 2 + 1, 'question', id, content_id, setweight(to_tsvector('simple', text), 'B') "
+            "FROM question")
+
+
+def optimize_search_index(conn: Connection):
+    """
+    Merge the FTS5 index into a single segment. Writes through the triggers
+    leave many small segments that every query has to visit (FTS5 merges
+    them only incrementally); after a large import this makes queries
+    several times faster. Postgres' GIN index needs no equivalent.
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+# ----------------------------
+# Queries
+# ----------------------------
+
+def query_terms(q: str) -> list:
+    """
+    Words of the user's query, lowercased. Operators and quotes are dropped,
+    so user input can never be parsed as index query syntax.
+    """
+    return [t.lower() for t in _TOKEN.findall(q)][:MAX_TERMS]
+
+
+def _fts5_query(terms: list) -> str:
+    # All terms must match; the last one is a prefix, for search-as-you-type
+    return " ".join(f'"{t}"' for t in terms[:-1]) + (" " if len(terms) > 1 else "") + f'"{terms[-1]}"*'
+
+
+def _tsquery(terms: list) -> str:
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+# The FTS5 table stores only the text; what a row is comes from its rowid,
+# so ranking never reads the stored row
+_SQLITE_CONTENT_ID = ("CASE WHEN s.rowid % 2 = 0 THEN s.rowid / 2 "
+                      "ELSE (SELECT q.content_id FROM question q WHERE q.id = s.rowid / 2) END")
+
+# With a rank window ({window}), matches are read newest first and at most
+# :window of them are ranked, so a query hitting most of the corpus costs
+# the same as a rare one. The page is cut from the ranked matches; snippets
+# are only built for its rows.
+_SQLITE_SEARCH = f"""
+WITH hits AS (
+    SELECT rid, content_id, score FROM (
+        SELECT s.rowid AS rid, p.content_id, bm25(search_index, {TITLE_WEIGHT}, 1.0) AS score
+        FROM search_index s
+        JOIN user_content_progress p
+          ON p.content_id = {_SQLITE_CONTENT_ID} AND p.user_id = :user_id AND p.available = 1
+        {{level_join}}
+        WHERE search_index MATCH :query
+        {{window}}
+    )
+    ORDER BY score
+    LIMIT :limit OFFSET :offset
+)
+SELECT CASE s.rowid % 2 WHEN 0 THEN 'content' ELSE 'question' END, s.rowid / 2, hits.content_id, c.title, c.level_id, hits.score,
+       snippet(search_index, -1, :highlight_start, :highlight_end, '…', {SNIPPET_TOKENS}) AS snippet
+FROM search_index s
+JOIN hits ON hits.rid = s.rowid
+JOIN content c ON c.id = hits.content_id
+WHERE search_index MATCH :query
+ORDER BY hits.score
+"""
+
+_POSTGRES_SEARCH = f"""
+WITH hits AS (
+    SELECT kind, ref_id, content_id, ts_rank_cd(document, to_tsquery('simple', :query)) AS score FROM (
+        SELECT d.id, d.kind, d.ref_id, d.content_id, d.document
+        FROM search_document d
+        JOIN user_content_progress p ON p.content_id = d.content_id AND p.user_id = :user_id AND p.available
+        {{level_join}}
+        WHERE d.document @@ to_tsquery('simple', :query)
+        {{window}}
+    ) matches
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT hits.kind, hits.ref_id, hits.content_id, c.title, c.level_id, hits.score,
+       ts_headline('simple', CASE WHEN hits.kind = 'content' THEN coalesce(c.body, '') ELSE qn.text END,
+                   to_tsquery('simple', :query), :headline_options) AS snippet
+FROM hits
+JOIN content c ON c.id = hits.content_id
+LEFT JOIN question qn ON hits.kind = 'question' AND qn.id = hits.ref_id
+ORDER BY hits.score DESC
+"""
+
+
+def _snippet_html(snippet: Optional[str]) -> str:
+    # Escape the indexed text, then mark the matches
+    return (html.escape(snippet or "", quote=False)
+            .replace(_HIGHLIGHT_START, MARK_START).replace(_HIGHLIGHT_END, MARK_END))
+
+
+async def search(db: AsyncSession, user_id: int, q: str, level_id: Optional[int] = None,
+                 limit: int = 20, offset: int = 0) -> list:
+    """
+    Ranked hits among the contents the user has available (and, with
+    `level_id`, in that level), best first. Returns up to `limit` dicts.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+    if dialect == "sqlite":
+        sql, params["query"] = _SQLITE_SEARCH, _fts5_query(terms)
+        level_join = "JOIN content lc ON lc.id = p.content_id AND lc.level_id = :level_id"
+        window = "ORDER BY s.rowid DESC LIMIT :window"
+        params.update(highlight_start=_HIGHLIGHT_START, highlight_end=_HIGHLIGHT_END)
+    elif dialect == "postgresql":
+        sql, params["query"] = _POSTGRES_SEARCH, _tsquery(terms)
+        level_join = "JOIN content lc ON lc.id = d.content_id AND lc.level_id = :level_id"
+        window = "ORDER BY d.id DESC LIMIT :window"
+        params["headline_options"] = (f"StartSel={_HIGHLIGHT_START}, StopSel={_HIGHLIGHT_END}, "
+                                      f"MaxWords={SNIPPET_TOKENS}, MinWords=4, MaxFragments=1")
+    else:
+        raise SearchUnavailable(f"Full-text search is not supported on {dialect}")
+
+    if Config.SEARCH_RANK_WINDOW > 0:
+        params["window"] = max(Config.SEARCH_RANK_WINDOW, offset + limit)
+    else:
+        window = ""
+    if level_id is not None:
+        params["level_id"] = level_id
+    sql = sql.format(level_join=level_join if level_id is not None else "", window=window)
+    rows = await db.execute(text(sql), params)
+    return [
+        {
+            "kind": kind,
+            "content_id": content_id,
+            "question_id": ref_id if kind == "question" else None,
+            "title": title,
+            "level_id": level,
+            "snippet": _snippet_html(snippet),
+            "score": abs(score),
+        }
+        for kind, ref_id, content_id, title, level, score, snippet in rows
+    ]
+
+
+def main():
+    import asyncio
+    from src.database import engine
+    from src.shards import shards
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="refill the index from the content and question tables")
+    sub.add_parser("optimize", help="merge the index after large imports")
+    query = sub.add_parser("query", help="run a search as a user")
+    query.add_argument("q")
+    query.add_argument("--user", type=int, default=1)
+    query.add_argument("--level", type=int)
+    query.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        with engine.begin() as conn:
+            rebuild_search_index(conn)
+        print("search index rebuilt")
+        return
+    if args.command == "optimize":
+        with engine.begin() as conn:
+            optimize_search_index(conn)
+        print("search index optimized")
+        return
+
+    async def run():
+        async with shards.for_user(args.user).async_sessionmaker() as db:
+            for hit in await search(db, args.user, args.q, args.level, args.limit):
+                print(f"{hit['score']:8.3f}  {hit['kind']:<8} content {hit['content_id']:<6} {hit['snippet']}")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
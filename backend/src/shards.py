@@ -0,0 +1,367 @@
+"""
+User-partitioned storage for the per-user tables.
+
+user_question_progress and user_content_progress grow as users x items and
+take a write on nearly every request, together with user_learning_state
+and sync_receipt in the same transactions. These tables can be split by
+user:
+
+  - SQLite: extra database files (PROGRESS_SHARD_URLS), each with its own
+    write lock. A user id hashes to one of BUCKETS buckets and
+    shard_assignment maps buckets to shards; unassigned buckets are on
+    shard 0, the main database. Shard connections attach the main database
+    as "core", so queries joining progress with the catalog run unchanged
+    on them. Request handlers get their user's shard from
+    get_user_async_db / get_user_async_read_db, maintenance code iterates
+    over shards.sessionmakers().
+  - Postgres: hash partitions of the same tables on user_id, created by
+    `partition`. The server routes rows; any session works.
+
+`rebalance` spreads the buckets evenly over the configured shards (or off
+the --drain ones), one bucket at a time: copy its users' rows, reassign it,
+delete them from the old shard. An interrupted run is finished by running
+it again. Workers read the assignments at startup, so rebalance with the
+app stopped (it refuses while a worker holds the jobs lock) and start it
+again after.
+
+Run from backend/:
+    python -m src.shards status
+    python -m src.shards rebalance [--drain 2]
+    python -m src.shards partition 16       # Postgres
+"""
+import argparse
+import hashlib
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import NamedTuple
+from fastapi import Depends
+from sqlalchemy import delete, event, func, select, text, union
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import AddConstraint
+from config import Config
+from src.auth_cache import Principal
+from src.database import (AsyncReadSessionLocal, AsyncSessionLocal, Base, SessionLocal, async_database_url,
+                          async_engine, engine as default_engine, make_async_engine, make_engine)
+from src.models import ShardAssignment, SyncReceipt, UserContentProgress, UserLearningState, UserQuestionProgress
+from src.routers.auth import get_current_user
+
+# Users hash into this many buckets and shards hold whole buckets; changing it remaps every user
+BUCKETS = 1024
+
+# Stored on the user's shard
+SHARDED_TABLES = [UserQuestionProgress.__table__, UserContentProgress.__table__,
+                  UserLearningState.__table__, SyncReceipt.__table__]
+
+# Users whose rows are copied at once when moving a bucket
+MOVE_CHUNK_USERS = 200
+
+
+def bucket_of(user_id: int) -> int:
+    digest = hashlib.blake2b(user_id.to_bytes(8, "big", signed=True), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % BUCKETS
+
+
+class Shard(NamedTuple):
+    engine: Engine
+    sessionmaker: sessionmaker
+    async_engine: AsyncEngine
+    async_sessionmaker: async_sessionmaker
+    async_read_sessionmaker: async_sessionmaker
+
+
+def make_shard(url: str, core: Engine = default_engine) -> Shard:
+    """
+    Engines and session factories for a shard file. Its connections attach
+    the main database, where names the shard does not have resolve.
+    """
+    if not url.startswith("sqlite") or core.dialect.name != "sqlite":
+        raise ValueError("progress shard files need SQLite; on Postgres, partition the tables instead")
+    core_path = core.url.database
+    if not core_path or core_path == ":memory:":
+        raise ValueError("progress shards need the main database in a SQLite file")
+
+    def attach_core(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("ATTACH DATABASE ? AS core", (core_path,))
+        cursor.close()
+
+    shard_engine = make_engine(url)
+    event.listen(shard_engine, "connect", attach_core)
+    shard_async_engine = make_async_engine(async_database_url(url))
+    event.listen(shard_async_engine.sync_engine, "connect", attach_core)
+    async_factory = async_sessionmaker(shard_async_engine, class_=AsyncSession, autoflush=False,
+                                       expire_on_commit=False, info={"answer_log": True})
+    return Shard(shard_engine,
+                 sessionmaker(autocommit=False, autoflush=False, bind=shard_engine, info={"answer_log": True}),
+                 shard_async_engine, async_factory, async_factory)
+
+
+def plan_moves(assignment: list, targets: list) -> dict:
+    """
+    Bucket -> new shard, for the fewest moves that leave each target shard
+    with an even share of the buckets and the other shards with none.
+    """
+    quota = {shard: BUCKETS // len(targets) + (i < BUCKETS % len(targets)) for i, shard in enumerate(targets)}
+    held = defaultdict(list)
+    for bucket, shard in enumerate(assignment):
+        held[shard].append(bucket)
+    spare = sorted(bucket for shard, buckets in held.items() for bucket in buckets[quota.get(shard, 0):])
+    moves = {}
+    for shard in targets:
+        for _ in range(quota[shard] - min(len(held[shard]), quota[shard])):
+            moves[spare.pop(0)] = shard
+    return moves
+
+
+class ProgressShards:
+    """
+    The configured shards and which one holds each user.
+    """
+    def __init__(self, shards: list, core_session_factory=SessionLocal):
+        self.shards = shards
+        self.core_session_factory = core_session_factory
+        self.assignment = None  # bucket -> shard
+
+    def load(self):
+        """
+        (Re)read the bucket assignments from the main database.
+        """
+        assignment = [0] * BUCKETS
+        with self.core_session_factory() as db:
+            for bucket, shard in db.execute(select(ShardAssignment.bucket, ShardAssignment.shard)):
+                assignment[bucket] = shard
+        if max(assignment) >= len(self.shards):
+            raise ValueError(f"shard_assignment uses shard {max(assignment)} but only {len(self.shards)} "
+                             f"are configured; add its URL back to PROGRESS_SHARD_URLS")
+        self.assignment = assignment
+
+    def shard_of(self, user_id: int) -> int:
+        if self.assignment is None:
+            # Workers load this at startup; scripts on first use
+            self.load()
+        return self.assignment[bucket_of(user_id)]
+
+    def for_user(self, user_id: int) -> Shard:
+        return self.shards[self.shard_of(user_id)]
+
+    def group(self, user_ids) -> dict:
+        """
+        Shard number -> the given users stored there.
+        """
+        groups = defaultdict(list)
+        for user_id in user_ids:
+            groups[self.shard_of(user_id)].append(user_id)
+        return dict(groups)
+
+    def sessionmakers(self) -> list:
+        return [shard.sessionmaker for shard in self.shards]
+
+    @contextmanager
+    def session(self, shard: int, db: Session = None):
+        """
+        A session on one shard, closed afterwards. For shard 0, the main
+        database, `db` is used instead when given.
+        """
+        if shard == 0 and db is not None:
+            yield db
+            return
+        session = self.shards[shard].sessionmaker()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def create_tables(self):
+        for shard in self.shards[1:]:
+            Base.metadata.create_all(shard.engine, tables=SHARDED_TABLES)
+
+    def _users_by_bucket(self, shard: int) -> dict:
+        users = defaultdict(list)
+        with self.session(shard) as db:
+            for user_id in db.scalars(union(*(select(table.c.user_id) for table in SHARDED_TABLES))):
+                users[bucket_of(user_id)].append(user_id)
+        return users
+
+    def _delete_users(self, db: Session, user_ids: list):
+        for start in range(0, len(user_ids), MOVE_CHUNK_USERS):
+            chunk = user_ids[start:start + MOVE_CHUNK_USERS]
+            for table in SHARDED_TABLES:
+                db.execute(delete(table).where(table.c.user_id.in_(chunk)))
+
+    def move_bucket(self, bucket: int, source: int, target: int, user_ids: list) -> int:
+        """
+        Copy the rows of the bucket's users to `target`, assign the bucket
+        to it and delete the rows from `source`. Returns the rows copied.
+        """
+        copied = 0
+        with self.session(source) as src, self.session(target) as dst:
+            # Leftovers of an interrupted move
+            self._delete_users(dst, user_ids)
+            for start in range(0, len(user_ids), MOVE_CHUNK_USERS):
+                chunk = user_ids[start:start + MOVE_CHUNK_USERS]
+                for table in SHARDED_TABLES:
+                    rows = src.execute(select(table).where(table.c.user_id.in_(chunk))).mappings().all()
+                    if rows:
+                        dst.execute(table.insert(), [dict(row) for row in rows])
+                    copied += len(rows)
+            # End the read on the source: one of the two databases may be the main one
+            src.rollback()
+            dst.commit()
+
+            with self.core_session_factory() as core:
+                core.merge(ShardAssignment(bucket=bucket, shard=target))
+                core.commit()
+            self.assignment[bucket] = target
+
+            self._delete_users(src, user_ids)
+            src.commit()
+        return copied
+
+    def rebalance(self, drain=(), log=print) -> dict:
+        """
+        Move buckets so the shards not in `drain` hold an even share each.
+        Also deletes rows a shard holds for buckets assigned elsewhere, which
+        an interrupted move leaves behind.
+        """
+        targets = [shard for shard in range(len(self.shards)) if shard not in drain]
+        if not targets:
+            raise ValueError("cannot drain every shard")
+        self.create_tables()
+        self.load()
+        moves = plan_moves(self.assignment, targets)
+        sources = {bucket: self.assignment[bucket] for bucket in moves}
+        stats = {"buckets": len(moves), "rows": 0, "stale_users": 0}
+        for source in range(len(self.shards)):
+            users = self._users_by_bucket(source)
+            stale = [user_id for bucket, ids in users.items() if self.assignment[bucket] != source for user_id in ids]
+            if stale:
+                with self.session(source) as db:
+                    self._delete_users(db, stale)
+                    db.commit()
+                stats["stale_users"] += len(stale)
+            outgoing = sorted(bucket for bucket in moves if sources[bucket] == source)
+            for i, bucket in enumerate(outgoing, 1):
+                stats["rows"] += self.move_bucket(bucket, source, moves[bucket], users.get(bucket, []))
+                if i % 64 == 0 or i == len(outgoing):
+                    log(f"shard {source}: moved {i}/{len(outgoing)} buckets, {stats['rows']} rows so far")
+        return stats
+
+    def status(self) -> list:
+        """
+        Buckets, users and progress rows per shard.
+        """
+        if self.assignment is None:
+            self.load()
+        rows = []
+        for shard in range(len(self.shards)):
+            with self.session(shard) as db:
+                users = db.scalar(select(func.count(func.distinct(UserQuestionProgress.user_id))))
+                progress = db.scalar(select(func.count()).select_from(UserQuestionProgress))
+            rows.append({"shard": shard, "buckets": self.assignment.count(shard), "users": users,
+                         "progress_rows": progress})
+        return rows
+
+
+def _shard_urls() -> list:
+    return [url.strip() for url in Config.PROGRESS_SHARD_URLS.split(",") if url.strip()]
+
+
+# Shard 0 is the main database with its usual sessions (and read replica)
+shards = ProgressShards(
+    [Shard(default_engine, SessionLocal, async_engine, AsyncSessionLocal, AsyncReadSessionLocal)]
+    + [make_shard(url) for url in _shard_urls()]
+)
+
+
+# Dependencies for endpoints that read or write the authenticated user's progress
+async def get_user_async_db(current_user: Principal = Depends(get_current_user)):
+    async with shards.for_user(current_user.id).async_sessionmaker() as db:
+        yield db
+
+async def get_user_async_read_db(current_user: Principal = Depends(get_current_user)):
+    async with shards.for_user(current_user.id).async_read_sessionmaker() as db:
+        yield db
+
+
+# ----------------------------
+# Postgres
+# ----------------------------
+
+def partition_tables(engine: Engine, partitions: int):
+    """
+    Rebuild the sharded tables as `partitions` hash partitions on user_id
+    in one transaction. Writes to them wait until it commits.
+    """
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in SHARDED_TABLES:
+            name = preparer.format_table(table)
+            current = conn.scalar(text("SELECT count(*) FROM pg_inherits WHERE inhparent = CAST(:t AS regclass)"),
+                                  {"t": table.name})
+            if current == partitions:
+                continue
+            conn.exec_driver_sql(f"LOCK TABLE {name} IN EXCLUSIVE MODE")
+            conn.exec_driver_sql(f"CREATE TABLE {table.name}_new (LIKE {name} INCLUDING DEFAULTS) "
+                                 f"PARTITION BY HASH (user_id)")
+            for i in range(partitions):
+                conn.exec_driver_sql(f"CREATE TABLE {table.name}_h{partitions}_{i} PARTITION OF {table.name}_new "
+                                     f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})")
+            conn.exec_driver_sql(f"INSERT INTO {table.name}_new SELECT * FROM {name}")
+            conn.exec_driver_sql(f"DROP TABLE {name}")
+            conn.exec_driver_sql(f"ALTER TABLE {table.name}_new RENAME TO {table.name}")
+            # Keys and indexes under the names the models give them
+            conn.execute(AddConstraint(table.primary_key))
+            for constraint in table.foreign_key_constraints:
+                conn.execute(AddConstraint(constraint))
+            for index in table.indexes:
+                index.create(conn)
+
+
+def partition_counts(engine: Engine) -> dict:
+    with engine.connect() as conn:
+        return {
+            table.name: conn.scalar(text("SELECT count(*) FROM pg_inherits WHERE inhparent = CAST(:t AS regclass)"),
+                                    {"t": table.name})
+            for table in SHARDED_TABLES
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="buckets, users and progress rows per shard")
+    rebalance = sub.add_parser("rebalance", help="even out the buckets over the shards (app stopped)")
+    rebalance.add_argument("--drain", type=int, action="append", default=[], help="shard to empty; repeatable")
+    partition = sub.add_parser("partition", help="Postgres: hash-partition the tables on user_id")
+    partition.add_argument("partitions", type=int)
+    args = parser.parse_args()
+
+    postgres = default_engine.dialect.name == "postgresql"
+    if args.command == "partition":
+        if not postgres:
+            parser.exit(1, "partition is for Postgres; SQLite uses PROGRESS_SHARD_URLS and rebalance\n")
+        partition_tables(default_engine, args.partitions)
+    if postgres:
+        for table, count in partition_counts(default_engine).items():
+            print(f"{table:<24} {count} partitions")
+        return
+
+    if args.command == "rebalance":
+        # Imported here: the jobs import the shards
+        from src.jobs import make_leader_lock
+        lock = make_leader_lock()
+        if not lock.acquire():
+            parser.exit(1, "a running worker holds the jobs lock; stop the app before rebalancing\n")
+        try:
+            print(shards.rebalance(args.drain))
+        finally:
+            lock.release()
+    for row in shards.status():
+        print(f"shard {row['shard']}: {row['buckets']:>5} buckets {row['users']:>8} users "
+              f"{row['progress_rows']:>10} progress rows")
+
+
+if __name__ == "__main__":
+    main()
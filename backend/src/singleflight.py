@@ -0,0 +1,32 @@
+import asyncio
+from src.metrics import coalesced_calls
+
+
+class SingleFlight:
+    """
+    Request coalescing: while a call for a key is in flight, further calls
+    with the same key wait for its result (or exception) instead of running
+    their own. Nothing is kept once the call completes, so this only removes
+    duplicate concurrent work; caching is left to the caller.
+
+    The call runs as its own task, so a caller that is cancelled (client
+    went away) does not cancel it for the others. For the same reason the
+    coroutine must not use a resource owned by one caller, such as its
+    request's DB session.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+
+    async def do(self, key, fn, *args):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            coalesced_calls.inc((self.name,))
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._inflight)
@@ -0,0 +1,254 @@
+"""
+Batched replay of answers queued by offline clients (POST /sync).
+
+A reconnecting client sends everything it answered while offline in one
+request: recall, review and exam answers, each with the client's timestamp
+and an idempotency key it generated when the answer was given. The batch
+is applied in one transaction through the normal grading path:
+
+  - keys already applied (an earlier, maybe half-acknowledged, sync) and
+    keys repeated within the batch are skipped; applied keys are recorded
+    in sync_receipt as 64-bit hashes
+  - the answers of one exam attempt (content_id and attempt) are checked
+    together like POST /exam/{id}/submit; an attempt that fails the check
+    is rejected whole and its keys stay unclaimed
+  - answers are graded in client-time order, consecutive answers of the
+    same kind together and each exam attempt as one run at the time of its
+    last answer, each run scheduled from its own timestamp; client
+    timestamps are clamped to the last SYNC_MAX_CLIENT_AGE_DAYS and never
+    later than the server's clock
+  - exam runs count as one attempt on their content, with the usual pass
+    criteria and unlocks (src/progression.py)
+
+The response carries every key's outcome plus the resulting schedule and
+counters of the questions and contents touched, so the client can update
+its local state without further requests.
+
+Run from backend/:
+    python -m src.sync prune    # forget keys older than SYNC_RECEIPT_RETENTION_DAYS, on every shard
+"""
+import argparse
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from config import Config
+from src.catalog import get_catalog
+from src.database import dialect_insert
+from src.grading import answer_rejection, exam_rejection, grade_answers
+from src.metrics import sync_events
+from src.models import SyncReceipt, UserQuestionProgress
+from src.progression import record_exam_attempt
+from src.routers.exam import EXAM_QUESTIONS
+from src.shards import shards
+
+
+def key_hash(key: str) -> int:
+    """
+    Signed 64-bit hash of an idempotency key, as stored in sync_receipt.
+    Keys are scoped per user, so collisions are negligible at any batch size.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def claim_keys(db: Session, user_id: int, hashes: list, now: datetime) -> set:
+    """
+    Record the key hashes as processed and return those that were not
+    already. On Postgres a concurrent sync of the same keys waits for this
+    transaction and then claims none of them.
+    """
+    if not hashes:
+        return set()
+    rows = [{"user_id": user_id, "key_hash": h, "processed_at": now} for h in hashes]
+    insert = dialect_insert(db)
+    if insert is not None:
+        stmt = (insert(SyncReceipt.__table__).values(rows)
+                .on_conflict_do_nothing(index_elements=["user_id", "key_hash"])
+                .returning(SyncReceipt.key_hash))
+        return set(db.scalars(stmt))
+
+    existing = set(db.scalars(select(SyncReceipt.key_hash).where(
+        SyncReceipt.user_id == user_id, SyncReceipt.key_hash.in_(hashes))))
+    new_rows = [row for row in rows if row["key_hash"] not in existing]
+    if new_rows:
+        db.execute(SyncReceipt.__table__.insert(), new_rows)
+    return {row["key_hash"] for row in new_rows}
+
+
+def _server_time(answered_at: Optional[datetime], now: datetime) -> datetime:
+    # Naive UTC like every other timestamp, clamped to the trusted window
+    if answered_at is None:
+        return now
+    if answered_at.tzinfo is not None:
+        answered_at = answered_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(now, max(answered_at, now - timedelta(days=Config.SYNC_MAX_CLIENT_AGE_DAYS)))
+
+
+def _rejection(catalog, event: dict) -> Optional[str]:
+    error = answer_rejection(catalog, event["question_id"], event["option_id"])
+    if error:
+        return error
+    if event["kind"] == "exam":
+        if event.get("content_id") is None:
+            return "exam answers need a content_id"
+        if catalog.questions[event["question_id"]].content_id != event["content_id"]:
+            return "question is not part of this content"
+    return None
+
+
+def apply_sync_batch(db: Session, user_id: int, events: list, now: Optional[datetime] = None) -> dict:
+    """
+    Apply a batch of event dicts (key, kind, question_id, option_id,
+    answered_at, and content_id/attempt for exam answers). Returns the
+    /sync response body. Does not commit.
+    """
+    now = now or datetime.utcnow()
+    catalog = get_catalog(db)
+
+    results = []
+    candidates = {}
+    for event in events:
+        result = {"key": event["key"], "status": "applied", "correct": None, "error": None}
+        results.append(result)
+        if event["key"] in candidates:
+            result["status"] = "duplicate"
+            continue
+        error = _rejection(catalog, event)
+        if error:
+            result.update(status="rejected", error=error)
+            continue
+        candidates[event["key"]] = (event, result)
+
+    # Each exam attempt must pass the same check as a submitted exam
+    attempts = {}
+    for key, (event, _) in candidates.items():
+        if event["kind"] == "exam":
+            attempts.setdefault((event["content_id"], event.get("attempt")), []).append(key)
+    for (content_id, _), keys in attempts.items():
+        answers = [{"question_id": candidates[key][0]["question_id"], "option_id": candidates[key][0]["option_id"]}
+                   for key in keys]
+        error = exam_rejection(catalog, answers, catalog.contents[content_id].question_ids, EXAM_QUESTIONS)
+        if error:
+            for key in keys:
+                candidates.pop(key)[1].update(status="rejected", error=error)
+
+    claimed = claim_keys(db, user_id, [key_hash(key) for key in candidates], now)
+    to_apply = []
+    for key, (event, result) in candidates.items():
+        if key_hash(key) in claimed:
+            to_apply.append((_server_time(event.get("answered_at"), now), event, result))
+        else:
+            result["status"] = "duplicate"
+
+    # An exam attempt is graded as one run at the time of its last answer,
+    # consecutive answers of the other kinds together
+    to_apply.sort(key=lambda item: item[0])
+    timeline = []
+    exam_runs = {}
+    for item in to_apply:
+        event = item[1]
+        if event["kind"] == "exam":
+            exam_runs.setdefault((event["content_id"], event.get("attempt")), []).append(item)
+        else:
+            timeline.append((item[0], [item]))
+    timeline += [(run[-1][0], run) for run in exam_runs.values()]
+    timeline.sort(key=lambda unit: unit[0])
+    runs = []
+    for _, run in timeline:
+        kind = run[0][1]["kind"]
+        if kind != "exam" and runs and runs[-1][0][1]["kind"] == kind:
+            runs[-1].extend(run)
+        else:
+            runs.append(list(run))
+
+    deltas = {}
+    contents = {}
+    unlocked = set()
+    for run in runs:
+        kind, content_id = run[0][1]["kind"], run[0][1].get("content_id")
+        answers = [{"question_id": e["question_id"], "option_id": e["option_id"]} for _, e, _ in run]
+        options = {e["option_id"]: catalog.options[e["option_id"]].is_correct for _, e, _ in run}
+        graded = grade_answers(db, user_id, answers, options, source=kind, now=run[-1][0])
+        for (_, _, result), g in zip(run, graded):
+            result["correct"] = g.correct
+            correct, incorrect = deltas.get(g.question_id, (0, 0))
+            deltas[g.question_id] = (correct + int(g.correct), incorrect + int(not g.correct))
+        if kind == "exam":
+            ucp, opened = record_exam_attempt(db, user_id, content_id, len(graded), sum(g.correct for g in graded))
+            contents[content_id] = ucp
+            unlocked.update(opened)
+
+    for result in results:
+        sync_events.inc((result["status"],))
+
+    questions = []
+    if deltas:
+        for question_id, last_correct, next_review, times_correct, times_incorrect in db.execute(
+                select(UserQuestionProgress.question_id, UserQuestionProgress.last_answer_correct,
+                       UserQuestionProgress.next_review_date, UserQuestionProgress.times_correct,
+                       UserQuestionProgress.times_incorrect)
+                .where(UserQuestionProgress.user_id == user_id,
+                       UserQuestionProgress.question_id.in_(list(deltas)))
+                .order_by(UserQuestionProgress.question_id)):
+            questions.append({
+                "question_id": question_id,
+                "correct_delta": deltas[question_id][0],
+                "incorrect_delta": deltas[question_id][1],
+                "times_correct": times_correct,
+                "times_incorrect": times_incorrect,
+                "last_answer_correct": last_correct,
+                "next_review_date": next_review,
+            })
+
+    due_count = db.scalar(select(func.count()).select_from(UserQuestionProgress).where(
+        UserQuestionProgress.user_id == user_id,
+        UserQuestionProgress.next_review_date != None,
+        UserQuestionProgress.next_review_date <= now
+    ))
+
+    return {
+        "results": results,
+        "applied": sum(1 for r in results if r["status"] == "applied"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "rejected": sum(1 for r in results if r["status"] == "rejected"),
+        "questions": questions,
+        "contents": [
+            {"content_id": cid, "answered_count": ucp.answered_count, "correct_count": ucp.correct_count,
+             "passed": bool(ucp.passed)}
+            for cid, ucp in sorted(contents.items())
+        ],
+        "unlocked": sorted(unlocked),
+        "due_count": due_count,
+        "server_time": now,
+    }
+
+
+def prune_receipts(db: Session, older_than_days: float = None) -> int:
+    """
+    Forget idempotency keys processed more than `older_than_days` ago
+    (default SYNC_RECEIPT_RETENTION_DAYS). Returns the rows deleted. Does
+    not commit.
+    """
+    days = Config.SYNC_RECEIPT_RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return db.execute(delete(SyncReceipt).where(SyncReceipt.processed_at < cutoff)).rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    prune = sub.add_parser("prune", help="delete old idempotency keys")
+    prune.add_argument("--days", type=float, help="default: SYNC_RECEIPT_RETENTION_DAYS")
+    args = parser.parse_args()
+
+    deleted = 0
+    for shard_session in shards.sessionmakers():
+        with shard_session() as db:
+            deleted += prune_receipts(db, args.days)
+            db.commit()
+    print(f"pruned {deleted} sync receipts")
+
+
+if __name__ == "__main__":
+    main()
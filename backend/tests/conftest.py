@@ -0,0 +1,90 @@
+import os
+import tempfile
+
+# Before anything reads Config: a scratch main database with one extra progress shard
+_scratch = tempfile.mkdtemp(prefix="coeus-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_scratch, 'main.db')}",
+    "PROGRESS_SHARD_URLS": f"sqlite:///{os.path.join(_scratch, 'shard1.db')}",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+    "ADMIN_USERNAMES": "admin",
+    "JOBS_ENABLED": "false",
+    "JOBS_LOCK_FILE": os.path.join(_scratch, "jobs.lock"),
+    "ANSWER_SPOOL_DIR": os.path.join(_scratch, "answer_spool"),
+    "WARMUP": "false",
+})
+
+import itertools
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from benchmarks.common import seed_catalog
+from src.database import SessionLocal
+from src.migrations import migrate
+from src.models import User, UserContentProgress
+from src.shards import shards
+
+_usernames = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def curriculum():
+    """
+    Level 1 with content 1 (30 questions) and content 2 (5 questions), as
+    {content_id: [(question_id, correct_option_id, wrong_option_id), ...]},
+    and the buckets spread over both shards.
+    """
+    migrate()
+    with SessionLocal() as db:
+        questions = {1: seed_catalog(db, 30), 2: seed_catalog(db, 5, content_id=2)}
+    shards.rebalance(log=lambda message: None)
+    return questions
+
+
+@pytest.fixture(scope="session")
+def catalog(curriculum):
+    """
+    The questions of content 1.
+    """
+    return curriculum[1]
+
+
+@pytest.fixture(scope="session")
+def client(catalog):
+    from app import app
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/auth/register", json={"username": "admin", "password": "secret-password",
+                                                  "email": "admin@example.com"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def make_user(client):
+    """
+    Registers a user (on the given shard), unlocks content 1 for them and
+    returns (user_id, auth headers).
+    """
+    def make(shard: int = None) -> tuple:
+        while True:
+            username = f"user{next(_usernames)}"
+            response = client.post("/auth/register", json={"username": username, "password": "secret-password",
+                                                          "email": f"{username}@example.com"})
+            assert response.status_code == 200, response.text
+            with SessionLocal() as db:
+                user_id = db.scalar(select(User.id).filter_by(username=username))
+            if shard is None or shards.shard_of(user_id) == shard:
+                break
+        with shards.session(shards.shard_of(user_id)) as db:
+            db.add(UserContentProgress(user_id=user_id, content_id=1, available=True,
+                                       answered_count=0, correct_count=0))
+            db.commit()
+        return user_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return make
@@ -0,0 +1,13 @@
+import pytest
+
+DIAGNOSTICS = ["/metrics", "/metrics/slow-queries", "/auth/principal-cache", "/auth/hashing",
+               "/stats/contents/1"]
+
+
+@pytest.mark.parametrize("path", DIAGNOSTICS)
+def test_diagnostics_need_an_admin(client, make_user, admin_headers, path):
+    _, student_headers = make_user()
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=student_headers).status_code == 403
+    assert client.get(path, headers=admin_headers).status_code == 200
@@ -0,0 +1,45 @@
+from config import Config
+from src.auth_cache import invalidate_principal, revoke_tokens
+from src.database import SessionLocal
+from src.models import User
+
+
+def update_user(user_id: int, change):
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        change(user)
+        db.commit()
+
+
+def test_deactivated_user_is_refused_once_invalidated(client, make_user):
+    user_id, headers = make_user()
+    assert client.get("/review", headers=headers).status_code == 200
+
+    update_user(user_id, lambda user: setattr(user, "is_active", False))
+    # Served from this worker's cache until invalidated (or AUTH_CACHE_TTL_SECONDS)
+    assert client.get("/review", headers=headers).status_code == 200
+    invalidate_principal(user_id)
+    assert client.get("/review", headers=headers).status_code == 401
+
+
+def test_revoked_tokens_are_refused(client, make_user):
+    user_id, headers = make_user()
+    assert client.get("/review", headers=headers).status_code == 200
+
+    update_user(user_id, revoke_tokens)
+    assert client.get("/review", headers=headers).status_code == 401
+
+    with SessionLocal() as db:
+        username = db.get(User, user_id).username
+    login = client.post("/auth/login", json={"username_or_email": username, "password": "secret-password"})
+    assert client.get("/review", headers={"Authorization": f"Bearer {login.json()['access_token']}"}) \
+        .status_code == 200
+
+
+def test_revoked_tokens_are_refused_when_trusting_claims(client, make_user, monkeypatch):
+    monkeypatch.setattr(Config, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    user_id, headers = make_user()
+    assert client.get("/review", headers=headers).status_code == 200
+
+    update_user(user_id, revoke_tokens)
+    assert client.get("/review", headers=headers).status_code == 401
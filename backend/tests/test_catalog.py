@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+from src import catalog as catalog_module
+from src.catalog import get_catalog, get_catalog_async
+from src.database import AsyncSessionLocal, SessionLocal
+
+
+async def ticks_while(awaitable, seconds: float) -> tuple:
+    """
+    Await `awaitable` while counting how often the event loop gets to run
+    a 10 ms sleep for `seconds`.
+    """
+    ticks = 0
+    task = asyncio.ensure_future(awaitable)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+        ticks += 1
+    return ticks, await task
+
+
+def hold_lock(seconds: float):
+    """
+    Hold the catalog lock in another thread for `seconds`, as a reload
+    from sync code would.
+    """
+    held = threading.Event()
+
+    def hold():
+        with catalog_module._lock:
+            held.set()
+            time.sleep(seconds)
+
+    threading.Thread(target=hold, daemon=True).start()
+    held.wait()
+
+
+def test_async_reload_never_blocks_the_event_loop_on_the_lock(catalog):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await ticks_while(get_catalog_async(db), 0.5)
+
+    catalog_module._checked_at = 0.0  # stale: the next read reloads
+    hold_lock(0.3)
+    ticks, reloaded = asyncio.run(run())
+
+    assert ticks > 35
+    assert reloaded.questions
+
+
+def test_sync_code_on_the_event_loop_keeps_the_snapshot_during_a_reload(catalog):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            start = time.monotonic()
+            snapshot = await db.run_sync(get_catalog)
+            return snapshot, time.monotonic() - start
+
+    with SessionLocal() as db:
+        current = get_catalog(db)
+    catalog_module._checked_at = 0.0
+    hold_lock(0.5)
+    snapshot, seconds = asyncio.run(run())
+
+    assert snapshot is current
+    assert seconds < 0.25
@@ -0,0 +1,64 @@
+import io
+import json
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from src import curriculum_io
+from src.curriculum_io import import_curriculum
+from src.database import make_engine
+from src.migrations import migrate
+from src.models import CatalogVersion, Content
+
+RECORDS = [{"type": "level", "key": "L1", "title": "Basics", "order_index": 1}] + [
+    {"type": "content", "key": f"L1-C{i}", "level": "L1", "title": f"Content {i}", "order_index": i}
+    for i in range(1, 5)
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    migrate(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def fail_on_chunk(monkeypatch, failing: int):
+    write_chunk = curriculum_io.write_chunk
+    calls = []
+
+    def write_then_fail(db, chunk, report):
+        write_chunk(db, chunk, report)
+        calls.append(chunk)
+        if len(calls) == failing:
+            raise RuntimeError("disk full")
+
+    monkeypatch.setattr(curriculum_io, "write_chunk", write_then_fail)
+
+
+def imported(db: Session) -> tuple:
+    with Session(db.get_bind()) as fresh:
+        return (sorted(fresh.scalars(select(Content.key))),
+                fresh.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1)))
+
+
+def test_failed_import_keeps_committed_chunks_and_bumps_the_version(db, monkeypatch):
+    fail_on_chunk(monkeypatch, 2)
+    stream = io.StringIO("\n".join(json.dumps(record) for record in RECORDS))
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        import_curriculum(db, stream, chunk_size=2)
+
+    # The failed chunk (L1-C2, L1-C3) is rolled back, not committed with the bump
+    assert imported(db) == (["L1-C1"], 1)
+
+
+def test_import_failing_in_its_first_chunk_changes_nothing(db, monkeypatch):
+    fail_on_chunk(monkeypatch, 1)
+    stream = io.StringIO("\n".join(json.dumps(record) for record in RECORDS))
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        import_curriculum(db, stream, chunk_size=2)
+
+    assert imported(db) == ([], None)
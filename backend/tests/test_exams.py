@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import select
+from src.models import UserQuestionProgress
+from src.shards import shards
+
+
+def answers(questions, correct: bool = True) -> list:
+    return [{"question_id": q, "option_id": right if correct else wrong} for q, right, wrong in questions]
+
+
+def answered_questions(user_id: int) -> list:
+    with shards.session(shards.shard_of(user_id)) as db:
+        return list(db.scalars(select(UserQuestionProgress.question_id).filter_by(user_id=user_id)))
+
+
+def mismatched(questions):
+    bad = answers(questions)
+    bad[0]["option_id"] = questions[1][1]
+    return bad
+
+
+@pytest.mark.parametrize("submission, error", [
+    (lambda catalog, other_content: answers(catalog[:9]), "at least 10 answers"),
+    (lambda catalog, other_content: answers(catalog[:9] + other_content[:1]), "not part of this exam"),
+    (lambda catalog, other_content: mismatched(catalog[:10]), "unknown option"),
+    (lambda catalog, other_content: answers(catalog[:9] + catalog[:1]), "more than once"),
+])
+def test_exam_submission_is_checked_before_grading(client, catalog, make_user, curriculum, submission, error):
+    user_id, headers = make_user()
+    response = client.post("/exam/1/submit", json={"answers": submission(catalog, curriculum[2])},
+                           headers=headers)
+
+    assert response.status_code == 400
+    assert error in response.json()["detail"]
+    assert answered_questions(user_id) == []
+
+
+def test_exam_submission(client, catalog, make_user):
+    user_id, headers = make_user()
+    response = client.post("/exam/1/submit", json={"answers": answers(catalog[:10])}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["correct_this_attempt"] == 10
+    assert client.post("/exam/99/submit", json={"answers": []}, headers=headers).status_code == 404
+
+
+@pytest.mark.parametrize("submission, error", [
+    (lambda catalog, other_content: answers(catalog[:19]), "at least 20 answers"),
+    (lambda catalog, other_content: answers(catalog[:19] + [(999999, 1, 2)]), "not part of this exam"),
+    (lambda catalog, other_content: mismatched(catalog[:20]), "unknown option"),
+    (lambda catalog, other_content: answers(catalog[:19] + catalog[:1]), "more than once"),
+])
+def test_unit_exam_submission_is_checked_before_grading(client, catalog, make_user, curriculum,
+                                                       submission, error):
+    user_id, headers = make_user()
+    response = client.post("/unit_exam/1/submit", json={"answers": submission(catalog, curriculum[2])},
+                           headers=headers)
+
+    assert response.status_code == 400
+    assert error in response.json()["detail"]
+    assert answered_questions(user_id) == []
+
+
+def test_unit_exam_submission_across_contents(client, curriculum, make_user):
+    _, headers = make_user()
+    response = client.post("/unit_exam/1/submit", json={"answers": answers(curriculum[1][:19] + curriculum[2][:1])},
+                           headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["passed"] is True
+    assert client.post("/unit_exam/9/submit", json={"answers": []}, headers=headers).status_code == 404
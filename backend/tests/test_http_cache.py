@@ -0,0 +1,37 @@
+from src.http_cache import RepresentationCache
+
+
+def render(source: str) -> bytes:
+    return source.encode() * 100
+
+
+def test_representation_cache_drops_least_recently_used_beyond_its_byte_budget():
+    cache = RepresentationCache("test_representation", max_bytes=250)
+    renders = []
+
+    def counting_render(source):
+        renders.append(source)
+        return render(source)
+
+    for key in (1, 2):
+        cache.get(key, str(key), counting_render)
+    cache.get(1, "1", counting_render)      # 1 is now the most recently used
+    cache.get(3, "3", counting_render)      # over budget: evicts 2
+    assert renders == ["1", "2", "3"]
+
+    cache.get(1, "1", counting_render)
+    cache.get(2, "2", counting_render)
+    assert renders == ["1", "2", "3", "2"]
+
+
+def test_representation_larger_than_the_budget_is_served_but_not_kept():
+    cache = RepresentationCache("test_representation", max_bytes=50)
+    assert cache.get(1, "1", render).body == render("1")
+    assert cache._entries == {}
+
+
+def test_changed_source_replaces_the_entry():
+    cache = RepresentationCache("test_representation", max_bytes=1000)
+    cache.get(1, "a", render)
+    assert cache.get(1, "b", render).body == render("b")
+    assert cache._bytes == 100
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, MetaData, Table, inspect
+from src.database import Base, make_engine
+from src.migrations import LATEST, migrate, schema_status
+
+
+def schema(engine) -> dict:
+    inspector = inspect(engine)
+    return {
+        table: ({c["name"] for c in inspector.get_columns(table)},
+                {i["name"] for i in inspector.get_indexes(table)})
+        for table in inspector.get_table_names() if not table.startswith("search_")
+    }
+
+
+def test_fresh_database_matches_the_models(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    migrate(engine)
+    models = make_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    Base.metadata.create_all(models)
+
+    assert schema_status(engine)["current"] == LATEST
+    assert schema(engine) == schema(models)
+
+
+def test_older_database_is_brought_up_to_date(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old = MetaData()
+    Table("user_question_progress", old, Column("user_id", Integer, primary_key=True),
+          Column("question_id", Integer, primary_key=True), Column("times_correct", Integer))
+    old.create_all(engine)
+
+    assert migrate(engine) == list(range(1, LATEST + 1))
+    assert migrate(engine) == []
+    columns = {c["name"] for c in inspect(engine).get_columns("user_question_progress")}
+    assert {"ease", "interval_days", "repetitions", "last_review_date"} <= columns
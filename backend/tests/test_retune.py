@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from src.database import make_engine
+from src.migrations import migrate
+from src.models import UserQuestionProgress
+from src.scheduler import SCHEDULERS
+from src.scheduler.retune import main, reschedule_all
+
+
+def test_desired_retention_is_rejected_for_sm2(monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["retune", "--scheduler", "sm2", "--desired-retention", "0.85"])
+    with pytest.raises(SystemExit) as exited:
+        main()
+    assert exited.value.code == 2
+    assert "--desired-retention" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("name", sorted(SCHEDULERS))
+def test_reschedule_all(tmp_path, name):
+    engine = make_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    migrate(engine)
+    reviewed = datetime(2026, 1, 1)
+    with sessionmaker(bind=engine)() as db:
+        questions = [q for q, _, _ in seed_catalog(db, 3)]
+        db.execute(insert(UserQuestionProgress), [
+            {"user_id": 1, "question_id": q, "ease": 2.5, "stability": 10.0, "difficulty": 5.0,
+             "interval_days": 3.0, "repetitions": reps, "last_review_date": reviewed}
+            for q, reps in zip(questions, (0, 2, 5))
+        ])
+        db.commit()
+
+        assert reschedule_all(db, SCHEDULERS[name](), chunk_size=2) == 3
+        rows = db.execute(select(UserQuestionProgress.repetitions, UserQuestionProgress.interval_days,
+                                 UserQuestionProgress.next_review_date)
+                          .order_by(UserQuestionProgress.repetitions)).all()
+    engine.dispose()
+
+    assert rows[0][1] == 3.0
+    assert all(due == reviewed + timedelta(days=interval) for _, interval, due in rows)
+    if name == "sm2":
+        assert [interval for _, interval, _ in rows] == [3.0, 6.0, 3.0]
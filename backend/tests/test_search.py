@@ -0,0 +1,55 @@
+import pytest
+from config import Config
+from src.database import SessionLocal
+from src.models import Content, Question, UserContentProgress
+from src.shards import shards
+
+
+@pytest.fixture(scope="module")
+def searchable(catalog):
+    """
+    Content 3: a lesson on osmosis whose body holds markup, followed (newer
+    index rows) by questions that mention osmosis only in passing.
+    """
+    with SessionLocal() as db:
+        db.add(Content(id=3, level_id=1, order_index=3, title="Osmosis",
+                       body='Water moves by osmosis. <script>alert("x")</script> & <b>more</b>'))
+        db.flush()
+        db.add_all(Question(content_id=3, text=f"Question {i} on cells, water and, in the end, osmosis")
+                   for i in range(5))
+        db.commit()
+
+
+@pytest.fixture
+def reader(make_user, searchable):
+    user_id, headers = make_user()
+    with shards.session(shards.shard_of(user_id)) as db:
+        db.add(UserContentProgress(user_id=user_id, content_id=3, available=True, answered_count=0, correct_count=0))
+        db.commit()
+    return headers
+
+
+def search(client, headers, q: str, limit: int = 20) -> list:
+    response = client.get("/content/search", params={"q": q, "limit": limit}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+def test_snippets_are_escaped_except_for_the_marks(client, reader):
+    hit = search(client, reader, "script alert")[0]
+
+    assert hit["content_id"] == 3 and hit["kind"] == "content"
+    assert "<script>" not in hit["snippet"]
+    assert "&lt;<mark>script</mark>&gt;<mark>alert</mark>" in hit["snippet"]
+    assert "&amp; &lt;b&gt;more&lt;/b&gt;" in hit["snippet"]
+
+
+def test_every_match_is_ranked(client, reader, monkeypatch):
+    # The title match is the oldest index row: found first only when all matches are ranked
+    [best] = search(client, reader, "osmosis", limit=1)
+    assert (best["kind"], best["content_id"]) == ("content", 3)
+
+    # A window of the 2 newest matches misses it
+    monkeypatch.setattr(Config, "SEARCH_RANK_WINDOW", 2)
+    [best] = search(client, reader, "osmosis", limit=1)
+    assert best["kind"] == "question"
@@ -0,0 +1,123 @@
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from src.database import make_engine
+from src.migrations import migrate
+from src.models import ShardAssignment, UserQuestionProgress
+from src.shards import ProgressShards, Shard, make_shard, shards
+
+
+def progress_users(shard: int) -> set:
+    with shards.session(shard) as db:
+        return set(db.scalars(select(UserQuestionProgress.user_id).distinct()))
+
+
+def test_users_on_different_shards_read_and_write_their_own_rows(client, catalog, make_user):
+    first, first_headers = make_user(shard=0)
+    second, second_headers = make_user(shard=1)
+    (q1, _, wrong1), (q2, _, wrong2) = catalog[0], catalog[1]
+
+    for headers, question, option in ((first_headers, q1, wrong1), (second_headers, q2, wrong2)):
+        response = client.post("/review", json={"question_id": question, "selected_option_id": option},
+                               headers=headers)
+        assert response.status_code == 200, response.text
+
+    assert first in progress_users(0) and first not in progress_users(1)
+    assert second in progress_users(1) and second not in progress_users(0)
+
+    failed = {user: [q["question_id"] for q in client.get("/review", headers=headers).json()["failed_questions"]]
+              for user, headers in ((first, first_headers), (second, second_headers))}
+    assert failed == {first: [q1], second: [q2]}
+
+
+def test_progress_endpoints_need_a_token(client, catalog):
+    assert client.get("/review").status_code == 401
+    assert client.post("/sync", json={"events": []}).status_code == 401
+
+
+def open_shards(directory, n: int) -> ProgressShards:
+    main = make_engine(f"sqlite:///{directory / 'main.db'}")
+    main_sessions = sessionmaker(bind=main)
+    return ProgressShards([Shard(main, main_sessions, None, None, None)]
+                          + [make_shard(f"sqlite:///{directory / f'shard{i}.db'}", main) for i in range(1, n)],
+                          core_session_factory=main_sessions)
+
+
+def rows_by_shard(progress: ProgressShards) -> list:
+    found = []
+    for shard in range(len(progress.shards)):
+        with progress.session(shard) as db:
+            found.append(sorted(db.execute(select(UserQuestionProgress.user_id, UserQuestionProgress.question_id))))
+    return found
+
+
+@pytest.fixture
+def populated(tmp_path):
+    """
+    A main database holding 3 progress rows for each of 60 users.
+    """
+    engine = make_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    migrate(engine)
+    with sessionmaker(bind=engine)() as db:
+        questions = [q for q, _, _ in seed_catalog(db, 3)]
+        db.execute(insert(UserQuestionProgress), [{"user_id": user_id, "question_id": q, "times_correct": 1}
+                                                  for user_id in range(1, 61) for q in questions])
+        db.commit()
+    engine.dispose()
+    return tmp_path
+
+
+def assert_placed(progress: ProgressShards, users: int, per_user: int):
+    progress.load()
+    placed = rows_by_shard(progress)
+    assert sum(len(rows) for rows in placed) == users * per_user
+    for shard, rows in enumerate(placed):
+        assert all(progress.shard_of(user_id) == shard for user_id, _ in rows)
+
+
+def test_rebalance_moves_buckets(populated):
+    progress = open_shards(populated, 2)
+    stats = progress.rebalance(log=lambda message: None)
+
+    assert stats["buckets"] == 512
+    assert stats["rows"] == len(rows_by_shard(progress)[1]) > 0
+    assert_placed(progress, 60, 3)
+    with progress.core_session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(ShardAssignment).filter_by(shard=1)) == 512
+
+
+def test_rebalance_finishes_an_interrupted_run(populated, monkeypatch):
+    progress = open_shards(populated, 2)
+    source_engine = progress.shards[0].engine
+    delete_users = ProgressShards._delete_users
+    source_deletes = []
+
+    def crash_after_reassigning(self, db, user_ids):
+        # Dies between committing a bucket's new shard and deleting its rows from the old one
+        if user_ids and db.get_bind() is source_engine:
+            source_deletes.append(user_ids)
+            if len(source_deletes) == 3:
+                raise RuntimeError("interrupted")
+        delete_users(self, db, user_ids)
+
+    monkeypatch.setattr(ProgressShards, "_delete_users", crash_after_reassigning)
+    with pytest.raises(RuntimeError):
+        progress.rebalance(log=lambda message: None)
+    monkeypatch.undo()
+
+    # The bucket is reassigned, and its users' rows are on both shards
+    stranded = source_deletes[-1]
+    progress = open_shards(populated, 2)
+    progress.load()
+    assert progress.shard_of(stranded[0]) == 1
+    assert all(any(user_id == stranded[0] for user_id, _ in rows) for rows in rows_by_shard(progress))
+
+    stats = progress.rebalance(log=lambda message: None)
+    assert stats["stale_users"] == len(stranded)
+    assert 0 < stats["buckets"] < 512
+    assert_placed(progress, 60, 3)
+
+    # Balanced now: running it again changes nothing
+    assert progress.rebalance(log=lambda message: None) == {"buckets": 0, "rows": 0, "stale_users": 0}
+    assert_placed(progress, 60, 3)
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+
+def event(key: str, question: tuple, correct: bool = True, kind: str = "recall", minutes_ago: float = 5, **extra):
+    question_id, right, wrong = question
+    return dict(key=key, kind=kind, question_id=question_id, option_id=right if correct else wrong,
+                answered_at=(datetime.utcnow() - timedelta(minutes=minutes_ago)).isoformat(), **extra)
+
+
+def sync(client, headers, events: list) -> dict:
+    response = client.post("/sync", json={"events": events}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def statuses(body: dict) -> list:
+    return [(result["key"], result["status"]) for result in body["results"]]
+
+
+def test_replayed_batch_is_not_graded_again(client, catalog, make_user):
+    _, headers = make_user()
+    batch = [event("a", catalog[0]), event("b", catalog[1], correct=False)]
+
+    first = sync(client, headers, batch)
+    assert first["applied"] == 2
+    assert {q["question_id"]: q["times_correct"] + q["times_incorrect"] for q in first["questions"]} \
+        == {catalog[0][0]: 1, catalog[1][0]: 1}
+
+    again = sync(client, headers, batch)
+    assert statuses(again) == [("a", "duplicate"), ("b", "duplicate")]
+    assert again["questions"] == []
+
+    review = client.get("/review", headers=headers).json()["failed_questions"]
+    assert [q["question_id"] for q in review] == [catalog[1][0]]
+
+
+def test_key_repeated_within_a_batch_is_applied_once(client, catalog, make_user):
+    _, headers = make_user()
+    body = sync(client, headers, [event("a", catalog[0]), event("a", catalog[0]), event("b", catalog[1])])
+
+    assert statuses(body) == [("a", "applied"), ("a", "duplicate"), ("b", "applied")]
+    assert [q["correct_delta"] for q in body["questions"]] == [1, 1]
+
+
+def test_keys_are_scoped_per_user(client, catalog, make_user):
+    _, first = make_user(shard=0)
+    _, second = make_user(shard=0)
+
+    assert sync(client, first, [event("same-key", catalog[0])])["applied"] == 1
+    assert sync(client, second, [event("same-key", catalog[0])])["applied"] == 1
+    assert sync(client, first, [event("same-key", catalog[0])])["duplicates"] == 1
+
+
+def test_invalid_answers_are_rejected(client, catalog, make_user):
+    _, headers = make_user()
+    mismatched = event("mismatched", catalog[0])
+    mismatched["option_id"] = catalog[1][1]
+
+    body = sync(client, headers, [
+        mismatched,
+        event("no-content", catalog[1], kind="exam"),
+        event("other-content", catalog[1], kind="exam", content_id=2),
+        event("ok", catalog[2]),
+    ])
+
+    assert statuses(body) == [("mismatched", "rejected"), ("no-content", "rejected"),
+                              ("other-content", "rejected"), ("ok", "applied")]
+    assert all(r["error"] for r in body["results"][:3])
+    assert [q["question_id"] for q in body["questions"]] == [catalog[2][0]]
+
+    # A rejected key is not recorded, so a corrected answer under it still applies
+    fixed = event("mismatched", catalog[0])
+    assert statuses(sync(client, headers, [fixed])) == [("mismatched", "applied")]
+
+
+def test_exam_answers_count_once_per_attempt(client, catalog, make_user):
+    _, headers = make_user()
+    # Oldest first: attempt a all wrong, then attempts b and c all right
+    attempts = {"a": (catalog[:10], False), "b": (catalog[10:20], True), "c": (catalog[20:30], True)}
+    events = []
+    for n, (attempt, (questions, correct)) in enumerate(attempts.items()):
+        events += [event(f"{attempt}{i}", q, correct, kind="exam", minutes_ago=60 - 10 * n - i * 0.1,
+                         content_id=1, attempt=attempt)
+                   for i, q in enumerate(questions)]
+
+    # Sent out of order: the server sorts by answered_at
+    body = sync(client, headers, events[::-1])
+
+    assert body["applied"] == 30
+    # Graded as one attempt (20/30) it would fail; the last attempt alone (10/10) passes
+    assert body["contents"] == [{"content_id": 1, "answered_count": 30, "correct_count": 20, "passed": True}]
+    assert body["unlocked"] == [2]
+
+
+def exam_attempt(attempt: str, questions: list, correct: list, start: float = 60, **extra) -> list:
+    return [event(f"{attempt}{i}", q, ok, kind="exam", minutes_ago=start - i * 0.1, content_id=1,
+                  attempt=attempt, **extra)
+            for i, (q, ok) in enumerate(zip(questions, correct))]
+
+
+def test_short_exam_attempt_is_rejected_whole(client, catalog, make_user):
+    _, headers = make_user()
+    long_attempt = exam_attempt("a", catalog[:29], [True] * 15 + [False] * 14, start=60)
+    short_attempt = exam_attempt("b", catalog[29:], [True], start=30)
+
+    body = sync(client, headers, long_attempt + short_attempt)
+
+    assert body["applied"] == 29 and body["rejected"] == 1
+    assert body["results"][-1]["error"] == "an attempt needs at least 10 answers"
+    assert body["contents"] == [{"content_id": 1, "answered_count": 29, "correct_count": 15, "passed": False}]
+    assert body["unlocked"] == []
+
+    # The rejected key stays unclaimed, so the completed attempt still applies
+    corrected = exam_attempt("b", catalog[:10], [True] * 10, start=20)
+    assert sync(client, headers, corrected)["applied"] == 10
+
+
+def test_exam_attempt_repeating_a_question_is_rejected(client, catalog, make_user):
+    _, headers = make_user()
+    body = sync(client, headers, exam_attempt("a", [catalog[0]] * 30, [True] * 30))
+
+    assert body["rejected"] == 30
+    assert "answered more than once" in body["results"][0]["error"]
+    assert body["contents"] == [] and body["unlocked"] == []
+
+
+def test_exam_attempt_interleaved_with_recall_is_one_attempt(client, catalog, make_user):
+    _, headers = make_user()
+    attempt = exam_attempt("a", catalog[:30], [False] * 10 + [True] * 20, start=60)
+    # A recall answer between the wrong and the right exam answers
+    recall = event("r", catalog[0], minutes_ago=60 - 9.5 * 0.1)
+
+    body = sync(client, headers, attempt[:10] + [recall] + attempt[10:])
+
+    assert body["applied"] == 31
+    # Split at the recall answer, the last 20 would pass on their own; as one attempt 20/30 fails
+    assert body["contents"] == [{"content_id": 1, "answered_count": 30, "correct_count": 20, "passed": False}]
+    assert body["unlocked"] == []